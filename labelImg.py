@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import argparse
+import bisect
 import codecs
 import distutils.spawn
 import os.path
@@ -9,6 +10,7 @@ import re
 import sys
 import subprocess
 import shutil
+import sqlite3
 import webbrowser as wb
 
 from functools import partial
@@ -50,6 +52,16 @@ from libs.create_ml_io import CreateMLReader
 from libs.create_ml_io import JSON_EXT
 from libs.ustr import ustr
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
+from libs.prefetch import ImagePrefetcher
+from libs.imageCache import ImageCache, DEFAULT_IMAGE_CACHE_BYTES, paintable
+from libs.scanner import ImageScanner, iter_images, path_sort_key
+from libs.dirWatcher import DirectoryWatcher
+from libs.fileListModel import FileListModel, PathStore
+from libs.tiles import TiledImageSource, should_tile
+from libs.preview import PreviewImage, read_preview
+from libs.thumbnails import DEFAULT_CACHE_PATH, ThumbnailCache, ThumbnailDelegate, ThumbnailLoader
+from libs.annotationIndex import DEFAULT_INDEX_PATH, AnnotationIndex
+from libs.saveQueue import SaveQueue
 
 __appname__ = 'labelImg'
 
@@ -75,8 +87,11 @@ class WindowMixin(object):
 
 class MainWindow(QMainWindow, WindowMixin):#MainWindow
     FIT_WINDOW, FIT_WIDTH, MANUAL_ZOOM = list(range(3))
+    # Emitted from the prefetch workers when a full resolution image is decoded
+    imageLoaded = pyqtSignal(str)
 
-    def __init__(self, default_filename=None, default_prefdef_class_file=None, default_save_dir=None):#生成MainWindow类的实例对象时自动调用，当命令行有传入时则分别赋值，否则除了class会有默认的label配置文件外，其他为None
+    def __init__(self, default_filename=None, default_prefdef_class_file=None, default_save_dir=None,
+                 index_path=DEFAULT_INDEX_PATH, thumbnail_cache_path=DEFAULT_CACHE_PATH):#生成MainWindow类的实例对象时自动调用，当命令行有传入时则分别赋值，否则除了class会有默认的label配置文件外，其他为None
         super(MainWindow, self).__init__()#Invoke the initializer methods in both parent classes
         self.setWindowTitle(__appname__)#Set window name "labelImg"
         # Load setting in the main thread
@@ -96,7 +111,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.label_file_format = settings.get(SETTING_LABEL_FILE_FORMAT, LabelFileFormat.PASCAL_VOC)#Set the annotation file format to pascal_voc
 
         # For loading all image under a directory
-        self.m_img_list = [] #Store picture list
+        self.m_img_list = PathStore() #Store picture list
         self.dir_name = None #folder path
         self.label_hist = [] #Store label list
         self.last_open_dir = None #Last opened folder path
@@ -105,6 +120,17 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.img_count = 1 #Photo Total
         self.combo_list = [] #Stores a list of visual box types
         self.combo_text_list = []
+        # Writes annotation files in the background, in order
+        self.save_queue = SaveQueue(self)
+        self.save_queue.saved.connect(self.annotation_saved)
+        self.save_queue.failed.connect(self.save_failed)
+        self._save_failed = False
+        # Every decoded image lives in this cache, the current one is pinned
+        self.image_cache = ImageCache(settings.get(SETTING_IMAGE_CACHE_MB, DEFAULT_IMAGE_CACHE_BYTES >> 20) << 20)
+        self._pinned_path = None
+        # Decodes the neighbouring images in the background while navigating
+        self.prefetcher = ImagePrefetcher(read_untiled, self.image_cache, on_loaded=self.imageLoaded.emit)
+        self.imageLoaded.connect(self.full_image_loaded)
 
         # Whether we need to save or not.
         self.dirty = False
@@ -125,6 +151,8 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
 
         self.items_to_shapes = {}
         self.shapes_to_items = {}
+        # label -> set of the shapes with that label, for the label filter
+        self.labels_to_shapes = {}
         self.prev_label_text = ''
         # Arrange controls in a vertical direction
         list_layout = QVBoxLayout()
@@ -163,6 +191,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
 
         # Create and add a widget for showing current label items
         self.label_list = QListWidget()#Create a list display control，label_list is a list of annotated boxes
+        self.label_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         label_list_container = QWidget()
         label_list_container.setLayout(list_layout)#Vertical arrangement
         self.label_list.itemActivated.connect(self.label_selection_changed)
@@ -178,17 +207,56 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.dock.setObjectName(get_str('labels'))#set name
         self.dock.setWidget(label_list_container)#The top right corner tool adds BoxLabels to the hover window
 
-        self.file_list_widget = QListWidget()#Create a list display control，file_list_widget is a list of pictures
-        self.file_list_widget.itemDoubleClicked.connect(self.file_item_double_clicked)
+        # file_list_view is a list of pictures, the model only renders the visible rows
+        # Annotation status of every image, kept up to date while saving
+        self.annotation_index = AnnotationIndex(index_path, parent=self)
+        self.annotation_index.updated.connect(self.annotation_index_updated)
+        self.file_list_model = FileListModel(self.m_img_list, self.file_status, self)
+        self.file_list_model.counts_provider = self.file_label_counts
+        self.file_list_model.headers = [get_str('fileList'), get_str('objects'), get_str('labels')]
+        self.file_list_model.status_icons = {FileListModel.UNKNOWN: self.style().standardIcon(QStyle.SP_BrowserReload),
+                                             FileListModel.ANNOTATED: new_icon('done'),
+                                             FileListModel.VERIFIED: new_icon('verify')}
+        self.file_list_view = QTreeView()
+        self.file_list_view.setRootIsDecorated(False)
+        self.file_list_view.setItemsExpandable(False)
+        self.file_list_view.setUniformRowHeights(True)
+        self.file_list_view.setModel(self.file_list_model)
+        self.file_list_view.header().setStretchLastSection(False)
+        self.file_list_view.header().setSectionResizeMode(FileListModel.COLUMN_FILE, QHeaderView.Stretch)
+        self.file_list_view.header().setSectionResizeMode(FileListModel.COLUMN_OBJECTS, QHeaderView.ResizeToContents)
+        self.file_list_view.doubleClicked.connect(self.file_item_double_clicked)
         file_list_layout = QVBoxLayout()
         file_list_layout.setContentsMargins(0, 0, 0, 0)
-        file_list_layout.addWidget(self.file_list_widget)
+        file_list_layout.addWidget(self.file_list_view)
         file_list_container = QWidget()
         file_list_container.setLayout(file_list_layout)
         self.file_dock = QDockWidget(get_str('fileList'), self)
         self.file_dock.setObjectName(get_str('files'))
         self.file_dock.setWidget(file_list_container)
 
+        # Filmstrip of thumbnails, a second view on the file list model
+        try:
+            thumbnail_cache = ThumbnailCache(thumbnail_cache_path)
+        except sqlite3.Error as e:
+            print('Thumbnail cache disabled: %s' % e)
+            thumbnail_cache = None
+        self.thumbnail_loader = ThumbnailLoader(thumbnail_cache, parent=self)
+        self.thumbnail_loader.thumbnailReady.connect(self.file_list_model.refresh_thumbnail)
+        self.file_list_model.thumbnail_provider = self.thumbnail_loader.thumbnail
+        self.filmstrip_view = QListView()
+        self.filmstrip_view.setViewMode(QListView.IconMode)
+        self.filmstrip_view.setResizeMode(QListView.Adjust)
+        self.filmstrip_view.setMovement(QListView.Static)
+        self.filmstrip_view.setUniformItemSizes(True)
+        self.filmstrip_view.setLayoutMode(QListView.Batched)
+        self.filmstrip_view.setItemDelegate(ThumbnailDelegate(FileListModel.ThumbnailRole, parent=self.filmstrip_view))
+        self.filmstrip_view.setModel(self.file_list_model)
+        self.filmstrip_view.doubleClicked.connect(self.file_item_double_clicked)
+        self.filmstrip_dock = QDockWidget(get_str('filmstrip'), self)
+        self.filmstrip_dock.setObjectName('filmstrip')
+        self.filmstrip_dock.setWidget(self.filmstrip_view)
+
         self.zoom_widget = ZoomWidget()#Initializes the scale value display control
         self.color_dialog = ColorDialog(parent=self)#Color adjustment dialog box
 
@@ -216,6 +284,8 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.addDockWidget(Qt.RightDockWidgetArea, self.dock)
         self.addDockWidget(Qt.RightDockWidgetArea, self.file_dock)
         self.file_dock.setFeatures(QDockWidget.DockWidgetFloatable)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.filmstrip_dock)
+        self.filmstrip_dock.hide()
 
         self.dock_features = QDockWidget.DockWidgetClosable | QDockWidget.DockWidgetFloatable
         self.dock.setFeatures(self.dock.features() ^ self.dock_features)
@@ -245,6 +315,13 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         open_prev_image = action(get_str('prevImg'), self.open_prev_image,
                                  'a', 'prev', get_str('prevImgDetail'))
 
+        open_next_unannotated = action(get_str('nextUnannotated'), self.open_next_unannotated,
+                                       'Ctrl+Shift+N', 'next', get_str('nextUnannotatedDetail'))
+        open_next_unverified = action(get_str('nextUnverified'), self.open_next_unverified,
+                                      'Ctrl+Shift+U', 'next', get_str('nextUnverifiedDetail'))
+        open_next_with_label = action(get_str('nextWithLabel'), self.open_next_with_label,
+                                      'Ctrl+Shift+G', 'next', get_str('nextWithLabelDetail'))
+
         verify = action(get_str('verifyImg'), self.verify_image,
                         'space', 'verify', get_str('verifyImgDetail'))
 
@@ -405,6 +482,9 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         labels.setText(get_str('showHide'))
         labels.setShortcut('Ctrl+Shift+L')
 
+        filmstrip = self.filmstrip_dock.toggleViewAction()
+        filmstrip.setShortcut('Ctrl+Shift+T')
+
         # Label list context menu.
         label_menu = QMenu()
         add_actions(label_menu, (edit, delete))
@@ -487,9 +567,16 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.display_label_option.setCheckable(True)
         self.display_label_option.setChecked(settings.get(SETTING_PAINT_LABEL, False))
         self.display_label_option.triggered.connect(self.toggle_paint_labels_option)
+        # Paint without antialiasing while panning, zooming or dragging
+        self.adaptive_quality_option = QAction(get_str('adaptiveQuality'), self)
+        self.adaptive_quality_option.setCheckable(True)
+        self.adaptive_quality_option.setChecked(settings.get(SETTING_ADAPTIVE_QUALITY, True))
+        self.adaptive_quality_option.triggered.connect(self.toggle_adaptive_quality)
+        self.canvas.set_adaptive_quality(self.adaptive_quality_option.isChecked())
         #Add secondary functions under each menu in the menu bar
         add_actions(self.menus.file,
-                    (open, open_dir, change_save_dir, open_annotation, copy_prev_bounding, self.menus.recentFiles, save, save_format, save_as, close, reset_all, delete_image, quit))
+                    (open, open_dir, change_save_dir, open_annotation, copy_prev_bounding, None,
+                     open_next_unannotated, open_next_unverified, open_next_with_label, None, self.menus.recentFiles, save, save_format, save_as, close, reset_all, delete_image, quit))
         add_actions(self.menus.help, (help_default, show_info, show_shortcut))
         # Add the action to the view
         add_actions(self.menus.view, (
@@ -498,7 +585,8 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             self.pure_mode,
             self.single_class_mode,
             self.display_label_option,
-            labels, advanced_mode,None,
+            self.adaptive_quality_option,
+            labels, filmstrip, advanced_mode,None,
             hide_all, show_all, None,
             zoom_in, zoom_out, zoom_org, None,
             fit_window, fit_width))
@@ -568,8 +656,6 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         Shape.line_color = self.line_color = QColor(settings.get(SETTING_LINE_COLOR, DEFAULT_LINE_COLOR))
         Shape.fill_color = self.fill_color = QColor(settings.get(SETTING_FILL_COLOR, DEFAULT_FILL_COLOR))
         self.canvas.set_drawing_color(self.line_color)
-        # Add chris
-        Shape.difficult = self.difficult
 
         def xbool(x):
             if isinstance(x, QVariant):
@@ -597,6 +683,30 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         # Display cursor coordinates at the right of status bar
         self.label_coordinates = QLabel('')
         self.statusBar().addPermanentWidget(self.label_coordinates)
+        self.label_image_cache = QLabel('')
+        self.statusBar().addPermanentWidget(self.label_image_cache)
+
+        # Keeps the image list in sync with the opened directory
+        self.dir_watcher = DirectoryWatcher(self.image_extensions(), self)
+        self.dir_watcher.added.connect(self.dir_images_added)
+        self.dir_watcher.removed.connect(self.dir_images_removed)
+
+        # Progress of a running directory scan
+        self.dir_scanner = None
+        self._open_after_scan = False
+        # Watcher deltas which arrive during a scan, applied once it is done
+        self._deltas_during_scan = []
+        self.scan_progress = QProgressBar()
+        self.scan_progress.setRange(0, 0)
+        self.scan_progress.setMaximumWidth(200)
+        self.scan_progress.setTextVisible(True)
+        self.scan_cancel_button = QToolButton()
+        self.scan_cancel_button.setText(get_str('cancelScan'))
+        self.scan_cancel_button.clicked.connect(self.cancel_dir_scan)
+        self.statusBar().addPermanentWidget(self.scan_progress)
+        self.statusBar().addPermanentWidget(self.scan_cancel_button)
+        self.scan_progress.hide()
+        self.scan_cancel_button.hide()
 
         # Open Dir if default file
         if self.file_path and os.path.isdir(self.file_path):
@@ -705,6 +815,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
     def reset_state(self):
         self.items_to_shapes.clear()
         self.shapes_to_items.clear()
+        self.labels_to_shapes.clear()
         self.label_list.clear()
         self.file_path = None
         self.image_data = None
@@ -825,24 +936,62 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         if text is None:
             return
         if text is not None:
-            shape.label = text
-            shape.group_id = group_id
-            if shape.group_id is None:
-                text = shape.label
-            else:
-                text = "{} ({})".format(shape.label, shape.group_id)
-            item.setText(text)
-            item.setBackground(generate_color_by_text(text))
-            self.set_dirty()
-            self.update_combo_box()
+            # All selected shapes get the label
+            self.edit_shapes(self.selected_shapes(), label=text, group_id=group_id)
 
     # Tzutalin 20160906 : Add file list and dock to move faster 添加文件列表和dock移动更快
-    def file_item_double_clicked(self, item=None):
-        self.cur_img_idx = self.m_img_list.index(ustr(item.text()))
+    def file_item_double_clicked(self, index=None):
+        self.cur_img_idx = index.row()
         filename = self.m_img_list[self.cur_img_idx]
         if filename:
             self.load_file(filename)
 
+    def file_status(self, image_path):
+        """Annotation status of image_path shown in the file list, pending until it is indexed."""
+        entry = self.annotation_index.get(image_path, self.default_save_dir)
+        if entry is None:
+            return FileListModel.UNKNOWN
+        if entry.annotation_path is None:
+            return FileListModel.UNANNOTATED
+        if entry.verified:
+            return FileListModel.VERIFIED
+        return FileListModel.ANNOTATED
+
+    def file_label_counts(self, image_path):
+        entry = self.annotation_index.get(image_path, self.default_save_dir)
+        return entry.counts if entry is not None and entry.annotation_path is not None else None
+
+    def annotation_index_updated(self, paths):
+        if len(paths) == 1:
+            self.file_list_model.refresh_status(self.m_img_list.find(paths[0]))
+        else:
+            self.file_list_model.refresh_status()
+
+    def open_next_unannotated(self, _value=False):
+        self.open_next_matching(lambda entry: entry.annotation_path is None)
+
+    def open_next_unverified(self, _value=False):
+        self.open_next_matching(lambda entry: not entry.verified)
+
+    def open_next_with_label(self, _value=False):
+        labels = sorted(set(self.label_hist) | set(self.annotation_index.labels(self.default_save_dir)))
+        label, ok = QInputDialog.getItem(self, __appname__, self.string_bundle.get_string('nextWithLabelDetail'),
+                                         labels, 0, True)
+        if ok and label:
+            self.open_next_matching(lambda entry: entry.counts.get(ustr(label), 0) > 0)
+
+    def open_next_matching(self, predicate):
+        """Open the next image of the list, wrapping around, whose annotation status satisfies predicate."""
+        if not self.m_img_list or not self.may_continue():
+            return
+        start = self.cur_img_idx if self.file_path is not None else -1
+        row = self.annotation_index.find_next(self.m_img_list, start, self.default_save_dir, predicate)
+        if row < 0:
+            self.status(self.string_bundle.get_string('noMatchingImage'))
+            return
+        self.cur_img_idx = row
+        self.load_file(self.m_img_list[row])
+
     # Add chris
     def button_state(self, item=None):
         """ Function to handle difficult examples
@@ -878,7 +1027,11 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         else:
             shape = self.canvas.selected_shape
             if shape:
-                self.shapes_to_items[shape].setSelected(True)
+                item = self.shapes_to_items[shape]
+                # A shape picked on the canvas replaces the selection, one picked in the list joins it
+                if not item.isSelected():
+                    self.label_list.clearSelection()
+                    item.setSelected(True)
             else:
                 self.label_list.clearSelection()
         self.actions.delete.setEnabled(selected)
@@ -888,20 +1041,37 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.actions.shapeFillColor.setEnabled(selected)
 
     def add_label(self, shape):
-        shape.paint_label = self.display_label_option.isChecked()
-        if shape.group_id is None:
-            text = shape.label
-        else:
-            text = "{} ({})".format(shape.label, shape.group_id)
-        item = HashableQListWidgetItem(text)
-        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-        item.setCheckState(Qt.Checked)
-        item.setBackground(generate_color_by_text(shape.label))
-        self.items_to_shapes[item] = shape
-        self.shapes_to_items[shape] = item
-        self.label_list.addItem(item)
-        for action in self.actions.onShapesPresent:
-            action.setEnabled(True)
+        self.add_labels([shape])
+
+    def add_labels(self, shapes):
+        """
+        Add the list entries of shapes in one go: the list is redrawn and the
+        label filter is updated once, after all of them were added.
+        """
+        display_label = self.display_label_option.isChecked()
+        hidden = []
+        self.label_list.setUpdatesEnabled(False)
+        for shape in shapes:
+            shape.paint_label = display_label
+            item = HashableQListWidgetItem(self.label_text(shape))
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            # Checked as the label filter would, before the item is in the list and reports changes
+            if self.label_shown(shape.label):
+                item.setCheckState(Qt.Checked)
+            else:
+                item.setCheckState(Qt.Unchecked)
+                hidden.append(shape)
+            item.setBackground(generate_color_by_text(shape.label))
+            self.items_to_shapes[item] = shape
+            self.shapes_to_items[shape] = item
+            self.index_label(shape)
+            self.label_list.addItem(item)
+        self.label_list.setUpdatesEnabled(True)
+        if hidden:
+            self.canvas.set_shapes_visible(hidden, False)
+        if shapes:
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(True)
         self.update_combo_box()
 
     def remove_label(self, shape):
@@ -912,7 +1082,95 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.label_list.takeItem(self.label_list.row(item))
         del self.shapes_to_items[shape]
         del self.items_to_shapes[item]
+        self.unindex_label(shape)
+        self.update_combo_box()
+
+    def label_text(self, shape):
+        if shape.group_id is None:
+            return shape.label
+        return "{} ({})".format(shape.label, shape.group_id)
+
+    def selected_shapes(self):
+        """The shapes of the selected list items, or else the shape selected on the canvas."""
+        shapes = [self.items_to_shapes[item] for item in self.label_list.selectedItems()]
+        if not shapes and self.canvas.selected_shape:
+            shapes = [self.canvas.selected_shape]
+        return shapes
+
+    def delete_shapes(self, shapes):
+        """
+        Delete shapes from the canvas and the label list. The list, the
+        label filter, the canvas and the dirty state are updated once.
+        """
+        removed = set(shapes)
+        if not removed:
+            return
+        self.canvas.remove_shapes(removed)
+        blocked = self.label_list.blockSignals(True)
+        self.label_list.setUpdatesEnabled(False)
+        for row in reversed(range(self.label_list.count())):
+            item = self.label_list.item(row)
+            shape = self.items_to_shapes[item]
+            if shape in removed:
+                self.label_list.takeItem(row)
+                del self.items_to_shapes[item]
+                del self.shapes_to_items[shape]
+                self.unindex_label(shape)
+        self.label_list.setUpdatesEnabled(True)
+        self.label_list.blockSignals(blocked)
         self.update_combo_box()
+        self.set_dirty()
+        if self.no_shapes():
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(False)
+
+    def edit_shapes(self, shapes, label=None, group_id=None, line_color=None, fill_color=None, offset=None):
+        """
+        Relabel, recolor and move shapes in one pass; a new label also sets
+        group_id. offset is a QPointF, it is reduced to keep the shapes in
+        the image. The list, the label filter, the canvas and the dirty
+        state are updated once. Returns whether anything changed.
+        """
+        if not shapes:
+            return False
+        moved = offset is not None and self.canvas.move_shapes(shapes, offset.x(), offset.y())
+        if label is None and line_color is None and fill_color is None and not moved:
+            return False
+        blocked = self.label_list.blockSignals(True)
+        if label is not None:
+            color = generate_color_by_text(label)
+            for shape in shapes:
+                self.unindex_label(shape)
+                shape.label = label
+                shape.group_id = group_id
+                self.index_label(shape)
+                # Outlines take the color of the new label, as an edited list item gives them
+                shape.line_color = QColor(color)
+                item = self.shapes_to_items[shape]
+                item.setText(self.label_text(shape))
+                item.setBackground(generate_color_by_text(item.text()))
+        for shape in shapes:
+            if line_color is not None:
+                shape.line_color = line_color
+            if fill_color is not None:
+                shape.fill_color = fill_color
+        self.label_list.blockSignals(blocked)
+        if label is not None:
+            self.update_combo_box()
+            self.combo_set_show_label([label])
+        self.canvas.invalidate_layer()
+        self.set_dirty()
+        return True
+
+    def index_label(self, shape):
+        self.labels_to_shapes.setdefault(shape.label, set()).add(shape)
+
+    def unindex_label(self, shape):
+        shapes = self.labels_to_shapes.get(shape.label)
+        if shapes is not None:
+            shapes.discard(shape)
+            if not shapes:
+                del self.labels_to_shapes[shape.label]
 
     def load_labels(self, shapes):
         s = []
@@ -940,40 +1198,41 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             else:
                 shape.fill_color = generate_color_by_text(label)
 
-            self.add_label(shape)
-        self.update_combo_box()
+        self.add_labels(s)
         self.canvas.load_shapes(s)
 
     def update_combo_box(self):#Controls the display of the label type
-        items_text_list = [str(shape.label) for shape in self.items_to_shapes.values()]
-        unique_text_list = list(set(items_text_list))
+        unique_text_list = set(str(label) for label in self.labels_to_shapes)
         # Add a null row for showing all the labels
-        unique_text_list.append("")
-        for i in unique_text_list:
-            if i not in self.combo_list:
-                self.combo_list.append(i)
+        unique_text_list.add("")
+        unique_text_list.difference_update(self.combo_list)
+        if unique_text_list:
+            self.combo_list.extend(unique_text_list)
         self.combo_list.sort()
         self.combo_box.update_items(self.combo_list)
         self.qline.setText(",".join(self.combo_text_list))
-        self.combo_set_show_label()
 
     def save_labels(self, annotation_file_path):
         annotation_file_path = ustr(annotation_file_path)
         if self.label_file is None:
             self.label_file = LabelFile()
             self.label_file.verified = self.canvas.verified
+        self.label_file.save_queue = self.save_queue
 
         def format_shape(s):
             return dict(label=s.label,
                         group_id = s.group_id,
                         line_color=s.line_color.getRgb(),
                         fill_color=s.fill_color.getRgb(),
-                        points=[(p.x(), p.y()) for p in s.points],
+                        points=[tuple(p) for p in s.coords().tolist()],
                         shape_type=s.shape_type,
                         # add chris
                         difficult=s.difficult)
 
         shapes = [format_shape(shape) for shape in self.canvas.shapes]
+        if self.pure_mode.isChecked() and not shapes:
+            # The file gets removed below, a queued write must not bring it back.
+            self.save_queue.wait(annotation_file_path)
 
         # Can add different annotation formats here
         try:
@@ -983,6 +1242,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
                 if self.pure_mode.isChecked() and len(shapes) == 0:
                     if os.path.exists(annotation_file_path):
                         os.remove(annotation_file_path)
+                        self.annotation_index.record(self.file_path, self.default_save_dir, None, [], False)
                         return True
                     else:
                         return True
@@ -994,6 +1254,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
                 if self.pure_mode.isChecked() and len(shapes) == 0:
                     if os.path.exists(annotation_file_path):
                         os.remove(annotation_file_path)
+                        self.annotation_index.record(self.file_path, self.default_save_dir, None, [], False)
                         return True
                     else:
                         return True
@@ -1005,6 +1266,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
                 if self.pure_mode.isChecked() and len(shapes) == 0:
                     if os.path.exists(annotation_file_path):
                         os.remove(annotation_file_path)
+                        self.annotation_index.record(self.file_path, self.default_save_dir, None, [], False)
                         return True
                     else:
                         return True
@@ -1014,12 +1276,18 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
                 if self.pure_mode.isChecked() and len(shapes) == 0:
                     if os.path.exists(annotation_file_path):
                         os.remove(annotation_file_path)
+                        self.annotation_index.record(self.file_path, self.default_save_dir, None, [], False)
                         return True
                     else:
                         return True
                 self.label_file.save(annotation_file_path, shapes, self.file_path, self.image_data,
                                      self.line_color.getRgb(), self.fill_color.getRgb())
             print('Image:{0} -> Annotation:{1}'.format(self.file_path, annotation_file_path))
+            self.prefetcher.invalidate(self.file_path)
+            # The stamp is taken by annotation_saved once the queued write is on disk.
+            self.annotation_index.record(self.file_path, self.default_save_dir, annotation_file_path,
+                                         [shape['label'] for shape in shapes], self.label_file.verified,
+                                         written=self.label_file.save_queue is None)
             return True
         except LabelFileError as e:
             self.error_message(u'Error saving label data', u'<b>%s</b>' % e)
@@ -1032,22 +1300,49 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
 
     def combo_selection_changed(self):
         combo_text = self.combo_box.cb.currentText()
+        filtered = bool(self.combo_text_list)
         if combo_text == "":
             self.combo_text_list.clear()
         elif combo_text not in self.combo_text_list:
             self.combo_text_list.append(combo_text)
         elif combo_text in self.combo_text_list:
             self.combo_text_list.remove(combo_text)
-        self.combo_set_show_label()
+        if filtered and self.combo_text_list:
+            # Only the shapes with the toggled label change
+            self.combo_set_show_label([combo_text])
+        else:
+            self.combo_set_show_label()
         self.qline.setText(",".join(self.combo_text_list))
-    def combo_set_show_label(self):
-        for item,shape in self.items_to_shapes.items():
-            if self.combo_text_list == []:
-                item.setCheckState(2)
-            elif shape.label in self.combo_text_list:
-                item.setCheckState(2)
-            else:
-                item.setCheckState(0)
+    def label_shown(self, label):
+        """Whether the label filter shows shapes with label."""
+        return not self.combo_text_list or label in self.combo_text_list
+
+    def combo_set_show_label(self, labels=None):
+        """Show the shapes with labels, all labels by default, as the label filter says."""
+        if labels is None:
+            labels = list(self.labels_to_shapes)
+        shown, hidden = [], []
+        for label in labels:
+            show = self.label_shown(label)
+            changed = [shape for shape in self.labels_to_shapes.get(label, ())
+                       if self.canvas.isVisible(shape) != show]
+            (shown if show else hidden).extend(changed)
+        self.set_labels_checked(shown, True)
+        self.set_labels_checked(hidden, False)
+
+    def set_labels_checked(self, shapes, checked):
+        """
+        Check the list items of shapes and show them on the canvas, or hide
+        them. The canvas is updated once, not once per item.
+        """
+        if not shapes:
+            return
+        state = Qt.Checked if checked else Qt.Unchecked
+        blocked = self.label_list.blockSignals(True)
+        for shape in shapes:
+            self.shapes_to_items[shape].setCheckState(state)
+        self.label_list.blockSignals(blocked)
+        self.canvas.set_shapes_visible(shapes, checked)
 
     # items--->box
     def label_selection_changed(self):
@@ -1166,6 +1461,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             # self.canvas.undoLastLine()
             self.canvas.reset_all_lines()
     def scroll_request(self, delta, orientation):
+        self.canvas.begin_interaction()
         units = - delta / (8 * 15)
         bar = self.scroll_bars[orientation]
         bar.setValue(bar.value() + bar.singleStep() * units)
@@ -1180,6 +1476,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.set_zoom(self.zoom_widget.value() + increment)
 
     def zoom_request(self, delta):
+        self.canvas.begin_interaction()
         # get the current scrollbar positions
         # calculate the percentages ~ coordinates
         h_bar = self.scroll_bars[Qt.Horizontal]#
@@ -1244,8 +1541,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.adjust_scale()
 
     def toggle_polygons(self, value):
-        for item, shape in self.items_to_shapes.items():
-            item.setCheckState(Qt.Checked if value else Qt.Unchecked)
+        self.set_labels_checked(list(self.shapes_to_items), value)
 
     def load_file(self, file_path=None):
         """Load the specified file, or the last opened file if None."""
@@ -1262,14 +1558,16 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         unicode_file_path = os.path.abspath(unicode_file_path)
         # Tzutalin 20160906 : Add file list and dock to move faster，Tzutalin 20160906:
         # Highlight the file item
-        if unicode_file_path and self.file_list_widget.count() > 0:
-            if unicode_file_path in self.m_img_list:
-                index = self.m_img_list.index(unicode_file_path)
-                file_widget_item = self.file_list_widget.item(index)
-                file_widget_item.setSelected(True)
+        if unicode_file_path and len(self.m_img_list) > 0:
+            row = self.m_img_list.find(unicode_file_path)
+            if row >= 0:
+                index = self.file_list_model.index(row)
+                self.file_list_view.setCurrentIndex(index)
+                self.file_list_view.scrollTo(index)
+                self.filmstrip_view.setCurrentIndex(index)
+                self.filmstrip_view.scrollTo(index)
             else:
-                self.file_list_widget.clear()
-                self.m_img_list.clear()
+                self.file_list_model.clear()
 
         if unicode_file_path and os.path.exists(unicode_file_path):
             if LabelFile.is_label_file(unicode_file_path):
@@ -1289,11 +1587,20 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             else:
                 # Load image:
                 # read data first and store for saving into label file.
-                self.image_data = read(unicode_file_path, None)
+                if should_tile(unicode_file_path):
+                    self.image_data = TiledImageSource(unicode_file_path)
+                else:
+                    self.pin_image(unicode_file_path)
+                    self.image_data = None
+                    if unicode_file_path not in self.prefetcher.images:
+                        # Show a screen sized preview first, the full image is decoded in the background.
+                        self.image_data = read_preview(unicode_file_path, self.preview_size())
+                    if self.image_data is None:
+                        self.image_data = self.prefetcher.get_image(unicode_file_path)
                 self.label_file = None
                 self.canvas.verified = False
 
-            if isinstance(self.image_data, QImage):
+            if isinstance(self.image_data, (QImage, TiledImageSource, PreviewImage)):
                 image = self.image_data
             else:
                 image = QImage.fromData(self.image_data)
@@ -1305,7 +1612,14 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             self.status("Loaded %s" % os.path.basename(unicode_file_path))
             self.image = image
             self.file_path = unicode_file_path
-            self.canvas.load_pixmap(QPixmap.fromImage(image))
+            if isinstance(image, TiledImageSource):
+                self.canvas.load_tiles(image)
+            elif isinstance(image, PreviewImage):
+                self.canvas.load_image(image.image, image.size())
+                self.prefetcher.request(unicode_file_path, self.default_save_dir)
+            else:
+                self.canvas.load_image(image)
+            self.update_image_cache_status()
             if self.label_file:
                 self.load_labels(self.label_file.shapes)
             self.update_combo_box()
@@ -1316,6 +1630,8 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             self.add_recent_file(self.file_path)
             self.toggle_actions(True)
             self.show_bounding_box_from_annotation_file(file_path)
+            if unicode_file_path in self.m_img_list:
+                self.prefetcher.navigate(self.m_img_list, self.cur_img_idx, self.default_save_dir)
 
             counter = self.counter_str()
             self.setWindowTitle(__appname__ + ' ' + file_path + ' ' + counter)
@@ -1329,6 +1645,38 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             return True
         return False
 
+    def preview_size(self):
+        """Longest side, in device pixels, of a preview which fills the canvas area."""
+        size = self.centralWidget().size()
+        return int(max(size.width(), size.height(), 1024) * self.devicePixelRatioF())
+
+    def full_image_loaded(self, path):
+        """Swap the full resolution image in for the preview once it is decoded."""
+        if isinstance(self.image, PreviewImage) and path == self.file_path:
+            self.load_full_image()
+
+    def load_full_image(self):
+        preview = self.image
+        image = self.prefetcher.get_image(preview.path)
+        if image is None or image.isNull() or image.size() != preview.size():
+            return
+        self.image = self.image_data = image
+        self.canvas.replace_image(image)
+        self.update_image_cache_status()
+
+    def pin_image(self, path):
+        """Keep the image shown in the image cache whatever its budget."""
+        if self._pinned_path is not None:
+            self.image_cache.unpin(self._pinned_path)
+        self._pinned_path = path
+        self.image_cache.pin(path)
+
+    def update_image_cache_status(self):
+        stats = self.image_cache.stats()
+        self.label_image_cache.setText('%s: %d / %d MB' % (self.string_bundle.get_string('imageCache'),
+                                                          stats['bytes'] >> 20, stats['budget'] >> 20))
+        self.label_image_cache.setToolTip('hits %(hits)d, misses %(misses)d, evictions %(evictions)d' % stats)
+
     def counter_str(self):
         """
         Converts image counter to string representation.
@@ -1336,6 +1684,19 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         return '[{} / {}]'.format(self.cur_img_idx + 1, self.img_count)
 
     def show_bounding_box_from_annotation_file(self, file_path):
+        # A save of this image may still be queued, read what it is going to write.
+        for prefix in self.annotation_prefixes(file_path):
+            self.save_queue.wait(prefix)
+        cached = self.prefetcher.get_annotation(os.path.abspath(file_path), self.default_save_dir)
+        if cached is not None:
+            annotation_path, label_format, shapes, verified = cached
+            if annotation_path is not None and self.file_path is not None:
+                self.set_format({LabelFileFormat.PASCAL_VOC: FORMAT_PASCALVOC,
+                                 LabelFileFormat.YOLO: FORMAT_YOLO,
+                                 LabelFileFormat.CREATE_ML: FORMAT_CREATEML}[label_format])
+                self.load_labels(shapes)
+                self.canvas.verified = verified
+            return
         if self.default_save_dir is not None:
             basename = os.path.basename(os.path.splitext(file_path)[0])
             xml_path = os.path.join(self.default_save_dir, basename + XML_EXT)
@@ -1370,6 +1731,9 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
     def paint_canvas(self):
         assert not self.image.isNull(), "cannot paint null image"
         self.canvas.scale = 0.01 * self.zoom_widget.value()
+        if isinstance(self.image, PreviewImage) and self.canvas.scale > self.image.resolution():
+            # Zoomed in past the preview, do not wait for the background decode.
+            self.load_full_image()
         self.canvas.label_font_size = int(0.02 * max(self.image.width(), self.image.height()))
         self.canvas.adjustSize()
         self.canvas.update()
@@ -1385,19 +1749,47 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         h1 = self.centralWidget().height() - e
         a1 = w1 / h1
         # Calculate a new scale value based on the pixmap's aspect ratio.
-        w2 = self.canvas.pixmap.width() - 0.0
-        h2 = self.canvas.pixmap.height() - 0.0
+        w2 = self.canvas.image_size.width() - 0.0
+        h2 = self.canvas.image_size.height() - 0.0
         a2 = w2 / h2
         return w1 / w2 if a2 >= a1 else h1 / h2
 
     def scale_fit_width(self):
         # The epsilon does not seem to work too well here.
         w = self.centralWidget().width() - 2.0
-        return w / self.canvas.pixmap.width()
+        return w / self.canvas.image_size.width()
+
+    def annotation_prefixes(self, file_path):
+        """Prefixes shared by the possible annotation files of file_path."""
+        basename = os.path.splitext(os.path.abspath(file_path))[0]
+        prefixes = [basename + '.']
+        if self.default_save_dir is not None:
+            prefixes.append(os.path.join(self.default_save_dir, os.path.basename(basename)) + '.')
+        return prefixes
+
+    def annotation_saved(self, annotation_path):
+        # A newer save of the same file may already be queued behind this one.
+        if annotation_path not in self.save_queue.pending(annotation_path):
+            self.annotation_index.written(annotation_path)
+
+    def save_failed(self, annotation_path, message):
+        self._save_failed = True
+        if self.file_path is not None and any(annotation_path.startswith(prefix)
+                                              for prefix in self.annotation_prefixes(self.file_path)):
+            # The shapes are still shown, let the user save them again.
+            self.set_dirty()
+        self.status('Error saving %s' % annotation_path)
+        self.error_message(u'Error saving label data', u'<b>%s</b><p>%s' % (message, annotation_path))
 
     def closeEvent(self, event):
         if not self.may_continue():
             event.ignore()
+        # Everything saved so far has to be on disk before quitting.
+        self._save_failed = False
+        self.save_queue.flush()
+        QApplication.processEvents()
+        if self._save_failed:
+            event.ignore()
         settings = self.settings
         # If it loads images from dir, don't load it at the beginning
         if self.dir_name is None:
@@ -1427,6 +1819,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         settings[SETTING_PURE_MODE] = self.pure_mode.isChecked()
         settings[SETTING_SINGLE_CLASS] = self.single_class_mode.isChecked()
         settings[SETTING_PAINT_LABEL] = self.display_label_option.isChecked()
+        settings[SETTING_ADAPTIVE_QUALITY] = self.adaptive_quality_option.isChecked()
         settings[SETTING_DRAW_SQUARE] = self.draw_squares_option.isChecked()
         settings[SETTING_DRAW_MODE] = self.Switching_annotation_mode.isChecked()
         settings[SETTING_LABEL_FILE_FORMAT] = self.label_file_format
@@ -1436,24 +1829,26 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             if self.settings.get(self.last_open_dir):
                 settings.pop(self.last_open_dir)
         settings.save()
+        if event.isAccepted():
+            self._open_after_scan = False
+            self.cancel_dir_scan()
+            self.dir_watcher.shutdown()
+            self.canvas.scaled_image.shutdown()
+            self.prefetcher.shutdown()
+            self.thumbnail_loader.shutdown()
+            self.annotation_index.close()
+            self.save_queue.shutdown()
 
     def load_recent(self, filename):
         
         if self.may_continue():
             self.load_file(filename)
 
+    def image_extensions(self):
+        return ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
+
     def scan_all_images(self, folder_path):
-        extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
-        images = []
-
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relative_path = os.path.join(root, file)
-                    path = ustr(os.path.abspath(relative_path))
-                    images.append(path)
-        natural_sort(images, key=lambda x: x.lower())
-        return images
+        return [ustr(path) for path in iter_images(folder_path, self.image_extensions())]
 
     def change_save_dir_dialog(self, _value=False):
         if self.default_save_dir is not None:
@@ -1466,7 +1861,11 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
                                                          | QFileDialog.DontResolveSymlinks))
 
         if dir_path is not None and len(dir_path) > 1:
+            self.save_queue.flush()
             self.default_save_dir = dir_path
+            self.file_list_model.refresh_status()
+            self.annotation_index.cancel()
+            self.annotation_index.build(self.m_img_list, self.default_save_dir, max(self.cur_img_idx, 0))
 
         self.statusBar().showMessage('%s . Annotation will be saved to %s' %
                                      ('Change saved folder', self.default_save_dir))
@@ -1513,13 +1912,105 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         self.last_open_dir = dir_path
         self.dir_name = dir_path
         self.file_path = None
-        self.file_list_widget.clear()
-        self.m_img_list = self.scan_all_images(dir_path)
+        self.save_queue.flush()
+        self.prefetcher.clear()
+        self.thumbnail_loader.clear()
+        self.annotation_index.cancel()
+        # The list being replaced is not opened from or updated any more.
+        self._open_after_scan = False
+        self._deltas_during_scan = []
+        self.cancel_dir_scan()
+        self.dir_watcher.clear()
+        self.dir_watcher.watch(dir_path)
+        self.m_img_list = PathStore()
+        self.file_list_model.set_paths(self.m_img_list)
+        self.img_count = 0
+        self._open_after_scan = True
+
+        # Images are streamed into the list while the scan runs in the background
+        scanner = ImageScanner(dir_path, self.image_extensions(), self)
+        scanner.found.connect(partial(self.dir_images_found, scanner))
+        scanner.progress.connect(partial(self.dir_scan_progress, scanner))
+        scanner.finished.connect(partial(self.dir_scan_finished, scanner))
+        self.dir_scanner = scanner
+        self.scan_progress.setFormat(self.string_bundle.get_string('scanningDir') + ' %d' % 0)
+        self.scan_progress.show()
+        self.scan_cancel_button.show()
+        scanner.start()
+
+    def dir_images_found(self, scanner, paths):
+        if scanner is not self.dir_scanner:
+            return
+        # Watcher deltas wait for the end of the scan, so none of them is listed yet
+        paths = [ustr(path) for path in paths]
+        self.file_list_model.append_paths(paths)
+        self.dir_watcher.add_paths(paths)
+        self.annotation_index.build(paths, self.default_save_dir)
+        self.img_count = len(self.m_img_list)
+        if self._open_after_scan:
+            # Open the first image (or the one opened last time) as soon as it is found
+            last_file = self.settings.get(self.last_open_dir)
+            if not last_file or last_file in paths:
+                self._open_after_scan = False
+                self.open_next_image()
+
+    def dir_images_added(self, paths):
+        """Insert images created in the watched directory at their sorted position."""
+        if self.dir_scanner is not None:
+            # The list is only partly there, the scan may still emit these.
+            self._deltas_during_scan.append((self.dir_images_added, paths))
+            return
+        paths = [ustr(path) for path in paths if path not in self.m_img_list]
+        rows = self.file_list_model.merge_paths(paths, path_sort_key)
+        if self.file_path is not None:
+            self.cur_img_idx += bisect.bisect_right(rows, self.cur_img_idx)
+        self.annotation_index.build(paths, self.default_save_dir)
         self.img_count = len(self.m_img_list)
-        self.open_next_image()
-        for imgPath in self.m_img_list:
-            item = QListWidgetItem(imgPath)
-            self.file_list_widget.addItem(item)
+        self.update_counter()
+
+    def dir_images_removed(self, paths):
+        """Drop deleted or renamed images from the list, the current image keeps its row."""
+        if self.dir_scanner is not None:
+            self._deltas_during_scan.append((self.dir_images_removed, paths))
+            return
+        shown = self.m_img_list.find(self.file_path) if self.file_path is not None else -1
+        rows = self.file_list_model.remove_paths([ustr(path) for path in paths])
+        if self.file_path is not None:
+            # If the shown image is gone, "next" continues with the one that took its row.
+            gone = shown == self.cur_img_idx and shown in rows
+            self.cur_img_idx -= bisect.bisect_left(rows, self.cur_img_idx) + (1 if gone else 0)
+        self.img_count = len(self.m_img_list)
+        self.update_counter()
+
+    def update_counter(self):
+        if self.file_path is not None:
+            self.setWindowTitle(__appname__ + ' ' + self.file_path + ' ' + self.counter_str())
+
+    def dir_scan_progress(self, scanner, count):
+        if scanner is self.dir_scanner:
+            self.scan_progress.setFormat(self.string_bundle.get_string('scanningDir') + ' %d' % count)
+
+    def dir_scan_finished(self, scanner):
+        if scanner is not self.dir_scanner:
+            return
+        self.dir_scanner = None
+        scanner.deleteLater()
+        self.scan_progress.hide()
+        self.scan_cancel_button.hide()
+        deltas, self._deltas_during_scan = self._deltas_during_scan, []
+        for apply_delta, paths in deltas:
+            apply_delta(paths)
+        if self._open_after_scan:
+            self._open_after_scan = False
+            self.open_next_image()
+        self.update_counter()
+
+    def cancel_dir_scan(self):
+        scanner = self.dir_scanner
+        if scanner is not None:
+            scanner.cancel()
+            scanner.wait()
+            self.dir_scan_finished(scanner)
 
     def verify_image(self, _value=False):
         # Proceeding next image without dialog if having any label
@@ -1702,11 +2193,18 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
         delete_path = self.file_path
         if delete_path is not None:
             self.open_next_image()
-            self.cur_img_idx -= 1
-            self.img_count -= 1
             if os.path.exists(delete_path):
                 os.remove(delete_path)
-            self.import_dir_images(self.last_open_dir)
+            if delete_path in self.m_img_list:
+                # Apply the removal right away instead of rescanning the directory.
+                self.dir_watcher.refresh(os.path.dirname(delete_path))
+                self.dir_images_removed([delete_path])
+            if self.file_path == delete_path:
+                # It was the last image, show the one before it.
+                self.reset_state()
+                if self.img_count > 0:
+                    self.cur_img_idx = self.img_count - 1
+                    self.load_file(self.m_img_list[self.cur_img_idx])
 
     def reset_all(self):
         self.settings.reset()
@@ -1751,42 +2249,26 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             self.line_color = color
             Shape.line_color = color
             self.canvas.set_drawing_color(color)
-            self.canvas.update()
+            self.canvas.invalidate_layer()
             self.set_dirty()
 
     def delete_selected_shape(self):
-        self.remove_label(self.canvas.delete_selected())
-        self.set_dirty()
-        if self.no_shapes():
-            for action in self.actions.onShapesPresent:
-                action.setEnabled(False)
+        self.delete_shapes(self.selected_shapes())
+
     def delete_all_shape(self):
-        for shape in self.canvas.shapes:
-            self.remove_label(shape)
-            self.canvas.shapes.remove(shape)
-            self.canvas.update()#删除框之后,更新画布
-            self.set_dirty()
-            if len(self.canvas.shapes) !=0:
-                self.delete_all_shape()
-            if self.no_shapes():
-                for action in self.actions.onShapesPresent:
-                    action.setEnabled(False)
+        self.delete_shapes(list(self.canvas.shapes))
 
     def choose_shape_line_color(self):
         color = self.color_dialog.getColor(self.line_color, u'Choose Line Color',
                                            default=DEFAULT_LINE_COLOR)
         if color:
-            self.canvas.selected_shape.line_color = color
-            self.canvas.update()
-            self.set_dirty()
+            self.edit_shapes(self.selected_shapes(), line_color=color)
 
     def choose_shape_fill_color(self):
         color = self.color_dialog.getColor(self.fill_color, u'Choose Fill Color',
                                            default=DEFAULT_FILL_COLOR)
         if color:
-            self.canvas.selected_shape.fill_color = color
-            self.canvas.update()
-            self.set_dirty()
+            self.edit_shapes(self.selected_shapes(), fill_color=color)
 
     def copy_shape(self):
         self.canvas.end_move(copy=True)
@@ -1827,7 +2309,7 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
             return
 
         self.set_format(FORMAT_YOLO)
-        t_yolo_parse_reader = YoloReader(txt_path, self.image)
+        t_yolo_parse_reader = YoloReader(txt_path, self.file_path)
         shapes = t_yolo_parse_reader.get_shapes()
         # print(shapes)
         self.load_labels(shapes)
@@ -1856,6 +2338,10 @@ class MainWindow(QMainWindow, WindowMixin):#MainWindow
     def toggle_paint_labels_option(self):
         for shape in self.canvas.shapes:
             shape.paint_label = self.display_label_option.isChecked()
+        self.canvas.invalidate_layer()
+
+    def toggle_adaptive_quality(self):
+        self.canvas.set_adaptive_quality(self.adaptive_quality_option.isChecked())
 
     def toggle_draw_square(self):
         self.canvas.set_drawing_shape_to_square(self.draw_squares_option.isChecked())
@@ -1872,15 +2358,24 @@ def read(filename, default=None):
     try:
         reader = QImageReader(filename)
         reader.setAutoTransform(True)
-        return reader.read()
+        return paintable(reader.read())
     except:
         return default
 
 
-def get_main_app(argv=[]):
+def read_untiled(filename, default=None):
+    """Like read(), but skip images that are shown tiled instead of decoded whole."""
+    if should_tile(filename):
+        return default
+    return read(filename, default)
+
+
+def get_main_app(argv=[], index_path=DEFAULT_INDEX_PATH, thumbnail_cache_path=DEFAULT_CACHE_PATH):
     """
     Standard boilerplate Qt application code.
     Do everything but app.exec_() -- so that we can test the application in one thread
+    index_path and thumbnail_cache_path are the databases of the annotation
+    index and of the thumbnails, both in the home directory by default.
     标准样板Qt应用程序代码。
     做除了app.exec_()以外的所有事情——以便我们可以在一个线程中测试应用程序
     """
@@ -1903,7 +2398,9 @@ def get_main_app(argv=[]):
     # Usage : labelImg.py image classFile saveDir使用方法:labelImg.py图像类文件保存目录
     win = MainWindow(args.image_dir,
                      args.class_file,
-                     args.save_dir)#将三个参数传入到MainWindow方法中执行
+                     args.save_dir,
+                     index_path,
+                     thumbnail_cache_path)#将三个参数传入到MainWindow方法中执行
     win.show()
     return app, win
 
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent index of the annotation status of every image.
+
+For each image and save dir it records whether an annotation file exists,
+the number of objects per label, the verified flag and the stamp of the
+annotation file. The index is built on worker threads, files whose stamp did
+not change are not parsed again, and it is updated in place whenever labels
+are saved, so questions like "which is the next unverified image" are
+answered without touching the disk.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PyQt5.QtCore import QObject, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QObject, pyqtSignal
+
+from libs.labelFile import LabelFile, LabelFileFormat
+from libs.pascal_voc_io import PascalVocReader
+from libs.create_ml_io import CreateMLReader
+from libs.prefetch import file_stamp
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.labelImgAnnotations.db')
+
+AnnotationStatus = namedtuple('AnnotationStatus', ['annotation_path', 'stamp', 'verified', 'counts'])
+# Status of an image without annotation file.
+NO_ANNOTATION = AnnotationStatus(None, None, False, {})
+
+
+def count_yolo_labels(annotation_path):
+    """Objects per label of a YOLO file, the image size is not needed for this."""
+    classes_path = os.path.join(os.path.dirname(os.path.realpath(annotation_path)), 'classes.txt')
+    with open(classes_path, 'r') as f:
+        classes = f.read().strip('\n').split('\n')
+    counts = {}
+    with open(annotation_path, 'r') as f:
+        for line in f:
+            if line.strip():
+                label = classes[int(line.split(' ', 1)[0])]
+                counts[label] = counts.get(label, 0) + 1
+    return counts
+
+
+def read_status(image_path, save_dir, known=None):
+    """
+    Return the AnnotationStatus of image_path; known is a previous status
+    which is returned as is if the annotation file did not change.
+    """
+    annotation_path, label_format = LabelFile.find_annotation_file(image_path, save_dir)
+    if annotation_path is None:
+        return NO_ANNOTATION
+    stamp = file_stamp(annotation_path)
+    if known is not None and known.annotation_path == annotation_path and known.stamp == stamp:
+        return known
+    verified = False
+    try:
+        if label_format == LabelFileFormat.YOLO:
+            counts = count_yolo_labels(annotation_path)
+        else:
+            if label_format == LabelFileFormat.PASCAL_VOC:
+                reader = PascalVocReader(annotation_path)
+            else:
+                reader = CreateMLReader(annotation_path, image_path)
+            verified = reader.verified
+            counts = label_counts(shape[0] for shape in reader.get_shapes())
+    except (IOError, OSError, ValueError, IndexError) as e:
+        print('Can not index %s: %s' % (annotation_path, e))
+        counts = {}
+    return AnnotationStatus(annotation_path, stamp, verified, counts)
+
+
+def label_counts(labels):
+    counts = {}
+    for label in labels:
+        counts[label] = counts.get(label, 0) + 1
+    return counts
+
+
+class AnnotationIndex(QObject):
+    """
+    In-memory map from (image path, save dir) to AnnotationStatus, backed by
+    a SQLite file so that it survives restarts.
+
+    build() scans paths on worker threads and emits updated(paths) for every
+    finished chunk; record() updates one image after its labels were saved.
+    Lookups never read annotation files, get() returns None until the
+    image is indexed.
+    _entries is shared with the workers and only touched under _entries_lock.
+    """
+    updated = pyqtSignal(list)
+
+    CHUNK_SIZE = 512
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, workers=4, parent=None):
+        super(AnnotationIndex, self).__init__(parent)
+        self._entries = {}
+        self._entries_lock = threading.Lock()
+        # Annotation paths recorded before their queued write landed, and their key.
+        self._unwritten = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._db = None
+        if path is not None:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute('CREATE TABLE IF NOT EXISTS annotations ('
+                                 'image_path TEXT, save_dir TEXT, annotation_path TEXT, '
+                                 'mtime INTEGER, size INTEGER, verified INTEGER, counts TEXT, '
+                                 'PRIMARY KEY (image_path, save_dir))')
+                self._db.commit()
+            except sqlite3.Error as e:
+                print('Annotation index is not persistent: %s' % e)
+                self._db = None
+
+    # Lookups.
+    def get(self, image_path, save_dir):
+        """Return the indexed AnnotationStatus, or None if image_path was not indexed yet."""
+        with self._entries_lock:
+            return self._entries.get((image_path, save_dir or ''))
+
+    def labels(self, save_dir=None):
+        """All labels which occur in the indexed annotations of save_dir."""
+        with self._entries_lock:
+            entries = list(self._entries.items())
+        result = set()
+        for (_, entry_dir), entry in entries:
+            if entry_dir == (save_dir or ''):
+                result.update(entry.counts)
+        return sorted(result)
+
+    def find_next(self, paths, start, save_dir, predicate, step=1):
+        """
+        Row of the first image after start, wrapping around, whose status
+        satisfies predicate; -1 if there is none. Images which are not indexed
+        yet are skipped rather than read on the calling (GUI) thread.
+        """
+        count = len(paths)
+        for offset in range(1, count + 1):
+            row = (start + offset * step) % count
+            entry = self.get(paths[row], save_dir)
+            if entry is not None and predicate(entry):
+                return row
+        return -1
+
+    # Updates.
+    def build(self, paths, save_dir, first=0):
+        """
+        Index paths in the background; files which did not change are not
+        parsed again. paths[first:] is queued before the paths above it, so
+        the images from the current one on are indexed first.
+        """
+        paths = list(paths)
+        paths = paths[first:] + paths[:first]
+        generation = self._generation
+        for first in range(0, len(paths), self.CHUNK_SIZE):
+            self._executor.submit(self._build_chunk, paths[first:first + self.CHUNK_SIZE],
+                                  save_dir or '', generation)
+
+    def _build_chunk(self, paths, save_dir, generation):
+        if generation != self._generation:
+            return
+        try:
+            for path in paths:
+                self._index_one(path, save_dir)
+            self._commit()
+            self.updated.emit(paths)
+        except Exception as e:
+            print('Annotation index failed: %s' % e)
+
+    def _index_one(self, image_path, save_dir):
+        key = (image_path, save_dir)
+        with self._entries_lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached.annotation_path in self._unwritten:
+                # Its file still has the content from before the queued save.
+                return cached
+        known = cached or self._load(key)
+        entry = read_status(image_path, save_dir or None, known)
+        with self._entries_lock:
+            current = self._entries.get(key)
+            if current is not cached:
+                # record() or another worker got there first, keep theirs.
+                return current
+            self._entries[key] = entry
+        if entry is not known:
+            self._store(key, entry)
+        return entry
+
+    def record(self, image_path, save_dir, annotation_path, labels, verified, written=True):
+        """
+        Update the index after the labels of image_path were saved to
+        annotation_path, or after its annotation was removed if that is None.
+        If the write is still queued (written False) the entry gets no stamp
+        until written() is called for annotation_path.
+        """
+        key = (image_path, save_dir or '')
+        if annotation_path is None:
+            entry = NO_ANNOTATION
+        else:
+            stamp = file_stamp(annotation_path) if written else None
+            entry = AnnotationStatus(annotation_path, stamp, bool(verified), label_counts(labels))
+        with self._entries_lock:
+            self._entries[key] = entry
+            if annotation_path is not None and not written:
+                self._unwritten[annotation_path] = key
+        self._store(key, entry)
+        self._commit()
+        self.updated.emit([image_path])
+
+    def written(self, annotation_path):
+        """Take the stamp of annotation_path once its latest recorded content is on disk."""
+        with self._entries_lock:
+            key = self._unwritten.pop(annotation_path, None)
+            entry = self._entries.get(key)
+            if entry is None or entry.annotation_path != annotation_path:
+                return
+            entry = entry._replace(stamp=file_stamp(annotation_path))
+            self._entries[key] = entry
+        self._store(key, entry)
+        self._commit()
+
+    def cancel(self):
+        """Drop the chunks of earlier build() calls which did not start yet."""
+        self._generation += 1
+
+    # Persistence.
+    def _load(self, key):
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT annotation_path, mtime, size, verified, counts FROM annotations '
+                                   'WHERE image_path = ? AND save_dir = ?', key).fetchone()
+        if row is None:
+            return None
+        if row[0] is None:
+            return NO_ANNOTATION
+        return AnnotationStatus(row[0], (row[1], row[2]), bool(row[3]), json.loads(row[4]))
+
+    def _store(self, key, entry):
+        if self._db is None:
+            return
+        stamp = entry.stamp or (None, None)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             key + (entry.annotation_path, stamp[0], stamp[1], int(entry.verified),
+                                    json.dumps(entry.counts)))
+
+    def _commit(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.commit()
+
+    def close(self):
+        self.cancel()
+        self._executor.shutdown(wait=True)
+        if self._db is not None:
+            with self._lock:
+                self._db.commit()
+                self._db.close()
+            self._db = None
@@ -8,8 +8,16 @@ except ImportError:
     from PyQt4.QtCore import *
 
 # from PyQt4.QtOpenGL import *
+import math
+import time
 
+import numpy as np
+
+from libs.levelOfDetail import LevelOfDetail
+from libs.scaledImage import ScaledImage
 from libs.shape import Shape
+from libs.shapeRenderer import ShapeRenderer, line_width
+from libs.spatialIndex import ShapeIndex
 from libs.utils import distance
 
 CURSOR_DEFAULT = Qt.ArrowCursor
@@ -21,6 +29,39 @@ CURSOR_GRAB = Qt.OpenHandCursor
 # class Canvas(QGLWidget):
 
 
+class FrameStats(object):
+    """
+    Paint times, the number of input events which were folded into each paint
+    and how many paints used the cheap interactive render quality.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.events = 0
+        self.interactive_frames = 0
+        self.paint_seconds = 0.0
+        self.max_paint_seconds = 0.0
+
+    def add_frame(self, seconds, events, interactive=False):
+        self.frames += 1
+        self.events += events
+        self.interactive_frames += bool(interactive)
+        self.paint_seconds += seconds
+        self.max_paint_seconds = max(self.max_paint_seconds, seconds)
+
+    def report(self):
+        frames = max(self.frames, 1)
+        return {'frames': self.frames,
+                'events': self.events,
+                'interactive_frames': self.interactive_frames,
+                'frame_ms': 1000.0 * self.paint_seconds / frames,
+                'max_frame_ms': 1000.0 * self.max_paint_seconds,
+                'events_per_frame': float(self.events) / frames}
+
+
 class Canvas(QWidget):
     zoomRequest = pyqtSignal(int)
     scrollRequest = pyqtSignal(int, int)
@@ -34,12 +75,23 @@ class Canvas(QWidget):
     _createMode = None
     _fill_drawing = False
     epsilon = 11.0
+    # Mouse moves faster than this are painted together, one paint per display frame
+    FRAME_INTERVAL_MS = 16
+    # Widget pixels cached around the visible area so that scrolling does not rebuild the layer
+    LAYER_MARGIN = 256
+    # From this zoom on image pixels are drawn as sharp squares instead of being interpolated
+    NEAREST_NEIGHBOUR_SCALE = 4.0
+    # Panning, zooming and dragging paint without antialiasing until input is idle this long
+    INTERACTION_IDLE_MS = 150
 
     def __init__(self, *args, **kwargs):
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
         self.shapes = []
+        # Bounding boxes of self.shapes for hit-testing, kept in sync by add_shape,
+        # remove_shape and shape_changed
+        self.shape_index = ShapeIndex()
         self.shapesBackups = []
         self.current = None
         self.selected_shape = None  # save the selected shape here
@@ -52,7 +104,12 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.label_font_size = 8
-        self.pixmap = QPixmap()
+        # Image shown, the QImage held by the image cache; there is no QPixmap copy of it
+        self.image = QImage()
+        # Tiled source used instead of image for very large images
+        self.tiles = None
+        # Size of the image in image coordinates, shapes live in this space
+        self.image_size = QSize()
         self.visible = {}
         self._hide_background = False
         self.hide_background = False
@@ -72,6 +129,7 @@ class Canvas(QWidget):
         # Set widget options.
         self.setMouseTracking(True)
         self.setFocusPolicy(Qt.WheelFocus)
+        self.setAutoFillBackground(True)
         self.verified = False
         self.draw_square = False
         self.draw_double = False
@@ -79,6 +137,58 @@ class Canvas(QWidget):
         # initialisation for panning平移的初始化
         self.pan_initial_pos = QPoint()
 
+        # Paints requested by input events are coalesced to one per frame
+        self.frame_stats = FrameStats()
+        self._frame_events = 0
+        self._paint_pending = False
+        self._last_frame = 0.0
+        self._status_text = None
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self.flush_frame)
+        self._dirty = QRegion()
+        self._dirty_all = False
+
+        # Render quality is lowered while the user pans, zooms or drags, see begin_interaction
+        self.adaptive_quality = True
+        self.interacting = False
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self.end_interaction)
+
+        # The image and the shapes which are neither selected nor hovered are
+        # painted once into this pixmap, which covers self._layer_rect (widget
+        # coordinates); paints only copy it and draw the interactive shapes on top.
+        self._layer = None
+        self._layer_rect = QRect()
+        self._layer_key = None
+        self._layer_version = 0
+        self._layer_low_quality = False
+        self.layer_builds = 0
+        # Zoomed out, the layer leaves out vertex handles, vertices and labels too small to see
+        self.level_of_detail = LevelOfDetail()
+        self.renderer = ShapeRenderer()
+        # Paths of the shape being drawn, see drawing_preview
+        self._preview = None
+        self._rubber_band_brush = QBrush(Qt.BDiagPattern)
+        # Zoomed out, the image is drawn from a copy scaled in the background
+        self.scaled_image = ScaledImage(self)
+        self.scaled_image.ready.connect(self.invalidate_layer)
+
+    @property
+    def verified(self):
+        return self._verified
+
+    @verified.setter
+    def verified(self, value):
+        self._verified = value
+        pal = self.palette()
+        if value:
+            pal.setColor(self.backgroundRole(), QColor(184, 239, 38, 128))
+        else:
+            pal.setColor(self.backgroundRole(), QColor(232, 232, 232, 255))
+        self.setPalette(pal)
+
     def set_drawing_color(self, qcolor):
         self.drawing_line_color = qcolor
         self.drawing_rect_color = qcolor
@@ -110,10 +220,104 @@ class Canvas(QWidget):
         self.prev_point = QPointF()
         self.repaint()
 
+    def schedule_update(self, rect=None):
+        """
+        Request a paint from an input event. It happens at once if the last
+        frame is at least FRAME_INTERVAL_MS ago, otherwise all requests until
+        the next frame are folded into one paint. rect limits the paint to
+        the widget area which changed.
+        """
+        if rect is None:
+            self._dirty_all = True
+        elif not rect.isEmpty():
+            self._dirty += rect
+        self._paint_pending = True
+        wait = self._frame_wait()
+        if wait <= 0:
+            self.flush_frame()
+        elif not self._frame_timer.isActive():
+            self._frame_timer.start(wait)
+
+    def set_status_text(self, text):
+        """Show text in the status bar with the next frame."""
+        self._status_text = text
+        if not self._frame_timer.isActive():
+            self._frame_timer.start(max(0, self._frame_wait()))
+
+    def _frame_wait(self):
+        """Milliseconds until the next frame is due."""
+        return int(math.ceil(self.FRAME_INTERVAL_MS - (time.perf_counter() - self._last_frame) * 1000.0))
+
+    def flush_frame(self):
+        self._frame_timer.stop()
+        self._last_frame = time.perf_counter()
+        if self._status_text is not None:
+            self.parent().window().label_coordinates.setText(self._status_text)
+            self._status_text = None
+        if self._paint_pending:
+            self._paint_pending = False
+            if self._dirty_all:
+                self.update()
+            elif not self._dirty.isEmpty():
+                self.update(self._dirty)
+            self._dirty = QRegion()
+            self._dirty_all = False
+
+    def set_adaptive_quality(self, value):
+        self.adaptive_quality = value
+        if not value:
+            self.end_interaction()
+
+    def begin_interaction(self):
+        """Paint with cheap render hints until input has been idle for INTERACTION_IDLE_MS."""
+        if not self.adaptive_quality:
+            return
+        self.interacting = True
+        self._idle_timer.start(self.INTERACTION_IDLE_MS)
+
+    def end_interaction(self):
+        """Back to full quality, repaints what was painted in the interactive quality."""
+        self._idle_timer.stop()
+        if self.interacting:
+            self.interacting = False
+            self.update()
+
+    def set_render_hints(self, p):
+        full = not self.interacting
+        p.setRenderHint(QPainter.Antialiasing, full)
+        p.setRenderHint(QPainter.HighQualityAntialiasing, full)
+
+    def shape_update_rect(self, shape):
+        """Widget area painted by shape, including its vertices, highlight and label."""
+        if shape is None or not shape.points:
+            return QRect()
+        left, top, right, bottom = shape.bounds()
+        if shape.paint_label and shape.label:
+            label = self.renderer.label_rect(shape, self.label_font_size)
+            left, top = min(left, label[0]), min(top, label[1])
+            right, bottom = max(right, label[2]), max(bottom, label[3])
+        offset = self.offset_to_center()
+        s = self.scale
+        pad = Shape.point_size * 2 + 4
+        return QRectF((left + offset.x()) * s - pad, (top + offset.y()) * s - pad,
+                      (right - left) * s + 2 * pad, (bottom - top) * s + 2 * pad).toAlignedRect()
+
+    def set_line(self, start, end):
+        """Move the rubber band line to start-end, reusing its point lists."""
+        line = self.line
+        if len(line.points) == 2:
+            line.points[0] = start
+            line.points[1] = end
+            line.invalidate()
+        else:
+            line.points = [start, end]
+        if len(line.point_labels) != 2:
+            line.point_labels = [1, 1]
+
     def un_highlight(self):
         if self.h_shape:
             self.h_shape.highlight_clear()
-            self.update()
+            self.schedule_update(self.shape_update_rect(self.h_shape))
         self.prevhShape = self.h_shape
         self.prevhVertex = self.h_vertex
         self.prevhEdge = self.hEdge
@@ -143,11 +347,12 @@ class Canvas(QWidget):
         self._createMode = value
     def mouseMoveEvent(self, ev):
         """Update line with last point and current coordinates.用最后一点和当前坐标更新行"""
+        self._frame_events += 1
         pos = self.transform_pos(ev.pos())
         # Update coordinates in status bar if image is opened如果打开图像，更新状态栏中的坐标
         window = self.parent().window()
         if window.file_path is not None:
-            self.parent().window().label_coordinates.setText(
+            self.set_status_text(
                 'X: %d; Y: %d' % (pos.x(), pos.y()))
         '''在 PyQt 中，当某个事件发生时，可以通过事件对象（例如鼠标事件或键盘事件）的 modifiers() 方法来获取与事件相关的修饰键状态。修饰键是指与普通按键同时按下的特殊键，如 Shift、Ctrl、Alt 等。
         QtCore.Qt.ShiftModifier 是 Qt 中的一个枚举值，表示 Shift 修饰键。通过将 ev.modifiers() 与 QtCore.Qt.ShiftModifier 进行按位与运算，可以判断 Shift 修饰键是否被按下。'''
@@ -161,7 +366,7 @@ class Canvas(QWidget):
                 # Display annotation width and height while drawing绘图时显示注释的宽度和高度
                 current_width = abs(self.current[0].x() - pos.x())
                 current_height = abs(self.current[0].y() - pos.y())
-                self.parent().window().label_coordinates.setText(
+                self.set_status_text(
                         'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
                 color = self.drawing_line_color
                 if self.out_of_pixmap(pos):
@@ -171,7 +376,7 @@ class Canvas(QWidget):
                     # 不要允许用户在位图之外绘制。
                     # 剪辑坐标为0或max，
                     # 如果它们在[0,max]范围之外
-                    size = self.pixmap.size()
+                    size = self.image_size
                     clipped_x = min(max(0, pos.x()), size.width())
                     clipped_y = min(max(0, pos.y()), size.height())
                     pos = QPointF(clipped_x, clipped_y)
@@ -186,11 +391,9 @@ class Canvas(QWidget):
                     self.current.highlight_vertex(0, Shape.NEAR_VERTEX)
 
                 if self.createMode in ["polygon", "linestrip"]:
-                    self.line.points = [self.current[-1], pos]
-                    self.line.point_labels = [1, 1]
+                    self.set_line(self.current[-1], pos)
                 elif self.createMode == "rectangle" and not self.draw_square:
-                    self.line.points = [self.current[0], pos]
-                    self.line.point_labels = [1, 1]
+                    self.set_line(self.current[0], pos)
                     self.line.close()
                 elif self.createMode == "rectangle" and self.draw_square:
                     init_pos = self.current[0]
@@ -200,16 +403,13 @@ class Canvas(QWidget):
                     direction_x = -1 if pos.x() - min_x < 0 else 1
                     direction_y = -1 if pos.y() - min_y < 0 else 1
                     spos = QPointF(min_x + direction_x * min_size, min_y + direction_y * min_size)
-                    self.line.points = [self.current[0], spos]
-                    self.line.point_labels = [1, 1]
+                    self.set_line(self.current[0], spos)
                     self.line.close()
                 elif self.createMode == "circle":
-                    self.line.points = [self.current[0], pos]
-                    self.line.point_labels = [1, 1]
+                    self.set_line(self.current[0], pos)
                     self.line.shape_type = "circle"
                 elif self.createMode == "line":
-                    self.line.points = [self.current[0], pos]
-                    self.line.point_labels = [1, 1]
+                    self.set_line(self.current[0], pos)
                     self.line.close()
                 elif self.createMode == "point":
                     self.line.points = [self.current[0]]
@@ -223,26 +423,31 @@ class Canvas(QWidget):
                 self.current.highlight_clear()
             else:
                 self.prev_point = pos
-            self.repaint()
+            self.schedule_update()
             return
 
+        if ev.buttons() & (Qt.LeftButton | Qt.RightButton):
+            self.begin_interaction()
+
         # Polygon copy moving.#鼠标右键拖动标注框是否会直接复制一个新的框跟着鼠标移动
         if Qt.RightButton & ev.buttons():#监控鼠标右键是否按下
             if self.selected_shape_copy and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
+                before = self.shape_update_rect(self.selected_shape_copy)
                 self.bounded_move_shape(self.selected_shape_copy, pos)
-                self.repaint()
+                self.schedule_update(before | self.shape_update_rect(self.selected_shape_copy))
             elif self.selected_shape:
                 self.selected_shape_copy = self.selected_shape.copy()
-                self.repaint()
+                self.schedule_update(self.shape_update_rect(self.selected_shape_copy))
             return
 
         # Polygon/Vertex moving.#移动顶点或者多边形
         if Qt.LeftButton & ev.buttons():
             if self.selected_vertex():#选择顶点
+                before = self.shape_update_rect(self.h_shape)
                 self.bounded_move_vertex(pos)
                 # self.shapeMoved.emit()#设置为脏的，保存按钮可触发
-                self.repaint()
+                self.schedule_update(before | self.shape_update_rect(self.h_shape))
                 self.movingShape = True
                 # Display annotation width and height while moving vertex移动顶点时显示注释的宽度和高度
                 if self.h_shape.shape_type == "rectangle":
@@ -250,26 +455,28 @@ class Canvas(QWidget):
                     point3 = self.h_shape[3]
                     current_width = abs(point1.x() - point3.x())
                     current_height = abs(point1.y() - point3.y())
-                    self.parent().window().label_coordinates.setText(
+                    self.set_status_text(
                             'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
             elif self.selected_Edge() and not self.snapping:#选择边
+                before = self.shape_update_rect(self.h_shape)
                 self.bounded_move_edge(pos)
-                self.repaint()
+                self.schedule_update(before | self.shape_update_rect(self.h_shape))
                 self.movingShape = True
                 self.prev_point = pos
                 self.calculate_offsets(self.selected_shape, pos)
             elif self.selected_shape and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
+                before = self.shape_update_rect(self.selected_shape)
                 self.bounded_move_shape(self.selected_shape, pos)
                 self.movingShape = True
-                self.repaint()
+                self.schedule_update(before | self.shape_update_rect(self.selected_shape))
                 # Display annotation width and height while moving shape
                 if self.h_shape.shape_type == "rectangle":
                     point1 = self.selected_shape[1]
                     point3 = self.selected_shape[3]
                     current_width = abs(point1.x() - point3.x())
                     current_height = abs(point1.y() - point3.y())
-                    self.parent().window().label_coordinates.setText(
+                    self.set_status_text(
                             'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
             else:
                 # self.pan_initial_pos在鼠标按下时候赋值按下的坐标，这里按下后继续移动即计算与按下时候的偏移距离，触发滚动条滚动实现拖拽画面的效果
@@ -277,7 +484,7 @@ class Canvas(QWidget):
                 delta_y = pos.y() - self.pan_initial_pos.y()
                 self.scrollRequest.emit(delta_x, Qt.Horizontal)
                 self.scrollRequest.emit(delta_y, Qt.Vertical)
-                self.update()
+                self.schedule_update()
             return
 
         # Just hovering over the canvas, 2 possibilities:
@@ -289,15 +496,23 @@ class Canvas(QWidget):
         # -高亮顶点
         # 更新形状/顶点填充和工具提示值
         self.setToolTip("Image")
-        # for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
-        for shape in sorted([s for s in self.shapes if self.isVisible(s)],key=lambda shape_i: (shape_i.bounding_rect().x(),shape_i.bounding_rect().y()),reverse=True):#按照xy坐标从大到小排序，处于包含状态的框就可以被优先选中
-        # for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
+        # Only the shapes near the cursor, sorted by xy from large to small so that nested boxes can be picked
+        margin = max(self.epsilon, self.epsilon / self.scale)
+        for shape in self.shape_index.candidates(pos, margin):
+            if not self.isVisible(shape):
+                continue
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
             # 寻找一个附近的顶点高亮。如果失败了，
             # 检查我们是否恰好在一个形状内。
             index = shape.nearest_vertex(pos, self.epsilon)
             index_edge = shape.nearestEdge(pos, self.epsilon / self.scale)
+            on_edge = index_edge is not None and shape.canAddPoint()
+            inside = index is None and not on_edge and shape.contains_point(pos)
+            if index is None and not on_edge and not inside:
+                continue
+            if self.h_shape is not None and self.h_shape is not shape:
+                self.un_highlight()
 
             if index is not None:
                 if self.selected_vertex():
@@ -311,9 +526,9 @@ class Canvas(QWidget):
                 self.override_cursor(CURSOR_POINT)
                 self.setToolTip("Click & drag to move point")
                 self.setStatusTip(self.toolTip())
-                self.update()
+                self.schedule_update(self.shape_update_rect(shape))
                 break
-            elif index_edge is not None and shape.canAddPoint():
+            elif on_edge:
                 if self.selected_Edge():
                     self.h_shape.highlight_clear()
                 self.prevhVertex = self.h_vertex
@@ -324,9 +539,9 @@ class Canvas(QWidget):
                 self.override_cursor(CURSOR_POINT)
                 self.setToolTip(self.tr("Click to create point"))
                 self.setStatusTip(self.toolTip())
-                self.update()
+                self.schedule_update(self.shape_update_rect(shape))
                 break
-            elif shape.contains_point(pos):#判断鼠标是否在框内
+            elif inside:#判断鼠标是否在框内
                 if self.selected_vertex():#如果已经选中顶点，就清除高亮
                     self.h_shape.highlight_clear()
                 # self.h_vertex, self.h_shape = None, shape
@@ -339,7 +554,7 @@ class Canvas(QWidget):
                     "Click & drag to move shape '%s'" % shape.label)
                 self.setStatusTip(self.toolTip())
                 self.override_cursor(CURSOR_GRAB)
-                self.update()
+                self.schedule_update(self.shape_update_rect(shape))
 
                 # Display annotation width and height while hovering inside在内部悬停时显示注释的宽度和高度
                 if self.h_shape.shape_type == "rectangle":
@@ -347,12 +562,12 @@ class Canvas(QWidget):
                     point3 = self.h_shape[3]
                     current_width = abs(point1.x() - point3.x())
                     current_height = abs(point1.y() - point3.y())
-                    self.parent().window().label_coordinates.setText(
+                    self.set_status_text(
                             'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
                 break
-            else:  # Nothing found, clear highlights, reset state.没有发现，高光显示清晰，重置状态
-                self.un_highlight()
-                self.override_cursor(CURSOR_DEFAULT)
+        else:  # Nothing found, clear highlights, reset state.没有发现，高光显示清晰，重置状态
+            self.un_highlight()
+            self.override_cursor(CURSOR_DEFAULT)
     def addPointToEdge(self):
         shape = self.prevhShape
         index = self.prevhEdge
@@ -360,6 +575,7 @@ class Canvas(QWidget):
         if shape is None or index is None or point is None:
             return
         shape.insertPoint(index, point)
+        self.shape_changed(shape)
         shape.highlight_vertex(index, shape.MOVE_VERTEX)
         self.h_shape = shape
         self.h_vertex = index
@@ -372,6 +588,7 @@ class Canvas(QWidget):
         if shape is None or index is None:
             return
         shape.removePoint(index)
+        self.shape_changed(shape)
         shape.highlight_clear()
         self.h_shape = shape
         self.prevhVertex = None
@@ -479,12 +696,13 @@ class Canvas(QWidget):
         # del shape.fill_color
         # del shape.line_color
         if copy:
-            self.shapes.append(shape)
+            self.add_shape(shape)
             self.selected_shape.selected = False
             self.selected_shape = shape
             self.repaint()
         else:
             self.selected_shape.points = [p for p in shape.points]
+            self.shape_changed(self.selected_shape)
         self.selected_shape_copy = None
 
     def hide_background_shapes(self, value):
@@ -555,7 +773,7 @@ class Canvas(QWidget):
             return self.h_vertex
         # for shape in reversed(self.shapes):#reversed()函数返回一个反转的迭代器。将所有的标注在列表中反转，这样最先画框就在最后面，最先找到上面的框被其他框覆盖不可选中
         # for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
-        for shape in sorted([s for s in self.shapes if self.isVisible(s)],key=lambda shape_i: (shape_i.bounding_rect().x(), shape_i.bounding_rect().y()),reverse=True):  # 按照xy坐标从大到小排序，处于包含状态的框就可以被优先选中
+        for shape in self.shape_index.candidates(point):  # 按照xy坐标从大到小排序，处于包含状态的框就可以被优先选中
             if self.isVisible(shape) and shape.contains_point(point):
                 self.select_shape(shape)
                 self.calculate_offsets(shape, point)
@@ -575,11 +793,11 @@ class Canvas(QWidget):
         Moves a point x,y to within the boundaries of the canvas.
         :return: (x,y,snapped) where snapped is True if x or y were changed, False if not.
         """
-        if x < 0 or x > self.pixmap.width() or y < 0 or y > self.pixmap.height():
+        if x < 0 or x > self.image_size.width() or y < 0 or y > self.image_size.height():
             x = max(x, 0)
             y = max(y, 0)
-            x = min(x, self.pixmap.width())
-            y = min(y, self.pixmap.height())
+            x = min(x, self.image_size.width())
+            y = min(y, self.image_size.height())
             return x, y, True
 
         return x, y, False
@@ -588,7 +806,7 @@ class Canvas(QWidget):
         index, shape = self.h_vertex, self.h_shape
         point = shape[index]
         if self.out_of_pixmap(pos):
-            size = self.pixmap.size()
+            size = self.image_size
             clipped_x = min(max(0, pos.x()), size.width())
             clipped_y = min(max(0, pos.y()), size.height())
             pos = QPointF(clipped_x, clipped_y)
@@ -620,11 +838,12 @@ class Canvas(QWidget):
             shape.move_vertex_by(left_index, left_shift)
         else:
             shape.move_vertex_by(index, shift_pos)
+        self.shape_changed(shape)
 
     def bounded_move_edge(self, pos):
         index, shape = self.hEdge, self.h_shape
         if self.out_of_pixmap(pos):
-            size = self.pixmap.size()
+            size = self.image_size
             clipped_x = min(max(0, pos.x()), size.width())
             clipped_y = min(max(0, pos.y()), size.height())
             pos = QPointF(clipped_x, clipped_y)
@@ -639,12 +858,13 @@ class Canvas(QWidget):
                 shift_pos = QPointF(0, pos.y() - point_1.y())
             shape.move_vertex_by(point_index_1, shift_pos)
             shape.move_vertex_by(point_index_2, shift_pos)
+            self.shape_changed(shape)
         else:
             return
 
     def bounded_move_shape(self, shape, pos):
-        pixma_w = self.pixmap.width()
-        pixma_h = self.pixmap.height()
+        pixma_w = self.image_size.width()
+        pixma_h = self.image_size.height()
         if shape.shape_type != "circle":
             if self.out_of_pixmap(pos):
                 return False  # No need to move
@@ -665,8 +885,8 @@ class Canvas(QWidget):
             # self.calculateOffsets(self.selectedShape, pos)
         dp = pos - self.prev_point
         if dp:
-            print(dp)
             shape.move_by(dp,pixma_w,pixma_h)
+            self.shape_changed(shape)
             self.prev_point = pos
             return True
         return False
@@ -682,7 +902,7 @@ class Canvas(QWidget):
     def delete_selected(self):
         if self.selected_shape:
             shape = self.selected_shape
-            self.shapes.remove(self.selected_shape)
+            self.remove_shape(self.selected_shape)
             self.selected_shape = None
             self.update()
             return shape
@@ -691,7 +911,7 @@ class Canvas(QWidget):
         if self.selected_shape:
             shape = self.selected_shape.copy()
             self.de_select_shape()
-            self.shapes.append(shape)
+            self.add_shape(shape)
             shape.selected = True
             self.selected_shape = shape
             self.bounded_shift_shape(shape)
@@ -707,69 +927,224 @@ class Canvas(QWidget):
         if not self.bounded_move_shape(shape, point - offset):
             self.bounded_move_shape(shape, point + offset)
 
+    def has_image(self):
+        return not self.image_size.isEmpty()
+
     def paintEvent(self, event):
-        if not self.pixmap:
+        if not self.has_image():
             return super(Canvas, self).paintEvent(event)
 
+        started = time.perf_counter()
+        rect = event.rect()
+        key = self._layer_state()
+        if (self._layer is None or key != self._layer_key or not self._layer_rect.contains(rect)
+                or self._layer_low_quality and not self.interacting):
+            self.build_layer(rect, key)
+
         p = self._painter
         p.begin(self)
-        p.setRenderHint(QPainter.Antialiasing)
-        p.setRenderHint(QPainter.HighQualityAntialiasing)
-        p.setRenderHint(QPainter.SmoothPixmapTransform)
+        dpr = self._layer.devicePixelRatio()
+        source = rect.translated(-self._layer_rect.topLeft())
+        p.drawPixmap(QRectF(rect), self._layer,
+                     QRectF(source.x() * dpr, source.y() * dpr, source.width() * dpr, source.height() * dpr))
 
+        self.set_render_hints(p)
         p.scale(self.scale, self.scale)
         p.translate(self.offset_to_center())
 
-        p.drawPixmap(0, 0, self.pixmap)
         Shape.scale = self.scale
         Shape.label_font_size = self.label_font_size
-        for shape in self.shapes:
+        for shape in self.active_shapes():
             if (shape.selected or not self._hide_background) and self.isVisible(shape):
-                shape.fill = shape.selected or shape == self.h_shape
+                shape.fill = True
                 shape.paint(p)
         if self.current:
-            self.current.paint(p)
-            self.line.paint(p)
+            if self.current.shape_type in ("polygon", "linestrip"):
+                self.paint_drawing_preview(p)
+            else:
+                self.current.paint(p)
+                self.line.paint(p)
         if self.selected_shape_copy:
             self.selected_shape_copy.paint(p)
 
         # Paint rect
-        if self.current is not None and len(self.line) >= 2:
+        if self.current is not None and len(self.line) >= 2 and self.current.shape_type == 'rectangle':
             left_top = self.line[0]
             right_bottom = self.line[1]
-            rect_width = right_bottom.x() - left_top.x()
-            rect_height = right_bottom.y() - left_top.y()
             # p.setPen(self.drawing_rect_color)#设置引导线颜色
             p.setPen(self.drawing_line_color)
-            if self.current.shape_type == 'rectangle':
-                brush = QBrush(Qt.BDiagPattern)#斜线填充
-                p.setBrush(brush)
-                p.drawRect(left_top.x(), left_top.y(), rect_width, rect_height)
-            elif self.current.shape_type == 'polygon':
-                drawing_shape = self.current.copy()
-                if drawing_shape.fill_color.getRgb()[3] == 0:
-                    drawing_shape.fill_color.setAlpha(64)
-                drawing_shape.addPoint(self.line[1])
-                drawing_shape.fill = True
-                drawing_shape.paint(p)
+            p.setBrush(self._rubber_band_brush)#斜线填充
+            p.drawRect(QRectF(left_top, right_bottom))
         if self.drawing() and not self.prev_point.isNull() and not self.out_of_pixmap(self.prev_point) and self.createMode == "rectangle":
             # p.setPen(QColor(0, 0, 0))
             p.setPen(self.drawing_line_color)
-            p.drawLine(self.prev_point.x(), 0, self.prev_point.x(), self.pixmap.height())
-            p.drawLine(0, self.prev_point.y(), self.pixmap.width(), self.prev_point.y())
+            p.drawLine(self.prev_point.x(), 0, self.prev_point.x(), self.image_size.height())
+            p.drawLine(0, self.prev_point.y(), self.image_size.width(), self.prev_point.y())
 
-        self.setAutoFillBackground(True)
-        if self.verified:
-            pal = self.palette()
-            pal.setColor(self.backgroundRole(), QColor(184, 239, 38, 128))
-            self.setPalette(pal)
+        p.end()
+        self.frame_stats.add_frame(time.perf_counter() - started, self._frame_events, self.interacting)
+        self._frame_events = 0
+
+    def paint_drawing_preview(self, p):
+        """
+        The polygon or line strip being drawn, filled up to the cursor.
+        Its path is kept between paints and only the point at the cursor
+        moves, so a paint costs the same however many vertices are placed.
+        """
+        current = self.current
+        path, vertices = self.drawing_preview()
+        end = self.line[1] if len(self.line) > 1 else current[-1]
+        path.setElementPositionAt(path.elementCount() - 1, end.x(), end.y())
+        width = line_width(self.scale)
+        if current.shape_type == "polygon":
+            p.fillPath(path, self._preview_fill_color(current.fill_color))
+        p.setBrush(Qt.NoBrush)
+        p.setPen(self.renderer.pen(current.line_color, width))
+        p.drawPath(path)
+        p.drawPath(vertices)
+        highlighted = current._highlight_index is not None
+        vertex_color = current.h_vertex_fill_color if highlighted else current.vertex_fill_color
+        p.fillPath(vertices, vertex_color)
+        d = Shape.point_size / self.scale
+        if highlighted:
+            # Snapping to the first vertex closes the polygon.
+            size = current._highlight_settings[current._highlight_mode][0]
+            p.setBrush(vertex_color)
+            p.drawEllipse(current[current._highlight_index], d * size / 2.0, d * size / 2.0)
+        p.setPen(self.renderer.pen(self.line.line_color, width))
+        p.setBrush(Shape.vertex_fill_color)
+        p.drawLine(current[-1], end)
+        p.drawEllipse(end, d / 2.0, d / 2.0)
+        p.setBrush(Qt.NoBrush)
+
+    def drawing_preview(self):
+        """
+        (path, vertices) of the shape being drawn: the path through its
+        points and on to a last point which follows the cursor, and the
+        vertex handles. A new point is appended to the existing paths.
+        """
+        current = self.current
+        count = len(current)
+        d = Shape.point_size / self.scale
+        preview = self._preview
+        if preview is not None and preview[0] is current and preview[2] == self.scale and preview[1] == count - 1:
+            path, vertices = preview[3], preview[4]
+            point = current[-1]
+            path.setElementPositionAt(path.elementCount() - 1, point.x(), point.y())
+            self._add_cursor_element(path, point)
+            vertices.addEllipse(point, d / 2.0, d / 2.0)
+        elif preview is None or preview[0] is not current or preview[2] != self.scale or preview[1] != count:
+            path = QPainterPath(current[0])
+            for point in current.points[1:]:
+                path.lineTo(point)
+            self._add_cursor_element(path, current[-1])
+            vertices = QPainterPath()
+            for point in current.points:
+                vertices.addEllipse(point, d / 2.0, d / 2.0)
         else:
-            pal = self.palette()
-            pal.setColor(self.backgroundRole(), QColor(232, 232, 232, 255))
-            self.setPalette(pal)
+            return preview[3], preview[4]
+        self._preview = current, count, self.scale, path, vertices
+        return path, vertices
+
+    def _add_cursor_element(self, path, point):
+        # The last element follows the cursor. lineTo ignores a line to the
+        # point the path ends at, so it is added elsewhere and then moved.
+        path.lineTo(point.x() + 1, point.y())
+        path.setElementPositionAt(path.elementCount() - 1, point.x(), point.y())
+
+    def _preview_fill_color(self, color):
+        if color.alpha() == 0:
+            color = QColor(color)
+            color.setAlpha(64)
+        return color
+
+    def paint_image(self, p, area, dpr):
+        """
+        Draw the part of the image behind area (widget coordinates) with p,
+        which is transformed to image coordinates.
+        """
+        visible = QRectF(self.transform_pos(QPointF(area.topLeft())),
+                         self.transform_pos(QPointF(area.bottomRight() + QPoint(1, 1))))
+        device_scale = self.scale * dpr
+        p.setRenderHint(QPainter.SmoothPixmapTransform,
+                        device_scale < self.NEAREST_NEIGHBOUR_SCALE and not self.interacting)
+        if self.tiles is not None:
+            self.tiles.paint(p, visible, self.scale)
+            return
+        width, height = self.image_size.width(), self.image_size.height()
+        visible = visible.intersected(QRectF(0, 0, width, height))
+        if visible.isEmpty():
+            return
+        scaled = None
+        if device_scale < 1:
+            scaled = self.scaled_image.get(self.image, QSize(max(1, int(round(width * device_scale))),
+                                                             max(1, int(round(height * device_scale)))), dpr)
+        # Full resolution, or a reduced resolution preview stretched over the image area.
+        image = scaled if scaled is not None else self.image
+        rx, ry = image.width() / float(width), image.height() / float(height)
+        # Whole source pixels, so that the border of the clip is resampled like the rest.
+        left, top = math.floor(visible.left() * rx), math.floor(visible.top() * ry)
+        right = min(math.ceil(visible.right() * rx), image.width())
+        bottom = min(math.ceil(visible.bottom() * ry), image.height())
+        source = QRectF(left, top, right - left, bottom - top)
+        if scaled is None:
+            p.drawImage(QRectF(left / rx, top / ry, (right - left) / rx, (bottom - top) / ry), image, source)
+            return
+        # Already at screen resolution: copy it untransformed, aligned to device pixels.
+        origin = p.transform().map(QPointF(left / rx, top / ry))
+        p.save()
+        p.resetTransform()
+        p.drawImage(QPointF(round(origin.x() * dpr) / dpr, round(origin.y() * dpr) / dpr), image, source)
+        p.restore()
+
+    def active_shapes(self):
+        """The hovered and the selected shape, painted over the layer on every paint."""
+        shapes = []
+        for shape in (self.h_shape, self.selected_shape):
+            if shape is not None and shape not in shapes and shape in self.shape_index:
+                shapes.append(shape)
+        return shapes
+
+    def invalidate_layer(self):
+        """Repaint the image and all shapes, call after shapes or their colors, labels or visibility changed."""
+        self._layer_version += 1
+        self.update()
 
+    def _layer_state(self):
+        return (self._layer_version, self.scale, self.label_font_size, self.size(), self.image.cacheKey(),
+                self.tiles, self.selected_shape, self._hide_background)
+
+    def build_layer(self, rect, key):
+        """Paint the image and the inactive shapes around the visible area into the layer pixmap."""
+        margin = self.LAYER_MARGIN
+        area = self.visibleRegion().boundingRect().united(rect)
+        area = area.adjusted(-margin, -margin, margin, margin).intersected(self.rect())
+        dpr = self.devicePixelRatioF()
+        layer = QPixmap(max(1, int(math.ceil(area.width() * dpr))), max(1, int(math.ceil(area.height() * dpr))))
+        layer.setDevicePixelRatio(dpr)
+        layer.fill(Qt.transparent)
+
+        p = QPainter(layer)
+        self.set_render_hints(p)
+        p.translate(-QPointF(area.topLeft()))
+        p.scale(self.scale, self.scale)
+        p.translate(self.offset_to_center())
+        self.paint_image(p, area, dpr)
+
+        Shape.scale = self.scale
+        Shape.label_font_size = self.label_font_size
+        if not self._hide_background:
+            # Painted without highlights, the layer outlives hovering.
+            shapes = [shape for shape in self.shapes if not shape.selected and self.isVisible(shape)]
+            self.renderer.paint_shapes(p, shapes, self.scale, self.label_font_size, self.level_of_detail)
         p.end()
 
+        self._layer = layer
+        self._layer_rect = area
+        self._layer_key = key
+        self._layer_low_quality = self.interacting
+        self.layer_builds += 1
+
     def transform_pos(self, point):
         """Convert from widget-logical coordinates to painter-logical coordinates."""
         return point / self.scale - self.offset_to_center()
@@ -777,14 +1152,14 @@ class Canvas(QWidget):
     def offset_to_center(self):
         s = self.scale
         area = super(Canvas, self).size()
-        w, h = self.pixmap.width() * s, self.pixmap.height() * s
+        w, h = self.image_size.width() * s, self.image_size.height() * s
         aw, ah = area.width(), area.height()
         x = (aw - w) / (2 * s) if aw > w else 0
         y = (ah - h) / (2 * s) if ah > h else 0
         return QPointF(x, y)
 
     def out_of_pixmap(self, p):
-        w, h = self.pixmap.width(), self.pixmap.height()
+        w, h = self.image_size.width(), self.image_size.height()
         return not (0 <= p.x() <= w and 0 <= p.y() <= h)
 
     def finalise(self):#完成一个shape对象的标注，将其加入到shapes列表中，弹出新建标注框的对话框，赋予信息.如果对话框取消，则删除该shape对象并且进入编辑状态
@@ -795,7 +1170,7 @@ class Canvas(QWidget):
             self.update()
             return
         self.current.close()
-        self.shapes.append(self.current)
+        self.add_shape(self.current)
         self.current = None
         self.set_hiding(False)
         self.newShape.emit()#弹出新建标注框的对话框，赋予信息
@@ -813,8 +1188,8 @@ class Canvas(QWidget):
         return self.minimumSizeHint()
 
     def minimumSizeHint(self):
-        if self.pixmap:
-            return self.scale * self.pixmap.size()
+        if self.has_image():
+            return self.scale * self.image_size
         return super(Canvas, self).minimumSizeHint()
 
     def wheelEvent(self, ev):
@@ -831,6 +1206,7 @@ class Canvas(QWidget):
             h_delta = delta.x()
             v_delta = delta.y()
 
+        self.begin_interaction()
         mods = ev.modifiers()
         if Qt.ControlModifier == int(mods) and v_delta:
             self.zoomRequest.emit(v_delta)
@@ -876,32 +1252,29 @@ class Canvas(QWidget):
 
     def move_one_pixel(self, direction):
         # print(self.selectedShape.points)
+        before = self.shape_update_rect(self.selected_shape)
         if direction == 'Left' and not self.move_out_of_bound(QPointF(-1.0, 0)):
             # print("move Left one pixel")
-            for point in self.selected_shape.points:
-                point += QPointF(-1.0, 0)
+            self.selected_shape.translate(-1.0, 0)
 
         elif direction == 'Right' and not self.move_out_of_bound(QPointF(1.0, 0)):
             # print("move Right one pixel")
-            for point in self.selected_shape.points:
-                point += QPointF(1.0, 0)
+            self.selected_shape.translate(1.0, 0)
 
         elif direction == 'Up' and not self.move_out_of_bound(QPointF(0, -1.0)):
             # print("move Up one pixel")
-            for point in self.selected_shape.points:
-                point += QPointF(0, -1.0)
+            self.selected_shape.translate(0, -1.0)
 
         elif direction == 'Down' and not self.move_out_of_bound(QPointF(0, 1.0)):
             # print("move Down one pixel")
-            for point in self.selected_shape.points:
-                point += QPointF(0, 1.0)
+            self.selected_shape.translate(0, 1.0)
 
+        self.shape_changed(self.selected_shape)
         self.movingShape = True
-        self.repaint()
+        self.schedule_update(before | self.shape_update_rect(self.selected_shape))
 
     def move_out_of_bound(self, step):
-        points = [p1 + p2 for p1, p2 in zip(self.selected_shape.points, [step] * 4)]
-        return True in map(self.out_of_pixmap, points)
+        return not self.selected_shape.inside(self.image_size.width(), self.image_size.height(), step.x(), step.y())
 
     def set_last_label(self, text, line_color=None, fill_color=None):
         assert text
@@ -912,11 +1285,14 @@ class Canvas(QWidget):
         if fill_color:
             self.shapes[-1].fill_color = fill_color
 
+        self.invalidate_layer()
         return self.shapes[-1]
 
     def undo_last_line(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.remove(self.current)
+        self.invalidate_layer()
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -924,6 +1300,8 @@ class Canvas(QWidget):
     def reset_all_lines(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.remove(self.current)
+        self.invalidate_layer()
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -931,24 +1309,127 @@ class Canvas(QWidget):
         self.drawingPolygon.emit(False)
         self.update()
 
-    def load_pixmap(self, pixmap):
-        self.pixmap = pixmap
+    def load_image(self, image, image_size=None):
+        """
+        Show image; image_size is the size of the full image if image is a
+        reduced resolution preview of it.
+        """
+        self.close_tiles()
+        self.scaled_image.clear()
+        self.image = image
+        self.image_size = QSize(image_size) if image_size is not None else image.size()
+        self.shapes = []
+        self.shape_index.clear()
+        self.invalidate_layer()
+        self.repaint()
+
+    def replace_image(self, image):
+        """Swap in another resolution of the same image, keeping the shapes."""
+        self.image = image
+        self.invalidate_layer()
+
+    def load_tiles(self, tiles):
+        """Show a TiledImageSource instead of an image, only visible tiles get decoded."""
+        self.close_tiles()
+        self.tiles = tiles
+        self.tiles.tileReady.connect(self.invalidate_layer)
+        self.image = QImage()
+        self.image_size = tiles.size()
         self.shapes = []
+        self.shape_index.clear()
+        self.invalidate_layer()
         self.repaint()
 
+    def close_tiles(self):
+        if self.tiles is not None:
+            self.tiles.tileReady.disconnect(self.invalidate_layer)
+            self.tiles.close()
+            self.tiles = None
+
     def load_shapes(self, shapes):
         self.shapes = list(shapes)
+        self.shape_index.rebuild(self.shapes)
         self.current = None
         self.h_shape = None
         self.h_vertex = None
         self.hEdge = None
+        self.invalidate_layer()
         self.repaint()
-        self.update()
+
+    def add_shape(self, shape):
+        self.shapes.append(shape)
+        self.shape_index.insert(shape)
+        self.invalidate_layer()
+
+    def remove_shape(self, shape):
+        self.shapes.remove(shape)
+        self.shape_index.remove(shape)
+        self.invalidate_layer()
+
+    def remove_shapes(self, shapes):
+        """Remove many shapes in one pass, with one update."""
+        removed = set(shapes)
+        if not removed:
+            return
+        if self.selected_shape in removed:
+            self.de_select_shape()
+        if self.h_shape in removed or self.prevhShape in removed:
+            self.h_shape = self.prevhShape = None
+            self.h_vertex = self.prevhVertex = None
+            self.hEdge = self.prevhEdge = None
+        self.shapes = [shape for shape in self.shapes if shape not in removed]
+        if len(removed) > len(self.shapes):
+            self.shape_index.rebuild(self.shapes)
+        else:
+            for shape in removed:
+                self.shape_index.remove(shape)
+        for shape in removed:
+            self.visible.pop(shape, None)
+        self.invalidate_layer()
+
+    def move_shapes(self, shapes, dx, dy):
+        """
+        Move shapes together by (dx, dy), or less where that would move
+        a point out of the image. Returns whether they moved.
+        """
+        if not shapes:
+            return False
+        coords = np.concatenate([shape.coords() for shape in shapes])
+        (left, top), (right, bottom) = coords.min(axis=0).tolist(), coords.max(axis=0).tolist()
+        dx = min(max(dx, -left), self.image_size.width() - right)
+        dy = min(max(dy, -top), self.image_size.height() - bottom)
+        if not dx and not dy:
+            return False
+        for shape in shapes:
+            shape.translate(dx, dy)
+        self.shapes_changed(shapes)
+        return True
+
+    def shapes_changed(self, shapes):
+        """shape_changed for many shapes, with one update."""
+        for shape in shapes:
+            if shape in self.shape_index:
+                self.shape_index.update(shape)
+        self.invalidate_layer()
+
+    def shape_changed(self, shape):
+        """Call after the points of shape changed, keeps hit-testing and painting up to date."""
+        if shape in self.shape_index:
+            self.shape_index.update(shape)
+            # The selected shape is painted over the layer, dragging it does not rebuild the layer.
+            if not shape.selected:
+                self.invalidate_layer()
 
     def set_shape_visible(self, shape, value):
         self.visible[shape] = value
+        self.invalidate_layer()
         self.repaint()
 
+    def set_shapes_visible(self, shapes, value):
+        for shape in shapes:
+            self.visible[shape] = value
+        self.invalidate_layer()
+
     def current_cursor(self):
         cursor = QApplication.overrideCursor()
         if cursor is not None:
@@ -956,6 +1437,8 @@ class Canvas(QWidget):
         return cursor
 
     def override_cursor(self, cursor):
+        if cursor == self._cursor and self.current_cursor() == cursor:
+            return
         self._cursor = cursor
         if self.current_cursor() is None:
             QApplication.setOverrideCursor(cursor)
@@ -967,7 +1450,11 @@ class Canvas(QWidget):
 
     def reset_state(self):
         self.restore_cursor()
-        self.pixmap = None
+        self.close_tiles()
+        self.scaled_image.clear()
+        self.image = QImage()
+        self.image_size = QSize()
+        self._layer = None
         self.update()
 
     def set_drawing_shape_to_square(self, status):
@@ -21,3 +21,5 @@ SETTING_DRAW_SQUARE = 'draw/square'
 SETTING_LABEL_FILE_FORMAT= 'labelFileFormat'
 DEFAULT_ENCODING = 'utf-8'
 SETTING_DRAW_MODE = 'draw/mode'
+SETTING_IMAGE_CACHE_MB = 'imageCache/budgetMB'
+SETTING_ADAPTIVE_QUALITY = 'canvas/adaptiveQuality'
@@ -22,7 +22,7 @@ class CreateMLWriter:
         self.shapes = shapes
         self.output_file = output_file
 
-    def write(self):
+    def write(self, target_file=None):
         if os.path.isfile(self.output_file):
             with open(self.output_file, "r") as file:
                 input_data = file.read()
@@ -67,7 +67,7 @@ class CreateMLWriter:
         if not exists:
             output_dict.append(output_image_dict)
 
-        Path(self.output_file).write_text(json.dumps(output_dict), ENCODE_METHOD)
+        Path(target_file or self.output_file).write_text(json.dumps(output_dict), ENCODE_METHOD)
 
     def calculate_coordinates(self, x1, x2, y1, y2):
         if x1 < x2:
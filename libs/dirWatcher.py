@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental updates of the image list from file system notifications.
+
+QFileSystemWatcher only tells which directory changed, so the watcher keeps
+the image names it knows per directory and lists just the changed directory
+to work out which images were added or removed. A rename shows up as one
+removal and one addition. The listing runs on a worker thread, only the
+deltas come back to the GUI thread.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+from libs.scanner import iter_images
+
+
+class DirectoryWatcher(QObject):
+    """
+    Watch the directories of an image list and report the deltas.
+
+    added and removed are emitted on the GUI thread with lists of absolute
+    image paths. Notifications are coalesced for DELAY_MS, so a burst of files
+    written by a capture pipeline is reported as one batch.
+    """
+    added = pyqtSignal(list)
+    removed = pyqtSignal(list)
+    _diffed = pyqtSignal()
+
+    DELAY_MS = 200
+
+    def __init__(self, extensions, parent=None):
+        super(DirectoryWatcher, self).__init__(parent)
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        # Image names per directory, shared with the worker under _lock.
+        self._files = {}
+        self._lock = threading.Lock()
+        self._results = []
+        self._futures = []
+        self._generation = 0
+        self._dirty = set()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._directory_changed)
+        self._diffed.connect(self._emit_results)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DELAY_MS)
+        self._timer.timeout.connect(self.flush)
+
+    def watch(self, root):
+        """Start watching root; its images are announced with add_paths()."""
+        self._watch_dirs([os.path.abspath(root)])
+
+    def add_paths(self, paths):
+        """Record paths which are in the image list, e.g. found by the scanner."""
+        new_dirs = []
+        with self._lock:
+            for path in paths:
+                dir_path, name = os.path.split(path)
+                names = self._files.get(dir_path)
+                if names is None:
+                    names = self._files[dir_path] = set()
+                    new_dirs.append(dir_path)
+                names.add(name)
+        if new_dirs:
+            self._watcher.addPaths(new_dirs)
+
+    def clear(self):
+        self._timer.stop()
+        self._dirty.clear()
+        directories = self._watcher.directories()
+        if directories:
+            self._watcher.removePaths(directories)
+        with self._lock:
+            self._generation += 1
+            self._files = {}
+            self._results = []
+
+    def shutdown(self):
+        self.clear()
+        self._executor.shutdown(wait=True)
+
+    def _watch_dirs(self, dir_paths):
+        with self._lock:
+            dir_paths = [path for path in dir_paths if path not in self._files]
+            for path in dir_paths:
+                self._files[path] = set()
+        if dir_paths:
+            self._watcher.addPaths(dir_paths)
+
+    def _directory_changed(self, dir_path):
+        self._dirty.add(dir_path)
+        self._timer.start()
+
+    def flush(self):
+        """Have the changed directories compared with what is known on the worker thread."""
+        self._timer.stop()
+        dirty, self._dirty = self._dirty, set()
+        if dirty:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(self._executor.submit(self._diff, sorted(dirty), self._generation))
+
+    def refresh(self, dir_path):
+        """Check dir_path now instead of waiting for its notification."""
+        self._dirty.add(os.path.abspath(dir_path))
+        self.flush()
+
+    def wait(self):
+        """Block until the queued comparisons are done and emit their deltas."""
+        for future in self._futures:
+            future.result()
+        self._futures = []
+        self._emit_results()
+
+    def _diff(self, dir_paths, generation):
+        added, removed, new_dirs, gone_dirs = [], [], [], []
+        for dir_path in dir_paths:
+            with self._lock:
+                if generation != self._generation or dir_path not in self._files:
+                    continue
+            if not os.path.isdir(dir_path):
+                # The directory itself is gone, and with it everything below.
+                prefix = dir_path + os.sep
+                with self._lock:
+                    for path in [d for d in self._files if d == dir_path or d.startswith(prefix)]:
+                        removed.extend(os.path.join(path, name) for name in sorted(self._files.pop(path)))
+                        gone_dirs.append(path)
+                continue
+            names, sub_dirs = self._list(dir_path)
+            if names is None:
+                continue
+            for sub_dir in sub_dirs:
+                with self._lock:
+                    if sub_dir in self._files:
+                        continue
+                # A new sub directory, pick up the images already in it.
+                new_paths = list(iter_images(sub_dir, self.extensions))
+                found = set(os.path.dirname(path) for path in new_paths) | {sub_dir}
+                with self._lock:
+                    for path in found:
+                        self._files.setdefault(path, set())
+                    for path in new_paths:
+                        self._files[os.path.dirname(path)].add(os.path.basename(path))
+                new_dirs.extend(sorted(found))
+                added.extend(new_paths)
+            with self._lock:
+                known = self._files.get(dir_path)
+                if known is None:
+                    continue
+                removed.extend(os.path.join(dir_path, name) for name in sorted(known - names))
+                added.extend(os.path.join(dir_path, name) for name in sorted(names - known))
+                self._files[dir_path] = names
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._results.append((added, removed, new_dirs, gone_dirs))
+        self._diffed.emit()
+
+    def _list(self, dir_path):
+        """Image names and sub directories of dir_path, or None if it can not be listed."""
+        names, sub_dirs = set(), []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        sub_dirs.append(entry.path)
+                    elif entry.name.lower().endswith(self.extensions):
+                        names.add(entry.name)
+        except OSError:
+            return None, []
+        return names, sub_dirs
+
+    def _emit_results(self):
+        with self._lock:
+            results, self._results = self._results, []
+        for added, removed, new_dirs, gone_dirs in results:
+            watched = set(self._watcher.directories())
+            new_dirs = [path for path in new_dirs if path not in watched]
+            gone_dirs = [path for path in gone_dirs if path in watched]
+            if new_dirs:
+                self._watcher.addPaths(new_dirs)
+            if gone_dirs:
+                self._watcher.removePaths(gone_dirs)
+            if removed:
+                self.removed.emit(removed)
+            if added:
+                self.added.emit(added)
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+try:
+    from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+except ImportError:
+    from PyQt4.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+
+
+class PathStore(object):
+    """
+    Compact, list-like store of file paths.
+
+    All paths are kept utf-8 encoded in one bytearray with an array of start
+    offsets, instead of one Python string per path. A dict from the hash of a
+    path to a slot gives constant time lookups; the rare hash collisions are
+    resolved by comparing the stored path. Slots do not change when rows
+    move, an array maps them to rows, so inserting or deleting a batch of
+    rows only touches the dict for the paths of the batch; the buffer and the
+    arrays are rebuilt once per batch.
+    """
+
+    def __init__(self, paths=()):
+        self._buffer = bytearray()
+        self._offsets = array('Q', [0])
+        self._slots = array('q')
+        self._slot_rows = array('q')
+        self._index = {}
+        self.extend(paths)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('path index out of range')
+        return self._buffer[self._offsets[row]:self._offsets[row + 1]].decode('utf-8', 'surrogateescape')
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __contains__(self, path):
+        return self.find(path) >= 0
+
+    def append(self, path):
+        slot = len(self._slot_rows)
+        self._slot_rows.append(len(self))
+        self._slots.append(slot)
+        self._buffer += path.encode('utf-8', 'surrogateescape')
+        self._offsets.append(len(self._buffer))
+        self._add_to_index(path, slot)
+
+    def _add_to_index(self, path, slot):
+        key = hash(path)
+        slots = self._index.get(key)
+        if slots is None:
+            self._index[key] = slot
+        elif isinstance(slots, list):
+            slots.append(slot)
+        else:
+            self._index[key] = [slots, slot]
+
+    def _remove_from_index(self, path, slot):
+        key = hash(path)
+        slots = self._index[key]
+        if isinstance(slots, list):
+            slots.remove(slot)
+            if len(slots) == 1:
+                self._index[key] = slots[0]
+        else:
+            del self._index[key]
+
+    def extend(self, paths):
+        for path in paths:
+            self.append(path)
+
+    def sorted_rows(self, paths, key):
+        """
+        Rows before which paths, sorted by key, have to be inserted to keep a
+        store sorted by key in order.
+        """
+        rows = []
+        lo = 0
+        for path in paths:
+            path_key = key(path)
+            hi = len(self)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if key(self[mid]) <= path_key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            rows.append(lo)
+        return rows
+
+    def insert(self, row, path):
+        """Insert path before row; rows after it shift down."""
+        self.insert_many([max(0, min(row, len(self)))], [path])
+
+    def insert_many(self, rows, paths):
+        """Insert paths[i] before rows[i] of the store as it is now; rows must be ascending."""
+        if not paths:
+            return
+        count = len(self)
+        data = [path.encode('utf-8', 'surrogateescape') for path in paths]
+        offsets = np.frombuffer(self._offsets, dtype=np.uint64)
+        rows = np.asarray(rows, dtype=np.int64)
+        ends = np.cumsum(np.fromiter(map(len, data), dtype=np.uint64, count=len(data)))
+        buffer = self._spliced(offsets[rows].tolist(), offsets[rows].tolist(), data)
+
+        # Every old row moves down by the paths inserted before it, and its
+        # end offset by their bytes.
+        inserted_before = np.searchsorted(rows, np.arange(count), side='right')
+        shifted = np.concatenate((np.zeros(1, dtype=np.uint64), ends))
+        new_offsets = np.zeros(count + len(data) + 1, dtype=np.uint64)
+        new_offsets[np.arange(count) + inserted_before + 1] = offsets[1:] + shifted[inserted_before]
+        new_offsets[rows + np.arange(len(data)) + 1] = offsets[rows] + ends
+
+        first_slot = len(self._slot_rows)
+        for slot, path in enumerate(paths, first_slot):
+            self._add_to_index(path, slot)
+        slots = np.insert(np.frombuffer(self._slots, dtype=np.int64), rows,
+                          np.arange(first_slot, first_slot + len(paths), dtype=np.int64))
+        self._set_arrays(buffer, new_offsets, slots)
+
+    def pop(self, row):
+        """Remove and return the path at row; rows after it shift up."""
+        path = self[row]
+        if row < 0:
+            row += len(self)
+        self.delete_rows([row])
+        return path
+
+    def delete_rows(self, rows):
+        """Remove rows, which must be ascending; rows after them shift up."""
+        if not len(rows):
+            return
+        for row in rows:
+            self._remove_from_index(self[row], self._slots[row])
+        offsets = np.frombuffer(self._offsets, dtype=np.uint64)
+        rows = np.asarray(rows, dtype=np.int64)
+        keep = np.ones(len(self), dtype=bool)
+        keep[rows] = False
+        buffer = self._spliced(offsets[rows].tolist(), offsets[rows + 1].tolist(), ())
+        new_offsets = np.concatenate((np.zeros(1, dtype=np.uint64), np.cumsum(np.diff(offsets)[keep])))
+        self._set_arrays(buffer, new_offsets, np.frombuffer(self._slots, dtype=np.int64)[keep])
+
+    def _spliced(self, starts, ends, data):
+        """The buffer with the bytes from starts[i] to ends[i] replaced by data[i], if given."""
+        view = memoryview(self._buffer)
+        pieces = []
+        previous = 0
+        for i, start in enumerate(starts):
+            pieces.append(view[previous:start])
+            if data:
+                pieces.append(data[i])
+            previous = ends[i]
+        pieces.append(view[previous:])
+        buffer = bytearray().join(pieces)
+        del pieces
+        view.release()
+        return buffer
+
+    def _set_arrays(self, buffer, offsets, slots):
+        self._buffer = buffer
+        self._offsets = array('Q')
+        self._offsets.frombytes(offsets.astype(np.uint64).tobytes())
+        self._slots = array('q')
+        self._slots.frombytes(slots.astype(np.int64).tobytes())
+        slot_count = max(len(self._slot_rows), int(slots.max()) + 1 if len(slots) else 0)
+        if slot_count > 2 * len(slots) + 4096:
+            # Mostly freed slots after many deletions, number them anew.
+            self._renumber()
+            return
+        slot_rows = np.full(slot_count, -1, dtype=np.int64)
+        slot_rows[slots] = np.arange(len(slots))
+        self._slot_rows = array('q')
+        self._slot_rows.frombytes(slot_rows.tobytes())
+
+    def _renumber(self):
+        self._index = {}
+        for row in range(len(self)):
+            self._add_to_index(self[row], row)
+        self._slots = array('q', range(len(self)))
+        self._slot_rows = array('q', range(len(self)))
+
+    def find(self, path):
+        """Return the row of path, or -1."""
+        slots = self._index.get(hash(path))
+        if slots is None:
+            return -1
+        if not isinstance(slots, list):
+            slots = [slots]
+        for slot in slots:
+            row = self._slot_rows[slot]
+            if self[row] == path:
+                return row
+        return -1
+
+    def index(self, path):
+        row = self.find(path)
+        if row < 0:
+            raise ValueError('%s is not in the list' % path)
+        return row
+
+    def clear(self):
+        self._buffer = bytearray()
+        self._offsets = array('Q', [0])
+        self._slots = array('q')
+        self._slot_rows = array('q')
+        self._index = {}
+
+
+class FileListModel(QAbstractTableModel):
+    """
+    Model of the file dock backed by a PathStore.
+
+    status_provider(path) is called lazily, only for rows the view actually
+    paints, and returns one of the status values below, UNKNOWN while the
+    status is still pending; results are cached until refresh_status() is
+    called. counts_provider(path), if set, returns
+    the number of objects per label shown in the status columns.
+    thumbnail_provider(path), if set, answers ThumbnailRole with a QImage or
+    None while the thumbnail is still being generated.
+    """
+    UNKNOWN, UNANNOTATED, ANNOTATED, VERIFIED = range(4)
+    COLUMN_FILE, COLUMN_OBJECTS, COLUMN_LABELS = range(3)
+    ThumbnailRole = Qt.UserRole + 1
+
+    def __init__(self, paths=None, status_provider=None, parent=None):
+        super(FileListModel, self).__init__(parent)
+        self.paths = paths if paths is not None else PathStore()
+        self.status_provider = status_provider
+        self.status_icons = {}
+        self.thumbnail_provider = None
+        self.counts_provider = None
+        self.headers = ['File', 'Objects', 'Labels']
+        self._status = {}
+        self._counts = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def index(self, row, column=COLUMN_FILE, parent=QModelIndex()):
+        return super(FileListModel, self).index(row, column, parent)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self.headers):
+            return self.headers[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        row = index.row()
+        if index.column() != self.COLUMN_FILE:
+            if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+                return QVariant()
+            counts = self.counts(row)
+            if counts is None:
+                return QVariant()
+            if index.column() == self.COLUMN_OBJECTS:
+                return str(sum(counts.values()))
+            return ', '.join('%s (%d)' % item for item in sorted(counts.items()))
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.paths[row]
+        if role == Qt.DecorationRole and self.status_provider is not None:
+            return self.status_icons.get(self.status(row), QVariant())
+        if role == self.ThumbnailRole and self.thumbnail_provider is not None:
+            return self.thumbnail_provider(self.paths[row])
+        return QVariant()
+
+    def status(self, row):
+        status = self._status.get(row)
+        if status is None:
+            status = self.status_provider(self.paths[row]) if self.status_provider else self.UNKNOWN
+            if status != self.UNKNOWN:
+                # Pending rows are asked again, the provider knows when they are done.
+                self._status[row] = status
+        return status
+
+    def counts(self, row):
+        """Objects per label of row, or None for an image without annotation."""
+        if self.counts_provider is None:
+            return None
+        if row not in self._counts:
+            self._counts[row] = self.counts_provider(self.paths[row])
+        return self._counts[row]
+
+    def path(self, row):
+        return self.paths[row]
+
+    def row_of(self, path):
+        return self.paths.find(path)
+
+    def append_paths(self, paths):
+        if not paths:
+            return
+        first = len(self.paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        self.paths.extend(paths)
+        self.endInsertRows()
+
+    def merge_paths(self, paths, key):
+        """
+        Insert paths at their position in a list sorted by key, in one batch.
+        Return the rows before which they were inserted, in ascending order.
+        """
+        paths = sorted(paths, key=key)
+        rows = self.paths.sorted_rows(paths, key)
+        if not paths:
+            return rows
+        if rows[0] == rows[-1]:
+            # One block, views only need to insert it.
+            self.beginInsertRows(QModelIndex(), rows[0], rows[0] + len(paths) - 1)
+            self.paths.insert_many(rows, paths)
+            self._move_cached_rows(lambda row: row + (len(paths) if row >= rows[0] else 0))
+            self.endInsertRows()
+        else:
+            self._change_layout(lambda: self.paths.insert_many(rows, paths),
+                                lambda row: row + bisect_right(rows, row))
+        return rows
+
+    def remove_paths(self, paths):
+        """Remove the listed ones of paths in one batch; return their former rows in ascending order."""
+        rows = sorted(set(row for row in map(self.paths.find, paths) if row >= 0))
+        if not rows:
+            return rows
+        if rows[-1] - rows[0] == len(rows) - 1:
+            self.beginRemoveRows(QModelIndex(), rows[0], rows[-1])
+            self.paths.delete_rows(rows)
+            self._move_cached_rows(lambda row: row - len(rows) if row > rows[-1]
+                                   else (row if row < rows[0] else -1))
+            self.endRemoveRows()
+        else:
+            removed = set(rows)
+            self._change_layout(lambda: self.paths.delete_rows(rows),
+                                lambda row: -1 if row in removed else row - bisect_left(rows, row))
+        return rows
+
+    def _change_layout(self, update, new_row):
+        """Apply update, which inserts or removes scattered rows; new_row maps old rows to new ones or -1."""
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        update()
+        new = []
+        for index in old:
+            row = new_row(index.row())
+            new.append(self.index(row, index.column()) if row >= 0 else QModelIndex())
+        self.changePersistentIndexList(old, new)
+        self._move_cached_rows(new_row)
+        self.layoutChanged.emit()
+
+    def _move_cached_rows(self, new_row):
+        for cache in (self._status, self._counts):
+            moved = {}
+            for row, value in cache.items():
+                row = new_row(row)
+                if row >= 0:
+                    moved[row] = value
+            cache.clear()
+            cache.update(moved)
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.paths = paths
+        self._status.clear()
+        self._counts.clear()
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths.clear()
+        self._status.clear()
+        self._counts.clear()
+        self.endResetModel()
+
+    def refresh_status(self, row=None):
+        """Forget the cached status of row, or of all rows if row is None."""
+        last_column = len(self.headers) - 1
+        if row is None:
+            self._status.clear()
+            self._counts.clear()
+            if len(self.paths):
+                self.dataChanged.emit(self.index(0), self.index(len(self.paths) - 1, last_column),
+                                      [Qt.DecorationRole, Qt.DisplayRole])
+        elif 0 <= row < len(self.paths):
+            self._status.pop(row, None)
+            self._counts.pop(row, None)
+            self.dataChanged.emit(self.index(row), self.index(row, last_column),
+                                  [Qt.DecorationRole, Qt.DisplayRole])
+
+    def refresh_thumbnail(self, path):
+        row = self.paths.find(path)
+        if row >= 0:
+            self.dataChanged.emit(self.index(row), self.index(row), [self.ThumbnailRole])
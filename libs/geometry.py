@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Closed-form geometry tests used for hit-testing on the canvas.
+
+The scalar functions take plain floats and are what Shape uses for the few
+vertices of a box; the NumPy variants take (N, 2) coordinate arrays and are
+used for shapes with many vertices. Polygon containment is left to the
+cached QPainterPath of the shape, which is faster than either.
+"""
+import math
+
+import numpy as np
+
+# Below this many vertices plain Python is faster than setting up arrays.
+BATCH_MIN_POINTS = 32
+
+
+def point_in_rect(x, y, left, top, right, bottom):
+    """Whether (x, y) lies in the rectangle, borders included; the corners may be in any order."""
+    if left > right:
+        left, right = right, left
+    if top > bottom:
+        top, bottom = bottom, top
+    return left <= x <= right and top <= y <= bottom
+
+
+def point_in_circle(x, y, cx, cy, radius):
+    dx = x - cx
+    dy = y - cy
+    return dx * dx + dy * dy <= radius * radius
+
+
+def point_segment_distance(x, y, x1, y1, x2, y2):
+    """Distance from (x, y) to the segment from (x1, y1) to (x2, y2)."""
+    dx = x2 - x1
+    dy = y2 - y1
+    length = dx * dx + dy * dy
+    if length == 0:
+        return math.hypot(x - x1, y - y1)
+    t = ((x - x1) * dx + (y - y1) * dy) / length
+    if t <= 0:
+        return math.hypot(x - x1, y - y1)
+    if t >= 1:
+        return math.hypot(x - x2, y - y2)
+    return abs(dx * (y1 - y) - dy * (x1 - x)) / math.sqrt(length)
+
+
+# Batched variants.
+def segment_distances(x, y, starts, ends):
+    """Distances from (x, y) to the segments starts[i] -> ends[i], both (N, 2) arrays."""
+    d = ends - starts
+    length = np.einsum('ij,ij->i', d, d)
+    rel = np.array((x, y)) - starts
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(length > 0, np.einsum('ij,ij->i', rel, d) / length, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    nearest = starts + d * t[:, None]
+    return np.hypot(nearest[:, 0] - x, nearest[:, 1] - y)
+
+
+def ring_distances(x, y, coords):
+    """Distances from (x, y) to the edges coords[i - 1] -> coords[i] of a closed ring."""
+    return segment_distances(x, y, np.roll(coords, 1, axis=0), coords)
+
+
+def vertex_distances(x, y, coords):
+    return np.hypot(coords[:, 0] - x, coords[:, 1] - y)
+
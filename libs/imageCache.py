@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Central cache of decoded images with a memory budget.
+
+Every full resolution image the application decodes is kept here, and only
+here: the main window and the canvas share the cached QImage (Qt images are
+implicitly shared) instead of holding their own copies. The least recently
+used images are evicted once the budget is exceeded, except pinned ones such
+as the image currently shown.
+"""
+import threading
+from collections import OrderedDict
+
+try:
+    from PyQt5.QtGui import QImage
+except ImportError:
+    from PyQt4.QtGui import QImage
+
+DEFAULT_IMAGE_CACHE_BYTES = 1024 * 1024 * 1024
+
+
+def image_bytes(image):
+    """Memory held by the pixels of a QImage."""
+    if hasattr(image, 'sizeInBytes'):
+        return image.sizeInBytes()
+    return image.byteCount()
+
+
+def paintable(image):
+    """
+    Return image in a format QPainter draws directly, so the canvas does not
+    need a QPixmap copy or a conversion on every paint.
+    """
+    if image.isNull() or image.format() in (QImage.Format_RGB32, QImage.Format_ARGB32_Premultiplied):
+        return image
+    if image.hasAlphaChannel():
+        return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return image.convertToFormat(QImage.Format_RGB32)
+
+
+class ImageCache(object):
+    """
+    Thread safe, byte budgeted LRU cache of QImages keyed by path.
+
+    stats() reports the bytes held, hits, misses and evictions so that the
+    GUI and tests can see how the budget is used.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_IMAGE_CACHE_BYTES):
+        self.budget_bytes = budget_bytes
+        self._images = OrderedDict()
+        self._sizes = {}
+        self._pinned = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                self.misses += 1
+                return default
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        size = image_bytes(image)
+        with self._lock:
+            if key in self._images:
+                self._bytes -= self._sizes[key]
+            self._images[key] = image
+            self._images.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            self._evict()
+
+    def pin(self, key):
+        """Never evict key, it may be pinned before it is put into the cache."""
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict()
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def _evict(self):
+        if self._bytes <= self.budget_bytes:
+            return
+        for key in list(self._images):
+            if self._bytes <= self.budget_bytes:
+                break
+            if key in self._pinned:
+                continue
+            del self._images[key]
+            self._bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            image = self._images.pop(key, None)
+            if image is None:
+                return default
+            self._bytes -= self._sizes.pop(key)
+            return image
+
+    def clear(self):
+        """Drop every image which is not pinned."""
+        with self._lock:
+            for key in list(self._images):
+                if key not in self._pinned:
+                    del self._images[key]
+                    self._bytes -= self._sizes.pop(key)
+
+    def keys(self):
+        with self._lock:
+            return list(self._images.keys())
+
+    def total_bytes(self):
+        return self._bytes
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {'bytes': self._bytes,
+                    'budget': self.budget_bytes,
+                    'images': len(self._images),
+                    'pinned': len(self._pinned),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'hit_rate': self.hit_rate()}
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._images
+
+    def __len__(self):
+        return len(self._images)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Image geometry read from the file header.
+
+Annotation writers and readers only need the width, height and number of
+channels of an image. These are read with QImageReader without decoding the
+pixels and cached per path, so saving or reading an annotation never has to
+load the image. Works the same with or without a running GUI.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler
+except ImportError:
+    from PyQt4.QtGui import QImage, QImageReader, QImageIOHandler
+
+# Header formats of single channel images.
+GRAYSCALE_FORMATS = frozenset(getattr(QImage, name) for name in
+                              ('Format_Mono', 'Format_MonoLSB', 'Format_Grayscale8', 'Format_Grayscale16')
+                              if hasattr(QImage, name))
+
+
+class ImageMetadata(object):
+    """
+    Width, height and channels of an image, as shown (after EXIF rotation).
+
+    It answers width(), height(), isNull() and isGrayscale() like a QImage, so
+    it can be passed where only the geometry of an image is needed.
+    """
+    __slots__ = ('_width', '_height', 'channels')
+
+    def __init__(self, width, height, channels):
+        self._width = width
+        self._height = height
+        self.channels = channels
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def isNull(self):
+        return self._width <= 0 or self._height <= 0
+
+    def isGrayscale(self):
+        return self.channels == 1
+
+    def shape(self):
+        """[height, width, channels] as stored in the annotation files."""
+        return [self._height, self._width, self.channels]
+
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+CACHE_SIZE = 4096
+
+
+def read_metadata(path):
+    """
+    Return the ImageMetadata of the image file at path, or None if it can not
+    be read. Results are cached until the mtime or size of the file changes.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and entry[0] == stamp:
+            _cache.move_to_end(path)
+            return entry[1]
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if not size.isValid():
+        return None
+    if reader.transformation() & QImageIOHandler.TransformationRotate90:
+        size.transpose()
+    channels = 1 if reader.imageFormat() in GRAYSCALE_FORMATS else 3
+    metadata = ImageMetadata(size.width(), size.height(), channels)
+    with _lock:
+        _cache[path] = (stamp, metadata)
+        _cache.move_to_end(path)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return metadata
@@ -10,9 +10,12 @@ except ImportError:
 from base64 import b64encode, b64decode
 from libs.pascal_voc_io import PascalVocWriter
 from libs.yolo_io import YOLOWriter
+from libs.yolo_io import TXT_EXT
 from libs.pascal_voc_io import XML_EXT
 from libs.create_ml_io import CreateMLWriter
 from libs.create_ml_io import JSON_EXT
+from libs.saveQueue import atomic_write
+from libs.imageMetadata import read_metadata
 from enum import Enum
 import os.path
 import sys
@@ -38,19 +41,25 @@ class LabelFile(object):
         self.image_path = None
         self.image_data = None
         self.verified = False
+        # SaveQueue which writes the files in the background, None writes right away
+        self.save_queue = None
+
+    def write(self, filename, write):
+        """Write filename atomically with write(path), through the save queue if there is one."""
+        if self.save_queue is not None:
+            self.save_queue.submit(filename, write)
+        else:
+            atomic_write(filename, write)
 
     def save_create_ml_format(self, filename, shapes, image_path, image_data, class_list, line_color=None, fill_color=None, database_src=None):
         img_folder_name = os.path.basename(os.path.dirname(image_path))
         img_file_name = os.path.basename(image_path)
 
-        image = QImage()
-        image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.image_shape(image_path, image_data)
         writer = CreateMLWriter(img_folder_name, img_file_name,
                                 image_shape, shapes, filename, local_img_path=image_path)
         writer.verified = self.verified
-        writer.write()
+        self.write(filename, lambda path: writer.write(target_file=path))
 
 
     def save_pascal_voc_format(self, filename, shapes, image_path, image_data,
@@ -59,15 +68,7 @@ class LabelFile(object):
         img_folder_name = os.path.split(img_folder_path)[-1]
         img_file_name = os.path.basename(image_path)
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
-        # Read from file path because self.imageData might be empty if saving to
-        # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.image_shape(image_path, image_data)
         writer = PascalVocWriter(img_folder_name, img_file_name,
                                  image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -95,7 +96,7 @@ class LabelFile(object):
                 point_points = LabelFile.convert_points_to_point_points(points)
                 writer.add_Other(point_points, label, group_id, shape_type, difficult)
 
-        writer.save(target_file=filename)
+        self.write(filename, lambda path: writer.save(target_file=path))
         return
 
     def save_yolo_format(self, filename, shapes, image_path, image_data, class_list,
@@ -104,15 +105,7 @@ class LabelFile(object):
         img_folder_name = os.path.split(img_folder_path)[-1]
         img_file_name = os.path.basename(image_path)
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
-        # Read from file path because self.imageData might be empty if saving to
-        # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.image_shape(image_path, image_data)
         writer = YOLOWriter(img_folder_name, img_file_name,
                             image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -125,7 +118,12 @@ class LabelFile(object):
             bnd_box = LabelFile.convert_points_to_bnd_box(points)
             writer.add_bnd_box(bnd_box[0], bnd_box[1], bnd_box[2], bnd_box[3], label, difficult)
 
-        writer.save(target_file=filename, class_list=class_list)
+        # New labels are added to class_list now, the writer gets its own copy.
+        for shape in shapes:
+            if shape['label'] not in class_list:
+                class_list.append(shape['label'])
+        class_list = list(class_list)
+        self.write(filename, lambda path: writer.save(target_file=path, class_list=class_list))
         return
 
     def toggle_verify(self):
@@ -165,6 +163,40 @@ class LabelFile(object):
         file_suffix = os.path.splitext(filename)[1].lower()
         return file_suffix == LabelFile.suffix
 
+    @staticmethod
+    def image_shape(image_path, image_data=None):
+        """
+        [height, width, depth] of the image at image_path, read from the file
+        header; image_data is only used if the file can not be read.
+        """
+        metadata = read_metadata(image_path)
+        if metadata is not None:
+            return metadata.shape()
+        if isinstance(image_data, QImage) or hasattr(image_data, 'isGrayscale'):
+            return [image_data.height(), image_data.width(), 1 if image_data.isGrayscale() else 3]
+        return [0, 0, 3]
+
+    @staticmethod
+    def find_annotation_file(image_path, save_dir=None):
+        """
+        Return (annotation_path, LabelFileFormat) of the annotation that belongs
+        to image_path, or (None, None) if there is none.
+        Priority is PascalXML > YOLO > CreateML, CreateML only with a save dir.
+        """
+        basename = os.path.splitext(image_path)[0]
+        if save_dir is not None:
+            basename = os.path.join(save_dir, os.path.basename(basename))
+            candidates = ((XML_EXT, LabelFileFormat.PASCAL_VOC),
+                          (TXT_EXT, LabelFileFormat.YOLO),
+                          (JSON_EXT, LabelFileFormat.CREATE_ML))
+        else:
+            candidates = ((XML_EXT, LabelFileFormat.PASCAL_VOC),
+                          (TXT_EXT, LabelFileFormat.YOLO))
+        for ext, label_format in candidates:
+            if os.path.isfile(basename + ext):
+                return basename + ext, label_format
+        return None, None
+
     @staticmethod
     def convert_points_to_bnd_box(points):
         x_min = float('inf')
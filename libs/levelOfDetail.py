@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Level of detail for painting many shapes when zoomed out.
+
+Below full_detail_scale the canvas leaves out what cannot be seen on screen:
+vertex handles of shapes too small to grab them, polygon vertices closer
+together than a screen pixel, and labels which are too small to read or
+which would cover a label already painted. At or above full_detail_scale
+every shape is painted in full.
+"""
+import math
+
+import numpy as np
+
+
+def decimate(coords, tolerance):
+    """
+    Indices of the rows of coords, an (N, 2) array, to draw at a resolution
+    of tolerance: consecutive vertices in the same tolerance sized cell are
+    dropped. The first and the last vertex are always kept.
+    """
+    count = len(coords)
+    if tolerance <= 0 or count < 3:
+        return np.arange(count)
+    cells = np.floor(coords / tolerance)
+    keep = np.empty(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    keep[1:-1] = np.any(cells[1:-1] != cells[:-2], axis=1)
+    return np.flatnonzero(keep)
+
+
+class LevelOfDetail(object):
+    """Thresholds, in screen pixels, below which parts of the shapes are not painted."""
+
+    FULL_DETAIL_SCALE = 1.0
+    MIN_HANDLE_SHAPE_PX = 24
+    DECIMATE_PX = 1.0
+    MIN_LABEL_PX = 6
+
+    def __init__(self, full_detail_scale=FULL_DETAIL_SCALE, min_handle_shape_px=MIN_HANDLE_SHAPE_PX,
+                 decimate_px=DECIMATE_PX, min_label_px=MIN_LABEL_PX, enabled=True):
+        self.full_detail_scale = full_detail_scale
+        self.min_handle_shape_px = min_handle_shape_px
+        self.decimate_px = decimate_px
+        self.min_label_px = min_label_px
+        self.enabled = enabled
+
+    def full_detail(self, scale):
+        return not self.enabled or scale >= self.full_detail_scale
+
+    def vertices_visible(self, shape, scale):
+        """Whether shape is large enough on screen for its vertex handles."""
+        if self.full_detail(scale):
+            return True
+        left, top, right, bottom = shape.bounds()
+        return max(right - left, bottom - top) * scale >= self.min_handle_shape_px
+
+    def tolerance(self, scale):
+        """Distance in image pixels below which vertices are merged for display."""
+        if self.full_detail(scale):
+            return 0.0
+        return self.decimate_px / scale
+
+    def labels_visible(self, scale, font_size):
+        return self.full_detail(scale) or font_size * scale >= self.min_label_px
+
+
+class LabelPlacer(object):
+    """Greedy placement of label rects; a label overlapping one already placed is skipped."""
+
+    CELL_SIZE = 64
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = float(cell_size)
+        self._cells = {}
+
+    def place(self, left, top, right, bottom):
+        """Take the rect and return True unless it overlaps a rect placed before."""
+        size = self.cell_size
+        cells = [(cx, cy)
+                 for cx in range(int(math.floor(left / size)), int(math.floor(right / size)) + 1)
+                 for cy in range(int(math.floor(top / size)), int(math.floor(bottom / size)) + 1)]
+        for cell in cells:
+            for l, t, r, b in self._cells.get(cell, ()):
+                if left < r and l < right and top < b and t < bottom:
+                    return False
+        rect = (left, top, right, bottom)
+        for cell in cells:
+            self._cells.setdefault(cell, []).append(rect)
+        return True
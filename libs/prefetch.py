@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Background prefetching of the images around the current one.
+
+While the user looks at image i, the neighbouring images of the file list are
+decoded and their annotation files parsed on worker threads, so that next/prev
+navigation only has to pick up the result from the cache.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from libs.labelFile import LabelFile, LabelFileFormat
+from libs.pascal_voc_io import PascalVocReader
+from libs.yolo_io import YoloReader
+from libs.create_ml_io import CreateMLReader
+from libs.imageCache import ImageCache
+
+
+class LRUCache(object):
+    """Thread safe least-recently-used mapping which counts hits and misses."""
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+def file_stamp(path):
+    """(mtime_ns, size) of path, used to detect stale cache entries."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def read_annotation(image_path, save_dir):
+    """
+    Parse the annotation that belongs to image_path.
+    Return (annotation_path, label_format, stamp, shapes, verified); the last
+    four are None if the image has no annotation file.
+    """
+    annotation_path, label_format = LabelFile.find_annotation_file(image_path, save_dir)
+    if annotation_path is None:
+        return None, None, None, None, None
+    stamp = file_stamp(annotation_path)
+    if label_format == LabelFileFormat.PASCAL_VOC:
+        reader = PascalVocReader(annotation_path)
+    elif label_format == LabelFileFormat.YOLO:
+        reader = YoloReader(annotation_path, image_path)
+    else:
+        reader = CreateMLReader(annotation_path, image_path)
+    return annotation_path, label_format, stamp, reader.get_shapes(), reader.verified
+
+
+class ImagePrefetcher(object):
+    """
+    Decode images and parse their annotations ahead of navigation.
+
+    loader is called as loader(path) on a worker thread and must return the
+    decoded image (a QImage), it is the same function MainWindow uses for a
+    synchronous load. Decoded images go into cache, an ImageCache which may be
+    shared with the rest of the application. A prefetched image is put as the
+    most recently used one since it is about to be shown, so when the byte
+    budget is exceeded the images viewed longest ago are evicted first.
+    The number of images fetched ahead grows while the user keeps stepping in
+    the same direction quickly and shrinks back when navigation slows down or
+    turns around.
+    on_loaded(path), if given, is called from the worker thread whenever an
+    image was decoded into the cache.
+    """
+
+    FAST_STEP_SECONDS = 0.6
+
+    def __init__(self, loader, cache=None, min_depth=1, max_depth=4, workers=2, on_loaded=None,
+                 annotation_capacity=16):
+        self.loader = loader
+        self.on_loaded = on_loaded
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.depth = min_depth
+        self.direction = 1
+        self.images = cache if cache is not None else ImageCache()
+        self.annotations = LRUCache(annotation_capacity)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._last_index = None
+        self._last_time = 0.0
+
+    # Cache access from the GUI thread.
+    def get_image(self, path):
+        """Return the decoded image for path, decoding it now if it is not cached."""
+        with self._lock:
+            future = self._pending.get(path)
+        if future is not None:
+            # Already being decoded, waiting is cheaper than decoding again.
+            future.result()
+        image = self.images.get(path)
+        if image is not None:
+            return image
+        image = self.loader(path)
+        if image is not None and not image.isNull():
+            self.images.put(path, image)
+        return image
+
+    def get_annotation(self, image_path, save_dir):
+        """
+        Return the pre-parsed (annotation_path, label_format, shapes, verified)
+        of image_path, or None if it is not cached or the file changed since.
+        """
+        entry = self.annotations.get((image_path, save_dir))
+        if entry is None:
+            return None
+        annotation_path, label_format, stamp, shapes, verified = entry
+        if annotation_path is not None:
+            if shapes is None or stamp != file_stamp(annotation_path):
+                self.annotations.pop((image_path, save_dir))
+                return None
+        elif LabelFile.find_annotation_file(image_path, save_dir)[0] is not None:
+            # An annotation appeared since the image was prefetched.
+            self.annotations.pop((image_path, save_dir))
+            return None
+        return annotation_path, label_format, shapes, verified
+
+    def invalidate(self, image_path):
+        """Forget the cached annotation of image_path, e.g. after it was saved."""
+        for key in self.annotations.keys():
+            if key[0] == image_path:
+                self.annotations.pop(key)
+
+    # Scheduling.
+    def request(self, path, save_dir=None):
+        """Decode path on a worker thread unless it is cached or already pending."""
+        with self._lock:
+            if path not in self._pending and path not in self.images:
+                self._pending[path] = self._executor.submit(self._fetch, path, save_dir)
+
+    def navigate(self, paths, index, save_dir=None):
+        """
+        Tell the prefetcher that paths[index] is now shown and schedule its
+        neighbours; the depth adapts to the direction and speed of navigation.
+        """
+        if not paths or index is None:
+            return
+        now = time.time()
+        if self._last_index is not None and index != self._last_index:
+            direction = 1 if index > self._last_index else -1
+            fast = now - self._last_time < self.FAST_STEP_SECONDS
+            if direction == self.direction and fast and abs(index - self._last_index) == 1:
+                self.depth = min(self.depth + 1, self.max_depth)
+            else:
+                self.depth = self.min_depth
+            self.direction = direction
+        self._last_index = index
+        self._last_time = now
+
+        # The shown image stays wanted, its full decode may still be running.
+        wanted = [index]
+        for step in range(1, self.depth + 1):
+            wanted.append(index + self.direction * step)
+        wanted.append(index - self.direction)
+        wanted = [paths[i] for i in wanted if 0 <= i < len(paths)]
+
+        with self._lock:
+            for path, future in list(self._pending.items()):
+                if path not in wanted and future.cancel():
+                    del self._pending[path]
+            for path in wanted:
+                if path in self._pending or path in self.images:
+                    continue
+                self._pending[path] = self._executor.submit(self._fetch, path, save_dir)
+
+    def _fetch(self, path, save_dir):
+        try:
+            image = self.loader(path)
+            if image is None or image.isNull():
+                return
+            self.images.put(path, image)
+            if self.on_loaded is not None:
+                self.on_loaded(path)
+            self.annotations.put((path, save_dir), read_annotation(path, save_dir))
+        except Exception as e:
+            print('Prefetch of %s failed: %s' % (path, e))
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def stats(self):
+        stats = self.images.stats()
+        stats.update(cached=len(self.images), pending=len(self._pending), depth=self.depth)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self.images.clear()
+        self.annotations.clear()
+        self._last_index = None
+
+    def shutdown(self):
+        self.clear()
+        self._executor.shutdown(wait=False)
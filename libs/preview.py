@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Reduced resolution first paint.
+
+A screen sized preview is decoded with QImageReader.setScaledSize, which lets
+the JPEG decoder work at a reduced DCT scale, so the image can be shown long
+before a full decode would finish. The preview keeps the geometry of the full
+image, shapes and annotation files stay in full resolution coordinates.
+"""
+try:
+    from PyQt5.QtGui import QImageReader, QImageIOHandler
+    from PyQt5.QtCore import QSize
+except ImportError:
+    from PyQt4.QtGui import QImageReader, QImageIOHandler
+    from PyQt4.QtCore import QSize
+
+from libs.imageCache import paintable
+
+# Only bother with a preview if the full image has this many times more pixels.
+PREVIEW_MIN_RATIO = 2.0
+
+
+class PreviewImage(object):
+    """
+    Downscaled stand-in for a full resolution image.
+
+    It answers width(), height(), isNull() and isGrayscale() for the full
+    image like a QImage, while image holds the decoded preview pixels.
+    """
+
+    def __init__(self, path, image, size):
+        self.path = path
+        self.image = image
+        self._size = QSize(size)
+
+    def width(self):
+        return self._size.width()
+
+    def height(self):
+        return self._size.height()
+
+    def size(self):
+        return QSize(self._size)
+
+    def isNull(self):
+        return self.image.isNull() or self._size.isEmpty()
+
+    def isGrayscale(self):
+        return self.image.isGrayscale()
+
+    def resolution(self):
+        """Scale at which one preview pixel covers one screen pixel."""
+        return float(self.image.width()) / max(1, self._size.width())
+
+
+def read_preview(path, longest):
+    """
+    Decode path so that its longest side is about longest pixels.
+    Return a PreviewImage, or None if the image is small enough to be
+    decoded whole or can not be read.
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    stored = reader.size()
+    if not stored.isValid() or stored.isEmpty():
+        return None
+    scale = float(longest) / max(stored.width(), stored.height())
+    if scale * scale * PREVIEW_MIN_RATIO > 1.0:
+        return None
+    # The scaled size applies to the stored image, before the EXIF rotation.
+    reader.setScaledSize(QSize(max(1, int(stored.width() * scale)), max(1, int(stored.height() * scale))))
+    size = QSize(stored)
+    if reader.transformation() & QImageIOHandler.TransformationRotate90:
+        size.transpose()
+    image = reader.read()
+    if image.isNull():
+        return None
+    return PreviewImage(path, paintable(image), size)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Background writer for annotation files.
+
+Saves are queued and written in order by one worker thread, so navigation
+does not wait for the XML to be built and written. A file which is saved
+again before its previous save was written is only written once, with the
+latest content. Every file is written to a temporary file next to it which is
+then renamed over the target, so a crash never leaves a truncated annotation.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PyQt5.QtCore import QObject, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QObject, pyqtSignal
+
+
+def atomic_write(filename, write):
+    """Call write(path) with a temporary path and rename the result to filename."""
+    temp = '%s.%d.%d.tmp' % (filename, os.getpid(), threading.current_thread().ident)
+    try:
+        write(temp)
+        with open(temp, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(temp, filename)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+class SaveQueue(QObject):
+    """
+    Ordered queue of annotation writes run on a worker thread.
+
+    submit(filename, write) queues write(path), which must write the whole
+    file to path. saved(filename) or failed(filename, message) is emitted
+    after every write; flush() blocks until everything queued is on disk.
+    """
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None):
+        super(SaveQueue, self).__init__(parent)
+        self._jobs = OrderedDict()
+        self._running = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='SaveQueue')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, filename, write):
+        with self._condition:
+            # Latest wins: a queued write of the same file is replaced in place.
+            self._jobs[filename] = write
+            self._condition.notify_all()
+
+    def pending(self, prefix=''):
+        """Files starting with prefix which are queued or being written."""
+        with self._condition:
+            files = [f for f in self._jobs if f.startswith(prefix)]
+            if self._running is not None and self._running.startswith(prefix):
+                files.append(self._running)
+            return files
+
+    def wait(self, prefix=''):
+        """Block until no file starting with prefix is queued or being written."""
+        with self._condition:
+            while (any(f.startswith(prefix) for f in self._jobs)
+                   or (self._running is not None and self._running.startswith(prefix))):
+                self._condition.wait()
+
+    def flush(self):
+        self.wait()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs and not self._stopped:
+                    self._condition.wait()
+                if not self._jobs:
+                    return
+                filename, write = self._jobs.popitem(last=False)
+                self._running = filename
+            try:
+                atomic_write(filename, write)
+            except Exception as e:
+                self.failed.emit(filename, str(e))
+            else:
+                self.saved.emit(filename)
+            finally:
+                with self._condition:
+                    self._running = None
+                    self._condition.notify_all()
+
+    def shutdown(self):
+        """Write what is still queued and stop the worker."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
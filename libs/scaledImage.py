@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+The shown image resampled to the current zoom level.
+
+When zoomed out, painting the full resolution image means resampling every
+source pixel on every paint. The canvas instead draws a copy scaled to the
+zoom level, which is built once per zoom level on a worker thread; until it
+is ready the full resolution image is drawn as before.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PyQt5.QtGui import QImage
+    from PyQt5.QtCore import QObject, QSize, Qt, pyqtSignal
+except ImportError:
+    from PyQt4.QtGui import QImage
+    from PyQt4.QtCore import QObject, QSize, Qt, pyqtSignal
+
+
+class ScaledImage(QObject):
+    """
+    One scaled copy of one image. get() returns it if it matches the wanted
+    size, otherwise schedules it and returns None; ready is emitted from the
+    worker thread once it can be drawn. The copy carries the device pixel
+    ratio it is meant for, so that it is drawn pixel for pixel.
+    """
+    ready = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(ScaledImage, self).__init__(parent)
+        self._image = None
+        self._key = None
+        self._wanted = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def get(self, image, size, dpr=1.0):
+        key = image.cacheKey(), size.width(), size.height(), dpr
+        with self._lock:
+            if key == self._key:
+                return self._image
+            if key != self._wanted:
+                self._wanted = key
+                self._executor.submit(self._scale, key, QImage(image), QSize(size), dpr)
+        return None
+
+    def _scale(self, key, image, size, dpr):
+        with self._lock:
+            if key != self._wanted:
+                # Zoomed again before this one started.
+                return
+        scaled = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        scaled.setDevicePixelRatio(dpr)
+        with self._lock:
+            if key != self._wanted:
+                return
+            self._image = scaled
+            self._key = key
+        self.ready.emit()
+
+    def clear(self):
+        with self._lock:
+            self._image = None
+            self._key = None
+            self._wanted = None
+
+    def shutdown(self):
+        """Drop the queued scales; one already running finishes without emitting ready."""
+        self.clear()
+        self._executor.shutdown(wait=False)
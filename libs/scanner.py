@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming image directory scanner.
+
+Walks a directory tree with os.scandir and yields the image paths already in
+the final natural sort order, so that the file list can be filled batch by
+batch while the scan continues on a worker thread.
+"""
+import os
+import time
+
+try:
+    from PyQt5.QtCore import QThread, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QThread, pyqtSignal
+
+from libs.utils import natural_key
+
+
+def iter_images(folder_path, extensions, is_cancelled=lambda: False):
+    """
+    Yield the absolute paths of all files below folder_path whose extension is
+    in extensions, in the same order as natural_sort over the lower-cased paths.
+
+    Every directory is listed once and its entries are sorted by the natural
+    key of their name (directories with a trailing separator, as they appear
+    inside a full path), so a depth-first walk over the sorted entries visits
+    the paths in global order without holding the whole tree in memory.
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    stack = [iter(_sorted_entries(os.path.abspath(folder_path)))]
+    while stack:
+        if is_cancelled():
+            return
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        path, is_dir = entry
+        if is_dir:
+            stack.append(iter(_sorted_entries(path)))
+        elif path.lower().endswith(extensions):
+            yield path
+
+
+def _sorted_entries(dir_path):
+    entries = []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                name = entry.name + os.sep if is_dir else entry.name
+                entries.append((natural_key(name.lower()), entry.path, is_dir))
+    except OSError:
+        return []
+    entries.sort(key=lambda e: e[0])
+    return [(path, is_dir) for _, path, is_dir in entries]
+
+
+def path_sort_key(path):
+    """Sort key of the iter_images() order."""
+    return natural_key(path.lower())
+
+
+def sorted_row(paths, path):
+    """Row at which path has to be inserted into paths to keep the iter_images() order."""
+    key = path_sort_key(path)
+    lo, hi = 0, len(paths)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if path_sort_key(paths[mid]) <= key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class ImageScanner(QThread):
+    """
+    Scan a directory for images on a worker thread.
+
+    found is emitted with lists of paths in sort order; the first batch is
+    sent as soon as one image is found so it can be opened right away, later
+    batches are grouped by size or time to keep the GUI thread responsive.
+    """
+    found = pyqtSignal(list)
+    progress = pyqtSignal(int)
+
+    BATCH_SIZE = 2000
+    BATCH_SECONDS = 0.2
+
+    def __init__(self, folder_path, extensions, parent=None):
+        super(ImageScanner, self).__init__(parent)
+        self.folder_path = folder_path
+        self.extensions = list(extensions)
+        self.count = 0
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        batch = []
+        last_flush = time.time()
+        for path in iter_images(self.folder_path, self.extensions, self.is_cancelled):
+            batch.append(path)
+            now = time.time()
+            if not self.count or len(batch) >= self.BATCH_SIZE or now - last_flush >= self.BATCH_SECONDS:
+                self._flush(batch)
+                batch = []
+                last_flush = now
+        if batch and not self._cancelled:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        self.count += len(batch)
+        self.found.emit(batch)
+        self.progress.emit(self.count)
+
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import math
+from collections.abc import MutableSequence
 
 try:
     from PyQt5.QtGui import *
@@ -9,8 +10,9 @@ except ImportError:
     from PyQt4.QtGui import *
     from PyQt4.QtCore import *
 
-from libs import utils
-import sys
+from libs import geometry
+from libs.levelOfDetail import decimate
+import numpy as np
 
 DEFAULT_LINE_COLOR = QColor(0, 255, 0, 128)
 DEFAULT_FILL_COLOR = QColor(255, 0, 0, 128)
@@ -20,15 +22,89 @@ DEFAULT_VERTEX_FILL_COLOR = QColor(0, 255, 0, 255)
 DEFAULT_HVERTEX_FILL_COLOR = QColor(255, 0, 0)
 
 
-class Shape(object):
+class _ShapeDefaults(type):
+    """
+    Shape.line_color and Shape.fill_color are the colors of the shapes which
+    have none of their own; shape.line_color = color gives one shape its own.
+    """
+
+    @property
+    def line_color(cls):
+        return cls._default_line_color
+
+    @line_color.setter
+    def line_color(cls, color):
+        cls._default_line_color = color
+
+    @property
+    def fill_color(cls):
+        return cls._default_fill_color
+
+    @fill_color.setter
+    def fill_color(cls, color):
+        cls._default_fill_color = color
+
+
+class PointList(MutableSequence):
+    """
+    The points of a shape as a list of QPointF, backed by the coordinate
+    array of the shape. Every read makes a new QPointF: changing it in place
+    does not change the shape, assign it back instead.
+    """
+    __slots__ = ('_shape',)
+
+    def __init__(self, shape):
+        self._shape = shape
+
+    def __len__(self):
+        return self._shape._count
+
+    def __getitem__(self, i):
+        return self._shape[i]
+
+    def __setitem__(self, i, point):
+        self._shape[i] = point
+
+    def __delitem__(self, i):
+        self._shape._remove(i)
+
+    def insert(self, i, point):
+        self._shape.insertPoint(i, point)
+
+    def __iter__(self):
+        return (QPointF(x, y) for x, y in self._shape.coords().tolist())
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, PointList)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class Shape(object, metaclass=_ShapeDefaults):
+    """
+    A labelled shape. The points are stored in an (N, 2) float array which
+    grows like a list; QPointF are only made for Qt, see PointList.
+    """
+    __slots__ = ('label', 'group_id', 'fill', 'selected', 'difficult', 'paint_label', 'shape_type',
+                 '_xy', '_count', '_point_labels', '_line_color', '_fill_color', '_closed',
+                 '_highlight_index', '_highlight_mode',
+                 '_path', '_bounds', '_edges', '_display', '_outline', 'path_builds')
+
     P_SQUARE, P_ROUND = range(2)
 
     MOVE_VERTEX, NEAR_VERTEX = range(2)
 
     # The following class variables influence the drawing
     # of _all_ shape objects.
-    line_color = DEFAULT_LINE_COLOR
-    fill_color = DEFAULT_FILL_COLOR
+    _default_line_color = DEFAULT_LINE_COLOR
+    _default_fill_color = DEFAULT_FILL_COLOR
     select_line_color = DEFAULT_SELECT_LINE_COLOR
     select_fill_color = DEFAULT_SELECT_FILL_COLOR
     vertex_fill_color = DEFAULT_VERTEX_FILL_COLOR
@@ -38,11 +114,27 @@ class Shape(object):
     scale = 1.0
     label_font_size = 8
 
+    _highlight_settings = {
+        NEAR_VERTEX: (4, P_ROUND),
+        MOVE_VERTEX: (1.5, P_SQUARE),
+    }
+
     def __init__(self, label=None, line_color=None,shape_type=None,group_id=None, difficult=False, paint_label=False):
         self.label = label
         self.group_id = None if group_id =="none" else group_id
-        self.points = []
-        self.point_labels = []
+        # Path, bounding rect and edges are built on first use and dropped when the points change
+        self._path = None
+        self._bounds = None
+        self._edges = None
+        self._display = None
+        self._outline = None
+        # Number of times the geometry was rebuilt, lets tests check that the cache is used
+        self.path_builds = 0
+        # Only the first _count rows of _xy are points, the rest is room to grow.
+        # Point labels are None while they are all 1.
+        self._xy = np.empty((0, 2))
+        self._count = 0
+        self._point_labels = None
         self.fill = False
         self.selected = False
         self.difficult = difficult
@@ -51,29 +143,107 @@ class Shape(object):
 
         self._highlight_index = None
         self._highlight_mode = self.NEAR_VERTEX
-        self._highlight_settings = {
-            self.NEAR_VERTEX: (4, self.P_ROUND),
-            self.MOVE_VERTEX: (1.5, self.P_SQUARE),
-        }
 
         self._closed = False
 
-        if line_color is not None:
-            # Override the class line_color attribute
-            # with an object attribute. Currently this
-            # is used for drawing the pending line a different color.
-            self.line_color = line_color
+        # Override the class line_color attribute
+        # with an object attribute. Currently this
+        # is used for drawing the pending line a different color.
+        self._line_color = line_color
+        self._fill_color = None
+
+    @property
+    def line_color(self):
+        return Shape.line_color if self._line_color is None else self._line_color
+
+    @line_color.setter
+    def line_color(self, color):
+        self._line_color = color
+
+    @property
+    def fill_color(self):
+        return Shape.fill_color if self._fill_color is None else self._fill_color
+
+    @fill_color.setter
+    def fill_color(self, color):
+        self._fill_color = color
+
+    @property
+    def points(self):
+        return PointList(self)
+
+    @points.setter
+    def points(self, points):
+        """Copies points, a sequence of QPointF or an (N, 2) array."""
+        if isinstance(points, PointList):
+            points = points._shape.coords()
+        elif not isinstance(points, np.ndarray):
+            points = [(p.x(), p.y()) for p in points]
+        self._xy = np.array(points, dtype=float).reshape(-1, 2)
+        self._count = len(self._xy)
+        if self._point_labels is not None and len(self._point_labels) != self._count:
+            self._point_labels = None
+        self.invalidate()
+
+    @property
+    def point_labels(self):
+        if self._point_labels is None:
+            return [1] * self._count
+        return self._point_labels
+
+    @point_labels.setter
+    def point_labels(self, labels):
+        labels = list(labels)
+        self._point_labels = None if all(label == 1 for label in labels) else labels
+
+    def invalidate(self):
+        """Drop the cached geometry, must be called after the points were changed in place."""
+        self._path = None
+        self._bounds = None
+        self._edges = None
+        self._display = None
+        self._outline = None
+
+    def _insert(self, i, point, label):
+        count = self._count
+        if count == len(self._xy):
+            grown = np.empty((max(4, 2 * count), 2))
+            grown[:count] = self._xy[:count]
+            self._xy = grown
+        xy = self._xy
+        if i < count:
+            xy[i + 1:count + 1] = xy[i:count]
+        xy[i, 0] = point.x()
+        xy[i, 1] = point.y()
+        self._count = count + 1
+        if label != 1 and self._point_labels is None:
+            self._point_labels = [1] * count
+        if self._point_labels is not None:
+            self._point_labels.insert(i, label)
+        self.invalidate()
+
+    def _remove(self, i):
+        count = self._count
+        if i < 0:
+            i += count
+        if not 0 <= i < count:
+            raise IndexError('point index out of range')
+        xy = self._xy
+        xy[i:count - 1] = xy[i + 1:count]
+        self._count = count - 1
+        if self._point_labels is not None:
+            self._point_labels.pop(i)
+        self.invalidate()
 
     def close(self):
         self._closed = True
     def addPoint(self, point, label=1):
-        if self.points and point == self.points[0]:#如果点和第一个点重合，就闭合
+        if self._count and point == QPointF(self._xy[0, 0], self._xy[0, 1]):#如果点和第一个点重合，就闭合
             self.close()
         else:
-            self.points.append(point)#否则就添加点
-            self.point_labels.append(label)#添加标签
+            self._insert(self._count, point, label)#否则就添加点和标签
     def reach_max_points(self):
-        if len(self.points) >= 4:
+        if self._count >= 4:
             return True
         return False
     def canAddPoint(self):
@@ -83,12 +253,16 @@ class Shape(object):
     #         self.points.append(point)
 
     def pop_point(self):
-        if self.points:
-            return self.points.pop()
+        if self._count:
+            point = self[-1]
+            self._remove(-1)
+            return point
         return None
     def insertPoint(self, i, point, label=1):
-        self.points.insert(i, point)
-        self.point_labels.insert(i, label)
+        # Same index rules as list.insert
+        if i < 0:
+            i = max(0, self._count + i)
+        self._insert(min(i, self._count), point, label)
 
     def removePoint(self, i):
         if not self.canAddPoint() or self.shape_type == "rectangle":
@@ -114,8 +288,7 @@ class Shape(object):
             # )
             return
 
-        self.points.pop(i)
-        self.point_labels.pop(i)
+        self._remove(i)
     def is_closed(self):
         return self._closed
 
@@ -134,7 +307,11 @@ class Shape(object):
         d = math.sqrt(math.pow(r.x(), 2) + math.pow(r.y(), 2))
         rectangle = QRectF(c.x() - d, c.y() - d, 2 * d, 2 * d)
         return rectangle
-    def paint(self, painter):
+    def paint(self, painter, vertices=True, label=True, tolerance=0.0):
+        """
+        vertices and label turn the vertex handles and the label off, tolerance
+        merges polygon and line strip vertices closer than it for display.
+        """
         if self.points:
             color = self.select_line_color if self.selected else self.line_color
             pen = QPen(color)
@@ -171,10 +348,12 @@ class Shape(object):
                 for i in range(len(self.points)):
                     self.draw_vertex(vertex_path, i)
             elif self.shape_type == "linestrip":
-                line_path.moveTo(self.points[0])
-                for i, p in enumerate(self.points):
+                points, indices = self.display_points(tolerance)
+                line_path.moveTo(points[0])
+                for i, p in zip(indices, points):
                     line_path.lineTo(p)
-                    self.draw_vertex(vertex_path, i)
+                    if vertices:
+                        self.draw_vertex(vertex_path, i)
             elif self.shape_type == "points":
                 assert len(self.points) == len(self.point_labels)
                 for i, (p, l) in enumerate(
@@ -185,55 +364,85 @@ class Shape(object):
                     else:
                         self.draw_vertex(negative_vrtx_path, i)
             else:
-                line_path.moveTo(self.points[0])
+                points, indices = self.display_points(tolerance)
+                line_path.moveTo(points[0])
                 # Uncommenting the following line will draw 2 paths
                 # for the 1st vertex, and make it non-filled, which
                 # may be desirable.
                 # self.drawVertex(vrtx_path, 0)
-                for i, p in enumerate(self.points):
+                for i, p in zip(indices, points):
                     line_path.lineTo(p)
-                    self.draw_vertex(vertex_path, i)
+                    if vertices:
+                        self.draw_vertex(vertex_path, i)
                 if self.is_closed():
-                    line_path.lineTo(self.points[0])
+                    line_path.lineTo(points[0])
 
             painter.drawPath(line_path)
-            painter.drawPath(vertex_path)
-            painter.fillPath(vertex_path, self.vertex_fill_color)
+            if vertices:
+                painter.drawPath(vertex_path)
+                if self._highlight_index is not None:
+                    painter.fillPath(vertex_path, self.h_vertex_fill_color)
+                else:
+                    painter.fillPath(vertex_path, self.vertex_fill_color)
 
             # Draw text at the top-left在左上角绘制文本
-            if self.paint_label:
-                min_x = sys.maxsize
-                min_y = sys.maxsize
-                min_y_label = int(1.25 * self.label_font_size)
-                for point in self.points:
-                    min_x = min(min_x, point.x())
-                    min_y = min(min_y, point.y())
-                if min_x != sys.maxsize and min_y != sys.maxsize:
-                    font = QFont()
-                    font.setPointSize(self.label_font_size)
-                    font.setBold(True)
-                    painter.setFont(font)
-                    if self.label is None:
-                        self.label = ""
-                    if min_y < min_y_label:
-                        min_y += min_y_label
-                    painter.drawText(min_x, min_y, self.label)
+            if self.paint_label and label:
+                min_x, min_y = self.label_anchor()
+                font = QFont()
+                font.setPointSize(self.label_font_size)
+                font.setBold(True)
+                painter.setFont(font)
+                if self.label is None:
+                    self.label = ""
+                painter.drawText(QPointF(min_x, min_y), self.label)
 
             if self.fill:#如果是填充的
                 color = self.select_fill_color if self.selected else self.fill_color
                 painter.fillPath(line_path, color)
 
+    def label_anchor(self):
+        """Baseline origin of the label: the top-left of the points, moved down at the top border of the image."""
+        min_x, min_y = self.coords().min(axis=0).tolist()
+        min_y_label = int(1.25 * self.label_font_size)
+        if min_y < min_y_label:
+            min_y += min_y_label
+        return min_x, min_y
+
+    def display_points(self, tolerance=0.0):
+        """
+        (points, indices) of the vertices to draw when vertices closer than
+        tolerance may be merged; only shapes with many vertices are reduced.
+        """
+        if tolerance <= 0 or self._count < geometry.BATCH_MIN_POINTS:
+            return self.points, range(self._count)
+        if self._display is None or self._display[0] != tolerance:
+            indices = decimate(self.coords(), tolerance).tolist()
+            self._display = tolerance, [QPointF(x, y) for x, y in self.coords()[indices].tolist()], indices
+        return self._display[1], self._display[2]
+
+    def outline_path(self, tolerance=0.0):
+        """The outline as Shape.paint draws it, cached; see display_points for tolerance."""
+        if self.shape_type in ("rectangle", "circle"):
+            return self.make_path()
+        if tolerance <= 0 or self._count < geometry.BATCH_MIN_POINTS:
+            tolerance = 0.0
+        if self._outline is None or self._outline[0] != tolerance:
+            points = self.display_points(tolerance)[0]
+            path = QPainterPath(points[0])
+            for p in points[1:]:
+                path.lineTo(p)
+            if self.is_closed() and self.shape_type != "linestrip":
+                path.closeSubpath()
+            self._outline = tolerance, path
+        return self._outline[1]
+
     def draw_vertex(self, path, i):
         d = self.point_size / self.scale
         shape = self.point_type
-        point = self.points[i]
+        point = self[i]
         if i == self._highlight_index:
             size, shape = self._highlight_settings[self._highlight_mode]
             d *= size
-        if self._highlight_index is not None:
-            self.vertex_fill_color = self.h_vertex_fill_color
-        else:
-            self.vertex_fill_color = Shape.vertex_fill_color
         if shape == self.P_SQUARE:
             path.addRect(point.x() - d / 2, point.y() - d / 2, d, d)
         elif shape == self.P_ROUND:
@@ -242,24 +451,52 @@ class Shape(object):
             assert False, "unsupported vertex shape"
 
     def nearest_vertex(self, point, epsilon):
-        for i, p in enumerate(self.points):
-            if utils.distance(p - point) <= epsilon:
+        x, y = point.x(), point.y()
+        if self._count >= geometry.BATCH_MIN_POINTS:
+            near = np.flatnonzero(geometry.vertex_distances(x, y, self.coords()) <= epsilon)
+            return int(near[0]) if len(near) else None
+        for i, (px, py) in enumerate(self.coords().tolist()):
+            if math.hypot(px - x, py - y) <= epsilon:
                 return i
         return None
     def nearestEdge(self, point, epsilon):
+        x, y = point.x(), point.y()
+        if self._count >= geometry.BATCH_MIN_POINTS:
+            distances = geometry.ring_distances(x, y, self.coords())
+            i = int(np.argmin(distances))
+            return i if distances[i] <= epsilon else None
         min_distance = float("inf")#用于将字符串"inf"转换为浮点数类型的正无穷大值
         post_i = None
-        for i in range(len(self.points)):
-            line = [self.points[i - 1], self.points[i]]
-            dist = utils.distancetoline(point, line)
+        for i, edge in enumerate(self.edges()):
+            dist = geometry.point_segment_distance(x, y, *edge)
             if dist <= epsilon and dist < min_distance:
                 min_distance = dist
                 post_i = i
         return post_i
     def contains_point(self, point):
+        x, y = point.x(), point.y()
+        count = self._count
+        if self.shape_type == "rectangle":
+            if count != 4:
+                return False
+            return geometry.point_in_rect(x, y, *self.bounds())
+        if self.shape_type == "circle":
+            if count != 2:
+                return False
+            (cx, cy), (ex, ey) = self.coords().tolist()
+            return geometry.point_in_circle(x, y, cx, cy, math.hypot(ex - cx, ey - cy))
+        if count < 3 or not geometry.point_in_rect(x, y, *self.bounds()):
+            return False
+        # QPainterPath.contains on the cached path beats Python arithmetic for polygons
         return self.make_path().contains(point)
 
     def make_path(self):
+        if self._path is None:
+            self._path = self._build_path()
+            self.path_builds += 1
+        return self._path
+
+    def _build_path(self):
         if self.shape_type == "rectangle":
             path = QPainterPath()
             if len(self.points) == 4:
@@ -278,27 +515,60 @@ class Shape(object):
                 path.lineTo(p)
             return path
 
+    def bounds(self):
+        """(left, top, right, bottom) of the bounding rect."""
+        if self._bounds is None:
+            rect = self.make_path().boundingRect()
+            self._bounds = (rect.left(), rect.top(), rect.right(), rect.bottom())
+        return self._bounds
+
     def bounding_rect(self):
-        return self.make_path().boundingRect()
+        left, top, right, bottom = self.bounds()
+        return QRectF(left, top, right - left, bottom - top)
+
+    def edges(self):
+        """[x1, y1, x2, y2] from points[i - 1] to points[i] for every point, edge i ends at vertex i."""
+        if self._edges is None:
+            coords = self.coords()
+            self._edges = np.hstack((np.roll(coords, 1, axis=0), coords)).tolist()
+        return self._edges
+
+    def coords(self):
+        """The points as an (N, 2) float array; a view, which changes with the shape."""
+        return self._xy[:self._count]
+
+    def translate(self, dx, dy):
+        coords = self.coords()
+        coords += dx, dy
+        self.invalidate()
+
+    def inside(self, width, height, dx=0.0, dy=0.0):
+        """Whether the points moved by (dx, dy) are within a width x height image."""
+        coords = self.coords()
+        xs = coords[:, 0] + dx
+        ys = coords[:, 1] + dy
+        return bool(np.all((xs >= 0) & (xs <= width) & (ys >= 0) & (ys <= height)))
 
     def move_by(self, offset,pixma_w,pixma_h):
         if self.shape_type == "circle":
-            if self.points[0].x()<=0 and offset.x()<0:
+            x, y = self._xy[0].tolist()
+            if x<=0 and offset.x()<0:
                 return
-            if self.points[0].x()>=pixma_w and offset.x()>0:
+            if x>=pixma_w and offset.x()>0:
                 return
-            if self.points[0].y()<=0 and offset.y()<0:
+            if y<=0 and offset.y()<0:
                 return
-            if self.points[0].y()>=pixma_h and offset.y()>0:
+            if y>=pixma_h and offset.y()>0:
                 return
         # and  (self.points[0].x()<=0 or self.points[0].x()>= pixma_w or self.points[0].y()<=0 or self.points[0].y()>=pixma_h):
         #     print("out of range")
         #     return
-        self.points = [p + offset for p in self.points]
+        self.translate(offset.x(), offset.y())
 
     def move_vertex_by(self, i, offset):
         # print("move_vertex_by",offset)
-        self.points[i] = self.points[i] + offset
+        self.coords()[i] += offset.x(), offset.y()
+        self.invalidate()
 
     def highlight_vertex(self, i, action):
         self._highlight_index = i
@@ -309,24 +579,30 @@ class Shape(object):
 
     def copy(self):
         shape = Shape("%s" % self.label)
-        shape.points = [p for p in self.points]
+        shape._xy = self.coords().copy()
+        shape._count = self._count
+        if self._point_labels is not None:
+            shape._point_labels = list(self._point_labels)
         shape.fill = self.fill
         shape.selected = self.selected
         shape.shape_type = self.shape_type
         shape.group_id = self.group_id
         shape._closed = self._closed
-        if self.line_color != Shape.line_color:
-            shape.line_color = self.line_color
-        if self.fill_color != Shape.fill_color:
-            shape.fill_color = self.fill_color
+        shape._line_color = self._line_color
+        shape._fill_color = self._fill_color
         shape.difficult = self.difficult
         return shape
 
     def __len__(self):
-        return len(self.points)
+        return self._count
 
     def __getitem__(self, key):
-        return self.points[key]
+        coords = self.coords()
+        if isinstance(key, slice):
+            return [QPointF(x, y) for x, y in coords[key].tolist()]
+        x, y = coords[key].tolist()
+        return QPointF(x, y)
 
     def __setitem__(self, key, value):
-        self.points[key] = value
+        self.coords()[key] = value.x(), value.y()
+        self.invalidate()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Batched painting of the shapes in the canvas layer.
+
+Shapes are grouped by line color so that the pen is set once per group, and
+everything the painter needs is cached across paints: pens, the label font,
+QStaticText labels and pre-rendered vertex handles. Handles are drawn with
+one drawPixmapFragments call per group instead of a path per vertex.
+"""
+import math
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+import numpy as np
+
+from libs.levelOfDetail import LabelPlacer
+
+
+def line_width(scale):
+    """Pen width of the shape outlines in image pixels, as Shape.paint uses."""
+    return max(1, int(round(2.0 / scale)))
+
+
+def text_width(metrics, text):
+    """Advance of text; QFontMetricsF.width is deprecated since Qt 5.11."""
+    advance = getattr(metrics, 'horizontalAdvance', None) or metrics.width
+    return advance(text)
+
+
+class ShapeRenderer(object):
+    """Paint unselected, unhighlighted shapes; keeps the Qt objects it needs between paints."""
+
+    MAX_LABELS = 4096
+
+    def __init__(self):
+        self._pens = {}
+        self._sprites = {}
+        self._labels = {}
+        self._font = None
+        self._metrics = None
+        self._font_size = None
+
+    def clear(self):
+        self._pens.clear()
+        self._sprites.clear()
+        self._labels.clear()
+
+    def pen(self, color, width):
+        key = color.rgba(), width
+        pen = self._pens.get(key)
+        if pen is None:
+            pen = self._pens[key] = QPen(color)
+            pen.setWidth(width)
+        return pen
+
+    def font(self, size):
+        if size != self._font_size:
+            self._font = QFont()
+            self._font.setPointSize(size)
+            self._font.setBold(True)
+            self._metrics = QFontMetricsF(self._font)
+            self._font_size = size
+            self._labels.clear()
+        return self._font
+
+    def font_metrics(self, size):
+        self.font(size)
+        return self._metrics
+
+    def label_rect(self, shape, font_size):
+        """(left, top, right, bottom) of the label of shape in image coordinates."""
+        metrics = self.font_metrics(font_size)
+        x, y = shape.label_anchor()
+        return x, y - metrics.ascent(), x + text_width(metrics, shape.label or ''), y + metrics.descent()
+
+    def static_text(self, text):
+        label = self._labels.get(text)
+        if label is None:
+            if len(self._labels) >= self.MAX_LABELS:
+                self._labels.clear()
+            label = self._labels[text] = QStaticText(text)
+            label.setTextFormat(Qt.PlainText)
+            label.setPerformanceHint(QStaticText.AggressiveCaching)
+        return label
+
+    def vertex_sprite(self, line_color, fill_color, pen_px, size, dpr):
+        """A round vertex handle of size screen pixels, as Shape.draw_vertex draws it."""
+        key = line_color.rgba(), fill_color.rgba(), pen_px, size, dpr
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            extent = int(math.ceil(size + pen_px)) + 2
+            sprite = QPixmap(int(math.ceil(extent * dpr)), int(math.ceil(extent * dpr)))
+            sprite.setDevicePixelRatio(dpr)
+            sprite.fill(Qt.transparent)
+            p = QPainter(sprite)
+            p.setRenderHint(QPainter.Antialiasing)
+            pen = QPen(line_color)
+            pen.setWidthF(pen_px)
+            p.setPen(pen)
+            circle = QPainterPath()
+            circle.addEllipse(QPointF(extent / 2.0, extent / 2.0), size / 2.0, size / 2.0)
+            p.drawPath(circle)
+            p.fillPath(circle, fill_color)
+            p.end()
+            self._sprites[key] = sprite
+        return sprite
+
+    @staticmethod
+    def vertex_coords(shape, tolerance):
+        """Coordinates of the vertex handles Shape.paint draws for shape."""
+        if shape.shape_type == "points":
+            # Shape.paint leaves out the negative points.
+            return shape.coords()[np.asarray(shape.point_labels) == 1]
+        return shape.coords()[shape.display_points(tolerance)[1]]
+
+    def paint_shapes(self, painter, shapes, scale, font_size, lod):
+        """
+        Paint the outlines, labels and vertex handles of shapes with painter,
+        which is transformed to image coordinates; lod decides which details
+        are left out at this scale.
+        """
+        tolerance = lod.tolerance(scale)
+        labels = lod.labels_visible(scale, font_size)
+        placer = None if lod.full_detail(scale) else LabelPlacer(LabelPlacer.CELL_SIZE / scale)
+        groups = {}
+        for shape in shapes:
+            group = groups.get(shape.line_color.rgba())
+            if group is None:
+                group = groups[shape.line_color.rgba()] = (shape.line_color, [], [], [])
+            points_only = shape.shape_type == "points"
+            if not points_only:
+                group[1].append(shape)
+            if labels and shape.paint_label:
+                if placer is None or placer.place(*self.label_rect(shape, font_size)):
+                    group[2].append(shape)
+            # The vertices are all there is of a points shape.
+            if points_only or lod.vertices_visible(shape, scale):
+                group[3].append(shape)
+
+        width = line_width(scale)
+        painter.setBrush(Qt.NoBrush)
+        painter.setFont(self.font(font_size))
+        ascent = self._metrics.ascent()
+        for color, outlined, labelled, with_vertices in groups.values():
+            painter.setPen(self.pen(color, width))
+            for shape in outlined:
+                painter.drawPath(shape.outline_path(tolerance))
+            for shape in labelled:
+                x, y = shape.label_anchor()
+                painter.drawStaticText(QPointF(x, y - ascent), self.static_text(shape.label or ''))
+
+        # Vertex handles have a fixed size on screen, they are drawn untransformed on top.
+        transform = painter.transform()
+        sx, sy, dx, dy = transform.m11(), transform.m22(), transform.dx(), transform.dy()
+        dpr = painter.device().devicePixelRatioF()
+        size = shapes[0].point_size if shapes else 0
+        painter.save()
+        painter.resetTransform()
+        for color, outlined, labelled, with_vertices in groups.values():
+            if not with_vertices:
+                continue
+            sprite = self.vertex_sprite(color, with_vertices[0].vertex_fill_color, width * scale, size, dpr)
+            coords = np.concatenate([self.vertex_coords(shape, tolerance) for shape in with_vertices])
+            xs = coords[:, 0] * sx + dx
+            ys = coords[:, 1] * sy + dy
+            source = QRectF(0, 0, sprite.width(), sprite.height())
+            painter.drawPixmapFragments([QPainter.PixmapFragment.create(QPointF(x, y), source, 1.0 / dpr, 1.0 / dpr)
+                                         for x, y in zip(xs.tolist(), ys.tolist())], sprite)
+        painter.restore()
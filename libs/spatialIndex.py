@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Uniform grid over the bounding boxes of the shapes on the canvas.
+
+Hovering and clicking only have to test the few shapes whose box is near the
+cursor instead of every shape of the image. The grid is updated shape by
+shape when shapes are added, removed, moved or have their vertices edited.
+"""
+import math
+
+
+def shape_rect(shape):
+    """(left, top, right, bottom) of the bounding box of shape."""
+    return shape.bounds()
+
+
+class ShapeIndex(object):
+    """
+    Grid of CELL_SIZE image pixels, every cell lists the shapes whose box
+    overlaps it. Shapes covering more than MAX_CELLS cells are kept in a
+    separate list which is always tested.
+
+    candidates() returns the shapes in the order the canvas tests them: the
+    shape whose box starts furthest right and down first, so that a box nested
+    in another one can be picked, and shapes with the same corner in the order
+    they were added.
+    """
+
+    CELL_SIZE = 64
+    MAX_CELLS = 256
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = float(cell_size)
+        self.clear()
+
+    def clear(self):
+        self._cells = {}
+        self._large = set()
+        self._rects = {}
+        self._order = {}
+        self._next = 0
+
+    def rebuild(self, shapes):
+        self.clear()
+        for shape in shapes:
+            self.insert(shape)
+
+    def insert(self, shape):
+        if shape in self._rects:
+            self.update(shape)
+            return
+        self._order[shape] = self._next
+        self._next += 1
+        self._add(shape, shape_rect(shape))
+
+    def remove(self, shape):
+        if shape in self._rects:
+            self._discard(shape)
+            del self._order[shape]
+
+    def update(self, shape):
+        """Re-index shape after its points changed, it keeps its place in the order."""
+        if shape not in self._rects:
+            self.insert(shape)
+            return
+        rect = shape_rect(shape)
+        if rect != self._rects[shape]:
+            self._discard(shape)
+            self._add(shape, rect)
+
+    def _cell_range(self, left, top, right, bottom):
+        size = self.cell_size
+        return (int(math.floor(left / size)), int(math.floor(top / size)),
+                int(math.floor(right / size)), int(math.floor(bottom / size)))
+
+    def _add(self, shape, rect):
+        self._rects[shape] = rect
+        x1, y1, x2, y2 = self._cell_range(*rect)
+        if (x2 - x1 + 1) * (y2 - y1 + 1) > self.MAX_CELLS:
+            self._large.add(shape)
+            return
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                self._cells.setdefault((cx, cy), set()).add(shape)
+
+    def _discard(self, shape):
+        rect = self._rects.pop(shape)
+        if shape in self._large:
+            self._large.discard(shape)
+            return
+        x1, y1, x2, y2 = self._cell_range(*rect)
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                cell = self._cells[(cx, cy)]
+                cell.discard(shape)
+                if not cell:
+                    del self._cells[(cx, cy)]
+
+    def candidates(self, point, margin=0.0):
+        """Shapes whose box, grown by margin, contains point, in hit-test order."""
+        x, y = point.x(), point.y()
+        found = set(self._large)
+        x1, y1, x2, y2 = self._cell_range(x - margin, y - margin, x + margin, y + margin)
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                cell = self._cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        rects = self._rects
+        hits = [shape for shape in found
+                if rects[shape][0] - margin <= x <= rects[shape][2] + margin
+                and rects[shape][1] - margin <= y <= rects[shape][3] + margin]
+        order = self._order
+        hits.sort(key=lambda shape: (-rects[shape][0], -rects[shape][1], order[shape]))
+        return hits
+
+    def __contains__(self, shape):
+        return shape in self._rects
+
+    def __len__(self):
+        return len(self._rects)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Thumbnails for the filmstrip view.
+
+Thumbnails are generated by a pool of worker threads and stored in a single
+SQLite file keyed by path, mtime and size, so reopening a directory shows
+them without decoding the images again. The file is kept below a size budget
+by evicting the least recently used thumbnails.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PyQt5.QtGui import QImage, QImageReader, QPalette
+    from PyQt5.QtCore import Qt, QObject, QBuffer, QByteArray, QIODevice, QRect, QSize, pyqtSignal
+    from PyQt5.QtWidgets import QStyle, QStyledItemDelegate
+except ImportError:
+    from PyQt4.QtGui import QImage, QImageReader, QPalette, QStyle, QStyledItemDelegate
+    from PyQt4.QtCore import Qt, QObject, QBuffer, QByteArray, QIODevice, QRect, QSize, pyqtSignal
+
+from libs.prefetch import LRUCache, file_stamp
+
+THUMBNAIL_SIZE = 128
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.labelImgThumbnails.db')
+
+
+class ThumbnailCache(object):
+    """
+    Persistent thumbnail store in one SQLite database.
+
+    Entries are only returned while the (mtime_ns, size) stamp of the image
+    matches, and the least recently used ones are dropped once the encoded
+    thumbnails take more than max_bytes. The last use times of hits are
+    written in batches, at most USED_BATCH paths or USED_SECONDS apart; every
+    write is committed right away so that no write lock is held between calls.
+    """
+    USED_BATCH = 64
+    USED_SECONDS = 5.0
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS thumbnails ('
+                         'path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, '
+                         'used REAL, bytes INTEGER, data BLOB)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS thumbnails_used ON thumbnails (used)')
+        self._db.commit()
+        self._bytes = self._db.execute('SELECT COALESCE(SUM(bytes), 0) FROM thumbnails').fetchone()[0]
+        self._used = {}
+        self._used_written = time.time()
+
+    def get(self, path, stamp):
+        """Return the encoded thumbnail of path, or None if missing or stale."""
+        with self._lock:
+            row = self._db.execute('SELECT mtime, size, data FROM thumbnails WHERE path = ?',
+                                   (path,)).fetchone()
+            if row is None:
+                return None
+            if stamp is None or (row[0], row[1]) != tuple(stamp):
+                self._delete([path])
+                self._db.commit()
+                return None
+            now = time.time()
+            self._used[path] = now
+            if len(self._used) >= self.USED_BATCH or now - self._used_written >= self.USED_SECONDS:
+                self._write_used()
+                self._db.commit()
+            return bytes(row[2])
+
+    def put(self, path, stamp, data):
+        with self._lock:
+            self._write_used()
+            self._delete([path])
+            self._db.execute('INSERT INTO thumbnails VALUES (?, ?, ?, ?, ?, ?)',
+                             (path, stamp[0], stamp[1], time.time(), len(data), sqlite3.Binary(data)))
+            self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _write_used(self):
+        if self._used:
+            self._db.executemany('UPDATE thumbnails SET used = ? WHERE path = ?',
+                                 [(used, path) for path, used in self._used.items()])
+            self._used = {}
+        self._used_written = time.time()
+
+    def _delete(self, paths):
+        for path in paths:
+            self._used.pop(path, None)
+            row = self._db.execute('SELECT bytes FROM thumbnails WHERE path = ?', (path,)).fetchone()
+            if row is not None:
+                self._db.execute('DELETE FROM thumbnails WHERE path = ?', (path,))
+                self._bytes -= row[0]
+
+    def _evict(self):
+        # Evict down to 90% of the budget so that every put does not evict again.
+        target = self.max_bytes * 0.9
+        while self._bytes > target:
+            rows = self._db.execute('SELECT path FROM thumbnails ORDER BY used LIMIT 256').fetchall()
+            if not rows:
+                break
+            self._delete([row[0] for row in rows])
+
+    def total_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM thumbnails').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._write_used()
+            self._db.commit()
+            self._db.close()
+
+
+def make_thumbnail(path, size=THUMBNAIL_SIZE):
+    """Decode path scaled to fit into a size x size square."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    full = reader.size()
+    if full.isValid() and not full.isEmpty():
+        reader.setScaledSize(full.scaled(size, size, Qt.KeepAspectRatio))
+    return reader.read()
+
+
+def encode_thumbnail(image):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if image.hasAlphaChannel():
+        image.save(buffer, 'PNG')
+    else:
+        image.save(buffer, 'JPG', 85)
+    buffer.close()
+    return bytes(data)
+
+
+class ThumbnailLoader(QObject):
+    """
+    Hand out thumbnails from memory, the disk cache, or a worker decode.
+
+    thumbnail(path) never blocks: if the thumbnail is not in memory yet it is
+    requested and thumbnailReady(path) is emitted once it is. Only the most
+    recent max_pending requests are kept, so fast scrolling does not leave a
+    long queue of rows that are no longer visible.
+    """
+    thumbnailReady = pyqtSignal(str)
+
+    def __init__(self, cache, size=THUMBNAIL_SIZE, memory_items=2048, workers=4, max_pending=256, parent=None):
+        super(ThumbnailLoader, self).__init__(parent)
+        self.cache = cache
+        self.size = size
+        self.max_pending = max_pending
+        self.images = LRUCache(memory_items)
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def thumbnail(self, path):
+        image = self.images.get(path)
+        if image is None:
+            self.request(path)
+        return image
+
+    def request(self, path):
+        with self._lock:
+            if path in self._pending:
+                self._pending.move_to_end(path)
+                return
+            self._pending[path] = self._executor.submit(self._load, path)
+            while len(self._pending) > self.max_pending:
+                old, future = next(iter(self._pending.items()))
+                if not future.cancel():
+                    break
+                del self._pending[old]
+
+    def _load(self, path):
+        try:
+            stamp = file_stamp(path)
+            if stamp is None:
+                return
+            data = self.cache.get(path, stamp) if self.cache is not None else None
+            if data is not None:
+                image = QImage.fromData(data)
+            else:
+                image = make_thumbnail(path, self.size)
+                if image.isNull():
+                    return
+                if self.cache is not None:
+                    self.cache.put(path, stamp, encode_thumbnail(image))
+            self.images.put(path, image)
+            self.thumbnailReady.emit(path)
+        except Exception as e:
+            print('Thumbnail of %s failed: %s' % (path, e))
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def clear(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self.images.clear()
+
+    def shutdown(self):
+        self.clear()
+        self._executor.shutdown(wait=True)
+        if self.cache is not None:
+            self.cache.close()
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """Paint a file list row as a thumbnail with the file name below it."""
+
+    def __init__(self, role, size=THUMBNAIL_SIZE, parent=None):
+        super(ThumbnailDelegate, self).__init__(parent)
+        self.role = role
+        self.size = size
+
+    def sizeHint(self, option, index):
+        return QSize(self.size + 8, self.size + option.fontMetrics.height() + 12)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(rect, option.palette.brush(QPalette.Highlight))
+        image = index.data(self.role)
+        if isinstance(image, QImage) and not image.isNull():
+            x = rect.x() + (rect.width() - image.width()) // 2
+            y = rect.y() + 4 + (self.size - image.height()) // 2
+            painter.drawImage(x, y, image)
+        icon = index.data(Qt.DecorationRole)
+        if icon is not None and hasattr(icon, 'paint'):
+            icon.paint(painter, QRect(rect.x() + 4, rect.y() + 4, 16, 16))
+        text_rect = QRect(rect.x() + 2, rect.y() + self.size + 6, rect.width() - 4, option.fontMetrics.height())
+        name = os.path.basename(index.data(Qt.DisplayRole) or '')
+        painter.setPen(option.palette.color(QPalette.HighlightedText if option.state & QStyle.State_Selected
+                                            else QPalette.Text))
+        painter.drawText(text_rect, Qt.AlignCenter, option.fontMetrics.elidedText(name, Qt.ElideMiddle, text_rect.width()))
+        painter.restore()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Tiled, multi-resolution image source for images too large to hold as a
+single QPixmap.
+
+The image is never decoded as a whole: QImageReader decodes only the clip
+rectangle of a tile, scaled down to the pyramid level needed for the current
+zoom. Tiles are decoded on worker threads and kept in an LRU cache bounded by
+a byte budget. All coordinates handed to and returned from this module are in
+full resolution image space, so shapes do not need to know about tiling.
+"""
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PyQt5.QtGui import QColor, QImage, QImageReader, QImageIOHandler, QTransform
+    from PyQt5.QtCore import QObject, QPoint, QRect, QRectF, QSize, pyqtSignal
+except ImportError:
+    from PyQt4.QtGui import QColor, QImage, QImageReader, QImageIOHandler, QTransform
+    from PyQt4.QtCore import QObject, QPoint, QRect, QRectF, QSize, pyqtSignal
+
+# Images with more pixels than this are shown tiled instead of decoded whole.
+TILED_MIN_PIXELS = 100 * 1000 * 1000
+TILE_SIZE = 512
+OVERVIEW_SIZE = 2048
+DEFAULT_TILE_BUDGET = 256 * 1024 * 1024
+# Painted where neither the overview nor a tile is decoded yet.
+PLACEHOLDER_COLOR = QColor(128, 128, 128)
+
+
+def should_tile(path, min_pixels=None):
+    """True if path is big enough to be tiled and its format can decode clip rectangles."""
+    if min_pixels is None:
+        min_pixels = TILED_MIN_PIXELS
+    reader = QImageReader(path)
+    size = reader.size()
+    if not size.isValid() or size.width() * size.height() < min_pixels:
+        return False
+    return reader.supportsOption(QImageIOHandler.ClipRect)
+
+
+class TiledImageSource(QObject):
+    """
+    Pyramid of tiles decoded on demand from the image file at path.
+
+    It answers width(), height(), isNull() and isGrayscale() like a QImage so
+    that code which only needs the image geometry can use it unchanged.
+    Like the other readers it shows the image turned by its EXIF orientation:
+    tiles are decoded from the stored pixels and turned afterwards.
+    The overview, a small decode of the whole image shown behind the tiles,
+    is decoded on the workers as well; tileReady is emitted once it is there.
+    """
+    tileReady = pyqtSignal()
+
+    def __init__(self, path, tile_size=TILE_SIZE, budget_bytes=DEFAULT_TILE_BUDGET, workers=2, parent=None):
+        super(TiledImageSource, self).__init__(parent)
+        self.path = path
+        self.tile_size = tile_size
+        self.budget_bytes = budget_bytes
+        reader = QImageReader(path)
+        self._stored_size = reader.size()
+        self._transformation = reader.transformation()
+        self._size = QSize(self._stored_size)
+        if self._transformation & QImageIOHandler.TransformationRotate90:
+            self._size.transpose()
+        self._grayscale = reader.imageFormat() in (QImage.Format_Grayscale8, QImage.Format_Mono,
+                                                   QImage.Format_MonoLSB)
+        longest = max(self._size.width(), self._size.height(), 1)
+        self.max_level = max(0, int(math.ceil(math.log(float(longest) / tile_size, 2))))
+        self._overview_size = self._fit(self._size, OVERVIEW_SIZE)
+        self.overview = None
+        self._tiles = OrderedDict()
+        self._bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._overview_future = self._executor.submit(self._load_overview)
+
+    # QImage-like geometry.
+    def width(self):
+        return self._size.width()
+
+    def height(self):
+        return self._size.height()
+
+    def size(self):
+        return QSize(self._size)
+
+    def isNull(self):
+        return not self._size.isValid() or self._size.isEmpty()
+
+    def isGrayscale(self):
+        return self._grayscale
+
+    @staticmethod
+    def _fit(size, longest):
+        scale = min(1.0, float(longest) / max(size.width(), size.height(), 1))
+        return QSize(max(1, int(size.width() * scale)), max(1, int(size.height() * scale)))
+
+    def _decode(self, rect, scaled_size):
+        """Decode rect of the shown image at scaled_size, both in shown (turned) coordinates."""
+        reader = QImageReader(self.path)
+        reader.setAutoTransform(False)
+        reader.setClipRect(self._stored_rect(rect))
+        scaled_size = QSize(scaled_size)
+        if self._transformation & QImageIOHandler.TransformationRotate90:
+            scaled_size.transpose()
+        reader.setScaledSize(scaled_size)
+        return self._turned(reader.read())
+
+    def _stored_rect(self, rect):
+        """The rectangle of the stored pixels which is shown at rect."""
+        transformation = self._transformation
+        if transformation == QImageIOHandler.TransformationNone:
+            return rect
+        width, height = self._stored_size.width(), self._stored_size.height()
+        x1, y1 = rect.left(), rect.top()
+        x2, y2 = x1 + rect.width(), y1 + rect.height()
+        # Undo the steps of _turned() in reverse order.
+        if transformation & QImageIOHandler.TransformationRotate90:
+            x1, y1, x2, y2 = y1, height - x2, y2, height - x1
+        if transformation & QImageIOHandler.TransformationMirror:
+            x1, x2 = width - x2, width - x1
+        if transformation & QImageIOHandler.TransformationFlip:
+            y1, y2 = height - y2, height - y1
+        return QRect(x1, y1, x2 - x1, y2 - y1)
+
+    def _turned(self, image):
+        """Apply the EXIF orientation the way QImageReader.setAutoTransform does."""
+        transformation = self._transformation
+        if image.isNull() or transformation == QImageIOHandler.TransformationNone:
+            return image
+        image = image.mirrored(bool(transformation & QImageIOHandler.TransformationMirror),
+                               bool(transformation & QImageIOHandler.TransformationFlip))
+        if transformation & QImageIOHandler.TransformationRotate90:
+            image = image.transformed(QTransform().rotate(90))
+        return image
+
+    # Pyramid geometry.
+    def level_for_scale(self, scale):
+        """Pyramid level whose resolution is just above what the zoom needs."""
+        if scale >= 1.0:
+            return 0
+        return min(self.max_level, int(math.floor(math.log(1.0 / scale, 2))))
+
+    def tile_rect(self, level, tx, ty):
+        """Source rectangle of a tile in full resolution coordinates."""
+        span = self.tile_size << level
+        rect = QRect(tx * span, ty * span, span, span)
+        return rect.intersected(QRect(QPoint(0, 0), self._size))
+
+    def tiles_in(self, rect, level):
+        """Keys of the tiles of level which intersect rect (full resolution coordinates)."""
+        span = float(self.tile_size << level)
+        rect = QRectF(rect).intersected(QRectF(0, 0, self.width(), self.height()))
+        if rect.isEmpty():
+            return []
+        x0, y0 = int(rect.left() // span), int(rect.top() // span)
+        x1, y1 = int(math.ceil(rect.right() / span)), int(math.ceil(rect.bottom() / span))
+        return [(level, tx, ty) for ty in range(y0, y1) for tx in range(x0, x1)]
+
+    # Tile cache.
+    def cached_tile(self, key):
+        with self._lock:
+            image = self._tiles.get(key)
+            if image is not None:
+                self._tiles.move_to_end(key)
+            return image
+
+    def _store(self, key, image):
+        with self._lock:
+            self._tiles[key] = image
+            self._bytes += image.sizeInBytes()
+            while self._bytes > self.budget_bytes and len(self._tiles) > 1:
+                _, old = self._tiles.popitem(last=False)
+                self._bytes -= old.sizeInBytes()
+
+    def cached_bytes(self):
+        return self._bytes
+
+    def request(self, keys):
+        """Schedule decoding of the tiles in keys, dropping queued tiles no longer wanted."""
+        wanted = set(keys)
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if key not in wanted and future.cancel():
+                    del self._pending[key]
+            for key in keys:
+                if key in self._tiles or key in self._pending:
+                    continue
+                self._pending[key] = self._executor.submit(self._load, key)
+
+    def _load_overview(self):
+        image = self._decode(QRect(QPoint(0, 0), self._size), self._overview_size)
+        if not image.isNull():
+            self.overview = image
+            self.tileReady.emit()
+
+    def _load(self, key):
+        try:
+            level, tx, ty = key
+            rect = self.tile_rect(level, tx, ty)
+            scaled = QSize(max(1, rect.width() >> level), max(1, rect.height() >> level))
+            image = self._decode(rect, scaled)
+            if not image.isNull():
+                self._store(key, image)
+                self.tileReady.emit()
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def paint(self, painter, rect, scale):
+        """
+        Draw the part of the image inside rect (full resolution coordinates)
+        with painter, which must already be transformed to image space.
+        Missing tiles are requested and the overview is shown in their place,
+        or a flat placeholder while the overview is still being decoded.
+        """
+        full = QRectF(0, 0, self.width(), self.height())
+        overview = self.overview
+        if overview is None:
+            painter.fillRect(full, PLACEHOLDER_COLOR)
+        else:
+            painter.drawImage(full, overview)
+        level = self.level_for_scale(scale)
+        if self._overview_size.width() >= self.width() / float(1 << level):
+            # The overview is already sharp enough for this zoom level.
+            return
+        keys = self.tiles_in(rect, level)
+        missing = []
+        for key in keys:
+            image = self.cached_tile(key)
+            if image is None:
+                missing.append(key)
+            else:
+                painter.drawImage(QRectF(self.tile_rect(*key)), image)
+        self.request(missing)
+
+    def close(self):
+        self._overview_future.cancel()
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._tiles.clear()
+            self._bytes = 0
+        self._executor.shutdown(wait=False)
+
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
+from functools import lru_cache
 from math import sqrt
 
-import numpy as np
-
+from libs.geometry import point_segment_distance
 from libs.ustr import ustr
 import hashlib
 import re
@@ -92,16 +92,7 @@ def distance(p):
 
 def distancetoline(point, line):
     p1, p2 = line
-    p1 = np.array([p1.x(), p1.y()])
-    p2 = np.array([p2.x(), p2.y()])
-    p3 = np.array([point.x(), point.y()])
-    if np.dot((p3 - p1), (p2 - p1)) < 0:
-        return np.linalg.norm(p3 - p1)
-    if np.dot((p3 - p2), (p1 - p2)) < 0:
-        return np.linalg.norm(p3 - p2)
-    if np.linalg.norm(p2 - p1) == 0:
-        return np.linalg.norm(p3 - p1)
-    return np.linalg.norm(np.cross(p2 - p1, p1 - p3)) / np.linalg.norm(p2 - p1)
+    return point_segment_distance(point.x(), point.y(), p1.x(), p1.y(), p2.x(), p2.y())
 
 def format_shortcut(text):
     mod, key = text.split('+', 1)
@@ -109,12 +100,16 @@ def format_shortcut(text):
 
 
 def generate_color_by_text(text):
-    s = ustr(text)
+    return QColor(*_rgb_of_text(ustr(text)), 100)
+
+
+@lru_cache(maxsize=4096)
+def _rgb_of_text(s):
     hash_code = int(hashlib.sha256(s.encode('utf-8')).hexdigest(), 16)
     r = int((hash_code / 255) % 255)
     g = int((hash_code / 65025) % 255)
     b = int((hash_code / 16581375) % 255)
-    return QColor(r, g, b, 100)
+    return r, g, b
 
 
 def have_qstring():
@@ -126,15 +121,22 @@ def util_qt_strlistclass():
     return QStringList if have_qstring() else list
 
 
+_DIGITS = re.compile('([0-9]+)')
+
+
+def natural_key(text):
+    """
+    Key that orders strings in natural alphanumeric order, compute it once per
+    string and reuse it when sorting the same strings repeatedly.
+    """
+    return [int(c) if c.isdigit() else c for c in _DIGITS.split(text)]
+
+
 def natural_sort(list, key=lambda s:s):
     """
     Sort the list into natural alphanumeric order.
     """
-    def get_alphanum_key_func(key):
-        convert = lambda text: int(text) if text.isdigit() else text
-        return lambda s: [convert(c) for c in re.split('([0-9]+)', key(s))]
-    sort_key = get_alphanum_key_func(key)
-    list.sort(key=sort_key)
+    list.sort(key=lambda s: natural_key(key(s)))
 
 
 # QT4 has a trimmed method, in QT5 this is called strip
@@ -7,6 +7,7 @@ from xml.etree.ElementTree import Element, SubElement
 from lxml import etree
 import codecs
 from libs.constants import DEFAULT_ENCODING
+from libs.imageMetadata import ImageMetadata, read_metadata
 
 TXT_EXT = '.txt'
 ENCODE_METHOD = DEFAULT_ENCODING
@@ -82,6 +83,8 @@ class YOLOWriter:
 class YoloReader:
 
     def __init__(self, file_path, image, class_list_path=None):
+        # image is the decoded image or anything else with its width(),
+        # height() and isGrayscale(), or the path of the image file.
         # shapes type:
         # [labbel, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
         self.shapes = []
@@ -97,6 +100,8 @@ class YoloReader:
         self.classes = classes_file.read().strip('\n').split('\n')
 
 
+        if isinstance(image, str):
+            image = read_metadata(image) or ImageMetadata(0, 0, 3)
         img_size = [image.height(), image.width(),
                     1 if image.isGrayscale() else 3]
 
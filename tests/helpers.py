@@ -0,0 +1,45 @@
+"""
+Fixtures shared by the tests: shape factories and a QApplication owner.
+"""
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import QPointF
+from PyQt5.QtWidgets import QApplication
+
+from libs.shape import Shape
+
+
+def make_shape(points, shape_type='polygon', label='obj', **kwargs):
+    """A closed shape through points; kwargs are passed on to Shape."""
+    shape = Shape(label=label, shape_type=shape_type, **kwargs)
+    for x, y in points:
+        shape.addPoint(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+def make_box(x1, y1, x2, y2, label='box', **kwargs):
+    return make_shape(((x1, y1), (x2, y1), (x2, y2), (x1, y2)), 'rectangle', label, **kwargs)
+
+
+class QtTestCase(unittest.TestCase):
+    """Test case which creates the QApplication if no other test did."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance()
+        cls.owns_app = cls.app is None
+        if cls.owns_app:
+            cls.app = QApplication([])
+
+    @classmethod
+    def tearDownClass(cls):
+        # Other tests create their own QApplication, there can only be one at a time.
+        if cls.owns_app:
+            cls.app.quit()
+            del cls.app
@@ -0,0 +1,115 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import Qt
+
+from libs import annotationIndex
+from libs.annotationIndex import AnnotationIndex
+from libs.pascal_voc_io import PascalVocWriter
+
+
+class TestAnnotationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, 'index.db')
+        self.paths = [os.path.join(self.tmp, 'img%d.jpg' % i) for i in range(4)]
+        self.write('img1', ['dog', 'dog', 'cat'], verified=True)
+        self.write('img2', ['cat'])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, labels, verified=False):
+        writer = PascalVocWriter('tmp', name + '.jpg', (8, 16, 3))
+        writer.verified = verified
+        for label in labels:
+            writer.add_bnd_box(1, 1, 5, 5, label, None, 'rectangle', 0)
+        writer.save(os.path.join(self.tmp, name + '.xml'))
+
+    def build(self, index):
+        index.build(self.paths, None)
+        index._executor.shutdown(wait=True)
+
+    def test_build_and_find(self):
+        index = AnnotationIndex(self.db)
+        self.build(index)
+        entry = index.get(self.paths[1], None)
+        self.assertEqual(entry.counts, {'dog': 2, 'cat': 1})
+        self.assertTrue(entry.verified)
+        self.assertIsNone(index.get(self.paths[0], None).annotation_path)
+        self.assertEqual(index.labels(), ['cat', 'dog'])
+        unannotated = lambda e: e.annotation_path is None
+        self.assertEqual(index.find_next(self.paths, 0, None, unannotated), 3)
+        self.assertEqual(index.find_next(self.paths, 3, None, unannotated), 0)
+        self.assertEqual(index.find_next(self.paths, 1, None, lambda e: 'cat' in e.counts), 2)
+        self.assertEqual(index.find_next(self.paths, 1, None, lambda e: 'bird' in e.counts), -1)
+        index.close()
+
+    def test_lookups_do_not_read_files(self):
+        index = AnnotationIndex(None, workers=1)
+        self.assertIsNone(index.get(self.paths[1], None))
+        # Not indexed yet, so skipped instead of parsed
+        self.assertEqual(index.find_next(self.paths, 0, None, lambda e: True), -1)
+        built = []
+        index.updated.connect(built.append, Qt.DirectConnection)
+        index.CHUNK_SIZE = 1
+        index.build(self.paths, None, first=2)
+        index._executor.shutdown(wait=True)
+        self.assertEqual(built, [self.paths[2:3], self.paths[3:4], self.paths[0:1], self.paths[1:2]])
+        self.assertEqual(index.find_next(self.paths, 0, None, lambda e: e.verified), 1)
+        index.close()
+
+    def test_persistent_and_incremental(self):
+        index = AnnotationIndex(self.db)
+        self.build(index)
+        index.close()
+        parsed = []
+        original = annotationIndex.PascalVocReader
+
+        def reader(path):
+            parsed.append(path)
+            return original(path)
+
+        annotationIndex.PascalVocReader = reader
+        try:
+            index = AnnotationIndex(self.db)
+            self.build(index)
+            self.assertEqual(parsed, [])
+            self.assertEqual(index.get(self.paths[2], None).counts, {'cat': 1})
+            self.write('img0', ['bird'])
+            index.record(self.paths[0], None, os.path.join(self.tmp, 'img0.xml'), ['bird'], False)
+            self.assertEqual(index.get(self.paths[0], None).counts, {'bird': 1})
+            index.close()
+        finally:
+            annotationIndex.PascalVocReader = original
+
+    def test_stamp_of_queued_save(self):
+        index = AnnotationIndex(self.db)
+        self.build(index)
+        index._executor = annotationIndex.ThreadPoolExecutor(max_workers=1)
+        annotation_path = os.path.join(self.tmp, 'img2.xml')
+        index.record(self.paths[2], None, annotation_path, ['cat', 'bird'], False, written=False)
+        self.assertIsNone(index.get(self.paths[2], None).stamp)
+        # A build before the write lands keeps the recorded labels
+        self.build(index)
+        self.assertEqual(index.get(self.paths[2], None).counts, {'cat': 1, 'bird': 1})
+        self.write('img2', ['cat', 'bird'])
+        index.written(annotation_path)
+        self.assertEqual(index.get(self.paths[2], None).stamp, annotationIndex.file_stamp(annotation_path))
+        index.close()
+        # so the next build does not parse it again
+        index = AnnotationIndex(self.db)
+        known = index._load((self.paths[2], ''))
+        self.assertIs(annotationIndex.read_status(self.paths[2], None, known), known)
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+import os
+import sys
+import time
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import QEvent, QPoint, QPointF, QRect, QSize, Qt
+from PyQt5.QtGui import QColor, QImage, QMouseEvent, QWheelEvent
+from PyQt5.QtWidgets import QLabel, QWidget
+
+from libs.canvas import Canvas
+from libs.scaledImage import ScaledImage
+from libs.shape import Shape
+
+from helpers import QtTestCase, make_box
+
+
+def mouse_event(kind, x, y, button=Qt.NoButton):
+    return QMouseEvent(kind, QPointF(x, y), button, button, Qt.NoModifier)
+
+
+class CanvasTestCase(QtTestCase):
+
+    def setUp(self):
+        self.window = QWidget()
+        self.window.file_path = 'image.png'
+        self.window.label_coordinates = QLabel()
+        self.canvas = Canvas(parent=self.window)
+        self.canvas.resize(400, 300)
+        image = QImage(400, 300, QImage.Format_RGB32)
+        image.fill(QColor(128, 128, 128))
+        self.canvas.load_image(image)
+        self.window.resize(400, 300)
+        self.window.show()
+
+    def tearDown(self):
+        self.window.deleteLater()
+        self.app.processEvents()
+
+    def paint(self):
+        """Deliver pending timers and paint requests."""
+        self.app.processEvents()
+        self.canvas.repaint()
+
+
+class TestFrameCoalescing(CanvasTestCase):
+
+    def test_drag_paints_once_per_frame(self):
+        box = make_box(50, 50, 100, 100)
+        self.canvas.load_shapes([box])
+        self.paint()
+        self.canvas.mouseMoveEvent(mouse_event(QEvent.MouseMove, 60, 60))
+        self.paint()
+        self.canvas.frame_stats.reset()
+        self.canvas.mousePressEvent(mouse_event(QEvent.MouseButtonPress, 60, 60, Qt.LeftButton))
+        for step in range(50):
+            self.canvas.mouseMoveEvent(mouse_event(QEvent.MouseMove, 61 + step, 60, Qt.LeftButton))
+        # The shape follows the pointer at once, only painting waits for the frame.
+        self.assertEqual(box.bounds()[0], 100)
+        self.assertTrue(self.canvas._frame_timer.isActive())
+        final_text = 'Width: 50, Height: 50 / X: 110; Y: 60'
+        self.assertNotEqual(self.window.label_coordinates.text(), final_text)
+        time.sleep(self.canvas.FRAME_INTERVAL_MS / 1000.0)
+        self.paint()
+        report = self.canvas.frame_stats.report()
+        self.assertLessEqual(report['frames'], 3)
+        self.assertGreater(report['events_per_frame'], 10)
+        self.assertEqual(self.window.label_coordinates.text(), final_text)
+
+
+class TestLayer(CanvasTestCase):
+
+    def setUp(self):
+        super(TestLayer, self).setUp()
+        self.boxes = [make_box(20 + 40 * i, 20 + 30 * i, 60 + 40 * i, 60 + 30 * i) for i in range(5)]
+        self.canvas.load_shapes(self.boxes)
+        self.paint()
+
+    def assert_layer_current(self):
+        """A paint from the cached layer looks the same as one from a rebuilt layer."""
+        cached = self.canvas.grab().toImage()
+        self.canvas.invalidate_layer()
+        self.assertEqual(cached, self.canvas.grab().toImage())
+
+    def test_hover_and_drag_reuse_layer(self):
+        builds = self.canvas.layer_builds
+        for x in range(30, 200, 5):
+            self.canvas.mouseMoveEvent(mouse_event(QEvent.MouseMove, x, x))
+            self.paint()
+        self.assertEqual(self.canvas.layer_builds, builds)
+        self.canvas.mouseMoveEvent(mouse_event(QEvent.MouseMove, 40, 40))
+        self.canvas.mousePressEvent(mouse_event(QEvent.MouseButtonPress, 40, 40, Qt.LeftButton))
+        self.paint()
+        # Selecting moves the shape from the layer to the overlay.
+        builds = self.canvas.layer_builds
+        for step in range(20):
+            self.canvas.mouseMoveEvent(mouse_event(QEvent.MouseMove, 41 + step, 40, Qt.LeftButton))
+            self.paint()
+        self.assertEqual(self.canvas.layer_builds, builds)
+        self.assertEqual(self.boxes[0].bounds()[0], 40)
+        self.assert_layer_current()
+
+    def test_edits_rebuild_layer(self):
+        self.canvas.remove_shape(self.boxes[1])
+        self.paint()
+        self.assert_layer_current()
+        self.canvas.set_shape_visible(self.boxes[2], False)
+        self.paint()
+        self.assert_layer_current()
+        self.boxes[3].line_color = QColor(255, 0, 0)
+        self.canvas.invalidate_layer()
+        builds = self.canvas.layer_builds
+        self.paint()
+        self.assertEqual(self.canvas.layer_builds, builds + 1)
+
+    def test_zoomed_out_layer(self):
+        for box in self.boxes:
+            box.paint_label = True
+        self.canvas.scale = 0.3
+        self.canvas.invalidate_layer()
+        self.paint()
+        self.assert_layer_current()
+        self.canvas.level_of_detail.enabled = False
+        self.canvas.invalidate_layer()
+        full = self.canvas.grab().toImage()
+        self.canvas.level_of_detail.enabled = True
+        self.canvas.invalidate_layer()
+        # Vertex handles and overlapping labels are left out.
+        self.assertNotEqual(self.canvas.grab().toImage(), full)
+
+    def test_update_rect_covers_shape(self):
+        rect = self.canvas.shape_update_rect(self.boxes[0])
+        self.assertTrue(rect.contains(QRect(20, 20, 40, 40)))
+        self.assertLess(rect.width(), 100)
+
+
+class TestAdaptiveQuality(CanvasTestCase):
+
+    def test_interaction_paints_fast_then_full(self):
+        self.canvas.load_shapes([make_box(50, 50, 100, 100)])
+        self.paint()
+        self.canvas.frame_stats.reset()
+        self.canvas.scale = 1.5
+        self.canvas.begin_interaction()
+        self.paint()
+        self.assertTrue(self.canvas._layer_low_quality)
+        self.assertEqual(self.canvas.frame_stats.report()['interactive_frames'], 1)
+        builds = self.canvas.layer_builds
+        time.sleep(self.canvas.INTERACTION_IDLE_MS / 1000.0 + 0.05)
+        self.paint()
+        self.assertFalse(self.canvas.interacting)
+        self.assertFalse(self.canvas._layer_low_quality)
+        self.assertEqual(self.canvas.layer_builds, builds + 1)
+
+    def test_can_be_turned_off(self):
+        self.canvas.set_adaptive_quality(False)
+        self.canvas.wheelEvent(QWheelEvent(QPointF(10, 10), QPointF(10, 10), QPoint(0, 0), QPoint(0, 120),
+                                           Qt.NoButton, Qt.ControlModifier, Qt.NoScrollPhase, False))
+        self.assertFalse(self.canvas.interacting)
+        self.paint()
+        self.assertEqual(self.canvas.frame_stats.report()['interactive_frames'], 0)
+
+
+class TestImageDrawing(CanvasTestCase):
+
+    def test_scaled_copy_is_not_announced_after_shutdown(self):
+        scaled_image = ScaledImage()
+        announced = []
+        scaled_image.ready.connect(lambda: announced.append(True))
+        scaled_image.get(QImage(2000, 1500, QImage.Format_RGB32), QSize(200, 150))
+        scaled_image.shutdown()
+        scaled_image._executor.shutdown(wait=True)
+        self.app.processEvents()
+        self.assertEqual(announced, [])
+        self.assertIsNone(scaled_image._image)
+
+    def test_zoomed_out_draws_scaled_copy(self):
+        self.canvas.scale = 0.5
+        self.canvas.invalidate_layer()
+        self.paint()
+        deadline = time.time() + 5
+        while self.canvas.scaled_image._image is None and time.time() < deadline:
+            time.sleep(0.01)
+            self.app.processEvents()
+        self.assertEqual(self.canvas.scaled_image._image.size(), QSize(200, 150))
+        builds = self.canvas.layer_builds
+        self.paint()
+        # The layer is rebuilt from the scaled copy once, and not again.
+        self.assertEqual(self.canvas.layer_builds, builds + 1)
+        self.paint()
+        self.assertEqual(self.canvas.layer_builds, builds + 1)
+
+    def test_nearest_neighbour_at_high_zoom(self):
+        image = QImage(2, 2, QImage.Format_RGB32)
+        image.fill(QColor(0, 0, 0))
+        image.setPixel(0, 0, QColor(255, 255, 255).rgb())
+        self.canvas.load_image(image)
+        self.canvas.scale = 100.0
+        # Centred in the 400x300 canvas.
+        grabbed = self.canvas.grab(QRect(100, 50, 200, 200)).toImage()
+        colors = set(grabbed.pixel(x, y) for x in range(0, 200, 5) for y in range(0, 200, 5))
+        self.assertEqual(colors, {QColor(255, 255, 255).rgb(), QColor(0, 0, 0).rgb()})
+
+
+class TestBatchEdit(CanvasTestCase):
+
+    def setUp(self):
+        super(TestBatchEdit, self).setUp()
+        self.boxes = [make_box(x, 20, x + 30, 50) for x in range(10, 370, 40)]
+        self.canvas.load_shapes(self.boxes)
+
+    def test_remove_shapes(self):
+        self.canvas.select_shape(self.boxes[0])
+        version = self.canvas._layer_version
+        self.canvas.remove_shapes(self.boxes[::2])
+        self.assertEqual(self.canvas.shapes, self.boxes[1::2])
+        self.assertEqual(len(self.canvas.shape_index), len(self.boxes[1::2]))
+        self.assertIsNone(self.canvas.selected_shape)
+        self.assertEqual(self.canvas._layer_version, version + 1)
+        self.canvas.remove_shapes(self.boxes[1::2])
+        self.assertEqual(self.canvas.shapes, [])
+
+    def test_move_shapes_stays_in_image(self):
+        self.assertTrue(self.canvas.move_shapes(self.boxes[:2], -100, 10))
+        self.assertEqual(self.boxes[0][0], QPointF(0, 30))
+        self.assertEqual(self.boxes[1][0], QPointF(40, 30))
+        self.assertEqual(self.boxes[2][0], QPointF(90, 20))
+        self.assertFalse(self.canvas.move_shapes(self.boxes[:2], -5, 0))
+        self.assertEqual(self.canvas.shape_index.candidates(QPointF(15, 45)), [self.boxes[0]])
+
+
+class TestDrawingPreview(CanvasTestCase):
+
+    def start_polygon(self, shape_type):
+        self.canvas.set_editing(False)
+        self.canvas.current = Shape(shape_type=shape_type)
+        for x, y in ((50, 50), (150, 60), (160, 160)):
+            self.canvas.current.addPoint(QPointF(x, y))
+        self.canvas.set_line(QPointF(160, 160), QPointF(80, 200))
+
+    def test_preview_paths_are_kept(self):
+        self.start_polygon('polygon')
+        path, vertices = self.canvas.drawing_preview()
+        self.assertEqual(path.elementCount(), 4)
+        self.canvas.set_line(QPointF(160, 160), QPointF(90, 210))
+        self.paint()
+        self.assertIs(self.canvas.drawing_preview()[0], path)
+        # A click appends to the same path.
+        self.canvas.current.addPoint(QPointF(90, 210))
+        self.assertIs(self.canvas.drawing_preview()[0], path)
+        self.assertEqual(path.elementCount(), 5)
+        self.assertEqual(QPointF(path.elementAt(3).x, path.elementAt(3).y), QPointF(90, 210))
+
+    def test_preview_follows_cursor(self):
+        for shape_type in ('polygon', 'linestrip'):
+            self.start_polygon(shape_type)
+            self.paint()
+            before = self.canvas.grab().toImage()
+            self.canvas.set_line(QPointF(160, 160), QPointF(300, 250))
+            self.paint()
+            after = self.canvas.grab().toImage()
+            self.assertNotEqual(before.pixel(300, 250), after.pixel(300, 250))
+            self.assertEqual(before.pixel(100, 60), after.pixel(100, 60))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import QPersistentModelIndex
+
+from libs.fileListModel import FileListModel, PathStore
+
+
+class TestPathStore(unittest.TestCase):
+
+    def test_list_behaviour(self):
+        paths = ['/data/img%d.jpg' % i for i in range(1000)] + [u'/data/臉書.jpg']
+        store = PathStore(paths)
+        self.assertEqual(len(store), len(paths))
+        self.assertEqual(store[0], paths[0])
+        self.assertEqual(store[-1], paths[-1])
+        self.assertEqual(store.index(paths[500]), 500)
+        self.assertEqual(store.index(u'/data/臉書.jpg'), 1000)
+        self.assertNotIn('/data/missing.jpg', store)
+        self.assertEqual(list(store)[:3], paths[:3])
+        self.assertRaises(ValueError, store.index, '/data/missing.jpg')
+
+    def test_insert_and_pop(self):
+        store = PathStore(['/a/1.jpg', '/a/3.jpg', u'/a/臉.jpg'])
+        store.insert(1, '/a/2.jpg')
+        store.insert(0, '/a/0.jpg')
+        self.assertEqual(list(store), ['/a/0.jpg', '/a/1.jpg', '/a/2.jpg', '/a/3.jpg', u'/a/臉.jpg'])
+        self.assertEqual(store.pop(2), '/a/2.jpg')
+        self.assertEqual(store.find('/a/2.jpg'), -1)
+        self.assertEqual([store.find(path) for path in store], [0, 1, 2, 3])
+
+    def test_batches(self):
+        store = PathStore(['/a/%02d.jpg' % i for i in range(0, 20, 2)])
+        store.insert_many(store.sorted_rows(['/a/01.jpg', '/a/13.jpg', '/a/99.jpg'], str),
+                          ['/a/01.jpg', '/a/13.jpg', '/a/99.jpg'])
+        expected = sorted(['/a/%02d.jpg' % i for i in range(0, 20, 2)] + ['/a/01.jpg', '/a/13.jpg', '/a/99.jpg'])
+        self.assertEqual(list(store), expected)
+        store.delete_rows([0, 5, 12])
+        del expected[12], expected[5], expected[0]
+        self.assertEqual(list(store), expected)
+        self.assertEqual([store.find(path) for path in expected], list(range(len(expected))))
+
+    def test_merge_and_remove_keep_rows(self):
+        model = FileListModel(PathStore(['b', 'd', 'f', 'h']), lambda path: path)
+        model.status(2)
+        current = QPersistentModelIndex(model.index(2))
+        self.assertEqual(model.merge_paths(['g', 'a', 'c'], str), [0, 1, 3])
+        self.assertEqual(list(model.paths), ['a', 'b', 'c', 'd', 'f', 'g', 'h'])
+        self.assertEqual(current.row(), 4)
+        self.assertEqual(model._status, {4: 'f'})
+        self.assertEqual(model.remove_paths(['a', 'g', 'x']), [0, 5])
+        self.assertEqual(list(model.paths), ['b', 'c', 'd', 'f', 'h'])
+        self.assertEqual(current.row(), 3)
+        self.assertEqual(model.remove_paths(['f']), [3])
+        self.assertFalse(current.isValid())
+
+    def test_status_is_lazy_and_cached(self):
+        calls = []
+
+        def status(path):
+            calls.append(path)
+            return FileListModel.ANNOTATED
+
+        model = FileListModel(PathStore(['a', 'b', 'c']), status)
+        self.assertEqual(model.rowCount(), 3)
+        self.assertEqual(calls, [])
+        self.assertEqual(model.status(1), FileListModel.ANNOTATED)
+        model.status(1)
+        self.assertEqual(calls, ['b'])
+        model.refresh_status(1)
+        model.status(1)
+        self.assertEqual(calls, ['b', 'b'])
+
+    def test_pending_status_is_not_cached(self):
+        pending = set(['b'])
+        model = FileListModel(PathStore(['a', 'b']),
+                              lambda path: FileListModel.UNKNOWN if path in pending else FileListModel.VERIFIED)
+        self.assertEqual(model.status(1), FileListModel.UNKNOWN)
+        pending.clear()
+        self.assertEqual(model.status(1), FileListModel.VERIFIED)
+
+    def test_status_columns(self):
+        model = FileListModel(PathStore(['a', 'b']))
+        model.counts_provider = lambda path: {'dog': 2, 'cat': 1} if path == 'a' else None
+        self.assertEqual(model.columnCount(), 3)
+        self.assertEqual(model.data(model.index(0, FileListModel.COLUMN_OBJECTS)), '3')
+        self.assertEqual(model.data(model.index(0, FileListModel.COLUMN_LABELS)), 'cat (1), dog (2)')
+        self.assertFalse(model.data(model.index(1, FileListModel.COLUMN_OBJECTS)).isValid())
+
+
+if __name__ == '__main__':
+    unittest.main()
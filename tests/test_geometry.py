@@ -0,0 +1,70 @@
+import math
+import os
+import random
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+import numpy as np
+from PyQt5.QtCore import QPointF
+
+from libs import geometry
+from libs.shape import Shape
+
+
+def polygon(rng, count, cx=100.0, cy=100.0):
+    """Star shaped, not convex polygon around (cx, cy)."""
+    points = []
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        radius = rng.uniform(20, 80)
+        points.append((cx + radius * math.cos(angle), cy + radius * math.sin(angle)))
+    return points
+
+
+class TestGeometry(unittest.TestCase):
+
+    def test_scalar_tests(self):
+        self.assertTrue(geometry.point_in_rect(5, 5, 10, 10, 0, 0))
+        self.assertFalse(geometry.point_in_rect(11, 5, 0, 0, 10, 10))
+        self.assertTrue(geometry.point_in_circle(3, 4, 0, 0, 5))
+        self.assertFalse(geometry.point_in_circle(4, 4, 0, 0, 5))
+        self.assertEqual(geometry.point_segment_distance(5, 3, 0, 0, 10, 0), 3)
+        self.assertEqual(geometry.point_segment_distance(-3, 4, 0, 0, 10, 0), 5)
+        self.assertEqual(geometry.point_segment_distance(13, 4, 0, 0, 10, 0), 5)
+        self.assertEqual(geometry.point_segment_distance(3, 4, 0, 0, 0, 0), 5)
+
+    def test_batched_distances_match_scalar(self):
+        rng = random.Random(11)
+        coords = np.array(polygon(rng, 50))
+        for _ in range(50):
+            x, y = rng.uniform(0, 200), rng.uniform(0, 200)
+            distances = geometry.ring_distances(x, y, coords)
+            for i in range(len(coords)):
+                x1, y1 = coords[i - 1]
+                x2, y2 = coords[i]
+                self.assertAlmostEqual(distances[i], geometry.point_segment_distance(x, y, x1, y1, x2, y2))
+
+    def test_shape_uses_same_answers_for_many_vertices(self):
+        rng = random.Random(5)
+        points = polygon(rng, 64)
+        big = Shape(shape_type='polygon')
+        for x, y in points:
+            big.addPoint(QPointF(x, y))
+        self.assertGreaterEqual(len(big), geometry.BATCH_MIN_POINTS)
+        for _ in range(200):
+            point = QPointF(rng.uniform(0, 200), rng.uniform(0, 200))
+            self.assertEqual(big.contains_point(point), big.make_path().contains(point))
+            edge = big.nearestEdge(point, 5)
+            if edge is not None:
+                x1, y1, x2, y2 = big.edges()[edge]
+                self.assertLessEqual(geometry.point_segment_distance(point.x(), point.y(), x1, y1, x2, y2), 5)
+            vertex = big.nearest_vertex(point, 10)
+            expected = [i for i, p in enumerate(big.points) if math.hypot(p.x() - point.x(), p.y() - point.y()) <= 10]
+            self.assertEqual(vertex, expected[0] if expected else None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtGui import QImage
+
+from libs.imageCache import ImageCache, image_bytes, paintable
+
+
+def make_image(width=16, height=16):
+    return QImage(width, height, QImage.Format_RGB32)
+
+
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.size = image_bytes(make_image())
+        self.cache = ImageCache(3 * self.size)
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        for key in 'abc':
+            self.cache.put(key, make_image())
+        self.cache.get('a')
+        self.cache.put('d', make_image())
+        self.assertEqual(sorted(self.cache.keys()), ['a', 'c', 'd'])
+        stats = self.cache.stats()
+        self.assertEqual(stats['bytes'], 3 * self.size)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual((stats['hits'], stats['misses']), (1, 0))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_large_image_evicts_several(self):
+        for key in 'abc':
+            self.cache.put(key, make_image())
+        self.cache.put('big', make_image(16, 32))
+        self.assertEqual(sorted(self.cache.keys()), ['big', 'c'])
+        self.assertEqual(self.cache.evictions, 2)
+
+    def test_pinned_image_is_kept(self):
+        self.cache.pin('current')
+        self.cache.put('current', make_image(16, 64))
+        self.cache.put('a', make_image())
+        self.assertIn('current', self.cache)
+        self.assertNotIn('a', self.cache)
+        self.cache.clear()
+        self.assertEqual(self.cache.keys(), ['current'])
+        self.cache.unpin('current')
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.total_bytes(), 0)
+
+    def test_set_budget_and_pop(self):
+        for key in 'abc':
+            self.cache.put(key, make_image())
+        self.assertIsNotNone(self.cache.pop('a'))
+        self.assertEqual(self.cache.total_bytes(), 2 * self.size)
+        self.cache.set_budget(self.size)
+        self.assertEqual(self.cache.keys(), ['c'])
+
+    def test_paintable(self):
+        gray = QImage(4, 4, QImage.Format_Grayscale8)
+        self.assertEqual(paintable(gray).format(), QImage.Format_RGB32)
+        alpha = QImage(4, 4, QImage.Format_ARGB32)
+        self.assertEqual(paintable(alpha).format(), QImage.Format_ARGB32_Premultiplied)
+        image = make_image()
+        self.assertIs(paintable(image), image)
+
+
+if __name__ == '__main__':
+    unittest.main()
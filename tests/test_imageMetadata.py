@@ -0,0 +1,59 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtGui import QImage
+
+from libs.imageMetadata import read_metadata
+from libs.labelFile import LabelFile
+from libs.yolo_io import YoloReader
+
+
+class TestImageMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def save(self, name, width, height, image_format=QImage.Format_RGB32):
+        path = os.path.join(self.tmp, name)
+        image = QImage(width, height, image_format)
+        image.fill(0)
+        image.save(path)
+        return path
+
+    def test_header_geometry(self):
+        self.assertEqual(read_metadata(self.save('rgb.png', 40, 30)).shape(), [30, 40, 3])
+        self.assertEqual(read_metadata(self.save('gray.png', 20, 10, QImage.Format_Grayscale8)).shape(), [10, 20, 1])
+        self.assertIsNone(read_metadata(os.path.join(self.tmp, 'missing.png')))
+
+    def test_cache_follows_file_changes(self):
+        path = self.save('img.png', 40, 30)
+        self.assertEqual(read_metadata(path).width(), 40)
+        os.remove(path)
+        self.save('img.png', 64, 30)
+        os.utime(path, ns=(0, 10 ** 9))
+        self.assertEqual(read_metadata(path).width(), 64)
+
+    def test_readers_and_writers_use_the_header(self):
+        path = self.save('img.png', 200, 100)
+        self.assertEqual(LabelFile.image_shape(path), [100, 200, 3])
+        with open(os.path.join(self.tmp, 'classes.txt'), 'w') as f:
+            f.write('dog\n')
+        txt_path = os.path.join(self.tmp, 'img.txt')
+        with open(txt_path, 'w') as f:
+            f.write('0 0.5 0.5 0.5 0.5\n')
+        label, points = YoloReader(txt_path, path).get_shapes()[0][:2]
+        self.assertEqual(label, 'dog')
+        self.assertEqual(points[2], (150, 75))
+
+
+if __name__ == '__main__':
+    unittest.main()
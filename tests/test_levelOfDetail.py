@@ -0,0 +1,68 @@
+import math
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+import numpy as np
+from PyQt5.QtCore import QPointF
+
+from libs.levelOfDetail import LabelPlacer, LevelOfDetail, decimate
+from libs.shape import Shape
+
+
+def circle_polygon(count, radius=100.0):
+    shape = Shape(shape_type='polygon')
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        shape.addPoint(QPointF(200 + radius * math.cos(angle), 200 + radius * math.sin(angle)))
+    shape.close()
+    return shape
+
+
+class TestLevelOfDetail(unittest.TestCase):
+
+    def test_decimate(self):
+        coords = np.array([(0.0, 0.0), (0.2, 0.1), (0.4, 0.3), (1.5, 0.2), (1.6, 0.4), (3.0, 3.0)])
+        self.assertEqual(list(decimate(coords, 1.0)), [0, 3, 5])
+        self.assertEqual(list(decimate(coords, 0.0)), list(range(6)))
+
+    def test_shape_display_points(self):
+        shape = circle_polygon(500)
+        points, indices = shape.display_points(0.0)
+        self.assertEqual(len(points), 500)
+        # 628 pixels of outline drawn at a tenth of the resolution.
+        points, indices = shape.display_points(10.0)
+        self.assertLess(len(points), 150)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual([shape.points[i] for i in indices], points)
+        self.assertIs(shape.display_points(10.0)[0], points)
+        shape.move_vertex_by(1, QPointF(1, 1))
+        self.assertIsNot(shape.display_points(10.0)[0], points)
+
+    def test_thresholds(self):
+        lod = LevelOfDetail(full_detail_scale=1.0, min_handle_shape_px=24, min_label_px=6)
+        small = circle_polygon(8, radius=20.0)
+        self.assertTrue(lod.vertices_visible(small, 1.0))
+        self.assertTrue(lod.vertices_visible(small, 0.6))
+        self.assertFalse(lod.vertices_visible(small, 0.5))
+        self.assertEqual(lod.tolerance(2.0), 0.0)
+        self.assertEqual(lod.tolerance(0.25), 4.0)
+        self.assertFalse(lod.labels_visible(0.1, 40))
+        self.assertTrue(lod.labels_visible(0.2, 40))
+        lod.enabled = False
+        self.assertTrue(lod.full_detail(0.1))
+        self.assertEqual(lod.tolerance(0.25), 0.0)
+
+    def test_label_placer_skips_overlaps(self):
+        placer = LabelPlacer(cell_size=10)
+        self.assertTrue(placer.place(0, 0, 30, 8))
+        self.assertFalse(placer.place(25, 5, 50, 12))
+        self.assertTrue(placer.place(30, 0, 60, 8))
+        self.assertTrue(placer.place(0, 8, 30, 16))
+
+
+if __name__ == '__main__':
+    unittest.main()
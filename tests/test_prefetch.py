@@ -0,0 +1,98 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtGui import QImage
+
+from libs.imageCache import ImageCache
+from libs.pascal_voc_io import PascalVocWriter
+from libs.prefetch import ImagePrefetcher, LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction_and_hit_rate(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+
+class TestImagePrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.paths = [os.path.join(self.tmp, 'img%d.png' % i) for i in range(6)]
+        self.loaded = []
+        self.prefetcher = ImagePrefetcher(self.load, ImageCache(4 * 16 * 8 * 4), max_depth=3)
+
+    def tearDown(self):
+        self.prefetcher.shutdown()
+        shutil.rmtree(self.tmp)
+
+    def load(self, path):
+        self.loaded.append(path)
+        return QImage(16, 8, QImage.Format_RGB32)
+
+    def wait(self):
+        for future in list(self.prefetcher._pending.values()):
+            future.result()
+
+    def test_navigation_is_a_cache_hit(self):
+        self.prefetcher.get_image(self.paths[0])
+        self.prefetcher.navigate(self.paths, 0)
+        self.wait()
+        image = self.prefetcher.get_image(self.paths[1])
+        self.assertEqual(image.width(), 16)
+        self.assertEqual(self.loaded.count(self.paths[1]), 1)
+        self.assertEqual(self.prefetcher.stats()['hits'], 1)
+
+    def test_prefetched_images_evict_the_oldest_viewed(self):
+        for path in self.paths[2:6]:
+            self.prefetcher.get_image(path)
+        self.prefetcher.request(self.paths[0])
+        self.wait()
+        self.assertIn(self.paths[0], self.prefetcher.images)
+        self.assertNotIn(self.paths[2], self.prefetcher.images)
+        self.assertIn(self.paths[3], self.prefetcher.images)
+
+    def test_request_calls_on_loaded(self):
+        done = []
+        self.prefetcher.on_loaded = done.append
+        self.prefetcher.request(self.paths[2])
+        self.wait()
+        self.assertEqual(done, [self.paths[2]])
+        self.assertIn(self.paths[2], self.prefetcher.images)
+
+    def test_depth_grows_with_fast_navigation(self):
+        for i in range(4):
+            self.prefetcher.navigate(self.paths, i)
+        self.assertEqual(self.prefetcher.depth, 3)
+        self.prefetcher.navigate(self.paths, 2)
+        self.assertEqual(self.prefetcher.depth, 1)
+        self.assertEqual(self.prefetcher.direction, -1)
+
+    def test_annotation_is_preparsed_and_invalidated(self):
+        writer = PascalVocWriter('tmp', 'img1.png', (8, 16, 3))
+        writer.add_bnd_box(1, 1, 5, 5, 'dog', None, 'rectangle', 0)
+        writer.save(os.path.join(self.tmp, 'img1.xml'))
+        self.prefetcher.navigate(self.paths, 0)
+        self.wait()
+        annotation_path, _, shapes, _ = self.prefetcher.get_annotation(self.paths[1], None)
+        self.assertEqual(annotation_path, os.path.join(self.tmp, 'img1.xml'))
+        self.assertEqual(shapes[0][0], 'dog')
+        self.prefetcher.invalidate(self.paths[1])
+        self.assertIsNone(self.prefetcher.get_annotation(self.paths[1], None))
+
+
+if __name__ == '__main__':
+    unittest.main()
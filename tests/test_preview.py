@@ -0,0 +1,43 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtGui import QImage
+
+from libs.preview import read_preview
+
+
+class TestReadPreview(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def save(self, name, width, height):
+        path = os.path.join(self.tmp, name)
+        image = QImage(width, height, QImage.Format_RGB32)
+        image.fill(0)
+        image.save(path)
+        return path
+
+    def test_preview_keeps_full_geometry(self):
+        preview = read_preview(self.save('big.jpg', 1200, 800), 300)
+        self.assertEqual((preview.width(), preview.height()), (1200, 800))
+        self.assertEqual(preview.image.width(), 300)
+        self.assertEqual(preview.image.height(), 200)
+        self.assertAlmostEqual(preview.resolution(), 0.25)
+
+    def test_small_image_is_decoded_whole(self):
+        self.assertIsNone(read_preview(self.save('small.jpg', 400, 300), 300))
+        self.assertIsNone(read_preview(os.path.join(self.tmp, 'missing.jpg'), 300))
+
+
+if __name__ == '__main__':
+    unittest.main()
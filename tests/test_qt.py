@@ -1,6 +1,12 @@
 
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 
+from PyQt5.QtCore import QPointF, Qt
+from PyQt5.QtGui import QColor, QImage
+
 from labelImg import get_main_app
 
 
@@ -10,11 +16,124 @@ class TestMainWindow(TestCase):
     win = None
 
     def setUp(self):
-        self.app, self.win = get_main_app()
+        # Keep the databases out of the home directory
+        self.data_dir = tempfile.mkdtemp()
+        self.app, self.win = get_main_app(index_path=os.path.join(self.data_dir, 'annotations.db'),
+                                          thumbnail_cache_path=os.path.join(self.data_dir, 'thumbnails.db'))
 
     def tearDown(self):
         self.win.close()
         self.app.quit()
+        shutil.rmtree(self.data_dir)
 
     def test_noop(self):
         pass
+
+    def test_load_labels(self):
+        self.win.canvas.load_image(QImage(200, 200, QImage.Format_RGB32))
+        box = [(10, 10), (50, 10), (50, 50), (10, 50)]
+        shapes = [('cat', None, 'rectangle', box, None, None, False),
+                  ('dog', None, 'rectangle', box, None, None, False),
+                  ('cat', '1', 'rectangle', box, None, None, False)]
+        self.win.combo_text_list.append('dog')
+        self.win.load_labels(shapes)
+        items = [self.win.label_list.item(i) for i in range(self.win.label_list.count())]
+        self.assertEqual([item.text() for item in items], ['cat', 'dog', 'cat (1)'])
+        self.assertEqual([item.checkState() for item in items], [Qt.Unchecked, Qt.Checked, Qt.Unchecked])
+        self.assertEqual([self.win.canvas.isVisible(shape) for shape in self.win.canvas.shapes], [False, True, False])
+        self.assertEqual(self.win.combo_list, ['', 'cat', 'dog'])
+        self.assertFalse(self.win.dirty)
+
+    def test_label_filter(self):
+        canvas = self.win.canvas
+        canvas.load_image(QImage(200, 200, QImage.Format_RGB32))
+        box = [(10, 10), (50, 10), (50, 50), (10, 50)]
+        self.win.load_labels([(label, None, 'rectangle', box, None, None, False)
+                              for label in ('cat', 'dog', 'bird', 'cat')])
+        self.win.update_combo_box()
+        self.assertEqual(len(self.win.labels_to_shapes['cat']), 2)
+        cat, dog, bird, other_cat = canvas.shapes
+
+        def pick(text):
+            self.win.combo_box.cb.setCurrentIndex(self.win.combo_box.cb.findText(text))
+            version = canvas._layer_version
+            self.win.combo_selection_changed()
+            # One canvas update per filter change
+            self.assertEqual(canvas._layer_version, version + 1)
+            return [canvas.isVisible(shape) for shape in canvas.shapes]
+
+        self.assertEqual(pick('cat'), [True, False, False, True])
+        self.assertEqual(pick('dog'), [True, True, False, True])
+        self.assertEqual(pick('cat'), [False, True, False, False])
+        self.assertEqual(self.win.shapes_to_items[cat].checkState(), Qt.Unchecked)
+        self.assertEqual(pick(''), [True, True, True, True])
+        self.assertFalse(self.win.dirty)
+
+        self.win.remove_label(bird)
+        self.assertNotIn('bird', self.win.labels_to_shapes)
+
+    def test_batch_edit(self):
+        canvas = self.win.canvas
+        canvas.load_image(QImage(2000, 2000, QImage.Format_RGB32))
+        box = [(10, 10), (50, 10), (50, 50), (10, 50)]
+        self.win.load_labels([('cat' if i % 2 else 'dog', None, 'rectangle', box, None, None, False)
+                              for i in range(2000)])
+        self.win.set_clean()
+        shapes = list(canvas.shapes)
+
+        self.assertTrue(self.win.edit_shapes(shapes[:3], label='bird', group_id='2',
+                                             fill_color=QColor(1, 2, 3), offset=QPointF(5, 0)))
+        self.assertTrue(self.win.dirty)
+        self.assertEqual(len(self.win.labels_to_shapes['bird']), 3)
+        self.assertEqual(self.win.shapes_to_items[shapes[0]].text(), 'bird (2)')
+        self.assertEqual(shapes[2].fill_color, QColor(1, 2, 3))
+        self.assertEqual(shapes[2][0], QPointF(15, 10))
+        self.assertIn('bird', self.win.combo_list)
+
+        for shape in shapes[:2]:
+            self.win.shapes_to_items[shape].setSelected(True)
+        self.assertEqual(self.win.selected_shapes(), shapes[:2])
+        self.win.delete_selected_shape()
+        self.assertEqual(len(canvas.shapes), 1998)
+        self.assertEqual(len(self.win.labels_to_shapes['bird']), 1)
+
+        self.win.delete_all_shape()
+        self.assertEqual(canvas.shapes, [])
+        self.assertEqual(self.win.label_list.count(), 0)
+        self.assertEqual(self.win.labels_to_shapes, {})
+        self.assertTrue(self.win.no_shapes())
+        # Closing a changed file asks to save it
+        self.win.set_clean()
+
+    def test_switch_dir_during_scan(self):
+        old_dir, new_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, old_dir)
+        self.addCleanup(shutil.rmtree, new_dir)
+        image = os.path.join(old_dir, 'a.png')
+        QImage(20, 20, QImage.Format_RGB32).save(image)
+        # The image opened last time is not found yet when the scan is cancelled
+        self.win.settings[old_dir] = os.path.join(old_dir, 'z.png')
+        self.win.import_dir_images(old_dir)
+        scanner = self.win.dir_scanner
+        scanner.wait()
+        self.win.dir_images_found(scanner, [image])
+        self.win.import_dir_images(new_dir)
+        self.assertIsNone(self.win.file_path)
+        self.assertEqual(len(self.win.m_img_list), 0)
+
+    def test_watcher_delta_during_scan(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        a, b, c = [os.path.join(root, name) for name in ('a.png', 'b.png', 'c.png')]
+        self.win.import_dir_images(root)
+        scanner = self.win.dir_scanner
+        scanner.wait()
+        self.win.dir_images_found(scanner, [a])
+        # Reported by the watcher while the scan still has c to emit
+        self.win.dir_images_added([c, b])
+        self.win.dir_images_found(scanner, [c])
+        self.assertEqual(list(self.win.m_img_list), [a, c])
+        self.win.dir_scan_finished(scanner)
+        self.assertEqual(list(self.win.m_img_list), [a, b, c])
+        self.win.dir_images_removed([a, c])
+        self.assertEqual(list(self.win.m_img_list), [b])
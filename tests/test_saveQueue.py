@@ -0,0 +1,82 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import Qt
+
+from libs.saveQueue import SaveQueue, atomic_write
+
+
+def write_text(text):
+    def write(path):
+        with open(path, 'w') as f:
+            f.write(text)
+    return write
+
+
+class TestSaveQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.queue = SaveQueue()
+
+    def tearDown(self):
+        self.queue.shutdown()
+        shutil.rmtree(self.tmp)
+
+    def read(self, name):
+        with open(os.path.join(self.tmp, name)) as f:
+            return f.read()
+
+    def test_latest_wins_in_order(self):
+        gate = threading.Event()
+        written = []
+
+        def blocked(path):
+            gate.wait()
+            written.append('a')
+            write_text('a')(path)
+
+        def record(text):
+            def write(path):
+                written.append(text)
+                write_text(text)(path)
+            return write
+
+        a, b = os.path.join(self.tmp, 'a.xml'), os.path.join(self.tmp, 'b.xml')
+        self.queue.submit(a, blocked)
+        self.queue.submit(b, record('b1'))
+        self.queue.submit(b, record('b2'))
+        self.assertEqual(sorted(self.queue.pending(self.tmp)), [a, b])
+        gate.set()
+        self.queue.flush()
+        self.assertEqual(written, ['a', 'b2'])
+        self.assertEqual(self.read('b.xml'), 'b2')
+        self.assertEqual(self.queue.pending(), [])
+
+    def test_failure_keeps_old_file(self):
+        target = os.path.join(self.tmp, 'c.xml')
+        atomic_write(target, write_text('old'))
+        failures = []
+        self.queue.failed.connect(lambda path, message: failures.append((path, message)), Qt.DirectConnection)
+
+        def broken(path):
+            with open(path, 'w') as f:
+                f.write('partial')
+            raise IOError('disk full')
+
+        self.queue.submit(target, broken)
+        self.queue.flush()
+        self.assertEqual(failures, [(target, 'disk full')])
+        self.assertEqual(self.read('c.xml'), 'old')
+        self.assertEqual(os.listdir(self.tmp), ['c.xml'])
+
+
+if __name__ == '__main__':
+    unittest.main()
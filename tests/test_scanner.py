@@ -0,0 +1,104 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from libs.dirWatcher import DirectoryWatcher
+from libs.scanner import iter_images, sorted_row
+from libs.utils import natural_sort
+
+
+class TestIterImages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        files = ['a1.jpg', 'a10.jpg', 'a2.JPG', 'a-b.png', 'notes.txt',
+                 'a/x.jpg', 'a1/3.jpg', 'a1/20.jpg', 'B/c/d9.bmp', 'B/c/d10.bmp']
+        for name in files:
+            path = os.path.join(self.tmp, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_order_matches_natural_sort(self):
+        extensions = ['.jpg', '.png', '.bmp']
+        expected = []
+        for root, dirs, files in os.walk(self.tmp):
+            for file in files:
+                if file.lower().endswith(tuple(extensions)):
+                    expected.append(os.path.abspath(os.path.join(root, file)))
+        natural_sort(expected, key=lambda x: x.lower())
+        self.assertEqual(list(iter_images(self.tmp, extensions)), expected)
+        self.assertEqual(len(expected), 9)
+
+    def test_cancel(self):
+        self.assertEqual(list(iter_images(self.tmp, ['.jpg'], lambda: True)), [])
+
+    def test_sorted_row(self):
+        paths = list(iter_images(self.tmp, ['.jpg']))
+        for path in paths:
+            row = paths.index(path)
+            self.assertEqual(sorted_row(paths[:row] + paths[row + 1:], path), row)
+
+
+class TestDirectoryWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.events = []
+        self.watcher = DirectoryWatcher(['.jpg'])
+        self.watcher.added.connect(lambda paths: self.events.append(('added', paths)))
+        self.watcher.removed.connect(lambda paths: self.events.append(('removed', paths)))
+        self.watcher.watch(self.tmp)
+
+    def tearDown(self):
+        self.watcher.shutdown()
+        shutil.rmtree(self.tmp)
+
+    def touch(self, name):
+        path = os.path.join(self.tmp, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+        return path
+
+    def refresh(self, dir_path):
+        self.watcher.refresh(dir_path)
+        self.watcher.wait()
+
+    def test_deltas(self):
+        a = self.touch('a.jpg')
+        self.watcher.add_paths([a])
+        b = self.touch('b.jpg')
+        self.touch('notes.txt')
+        self.refresh(self.tmp)
+        self.assertEqual(self.events, [('added', [b])])
+        os.rename(a, os.path.join(self.tmp, 'c.jpg'))
+        sub = self.touch('sub/d.jpg')
+        self.refresh(self.tmp)
+        self.assertEqual(self.events[1], ('removed', [a]))
+        self.assertEqual(sorted(self.events[2][1]), [os.path.join(self.tmp, 'c.jpg'), sub])
+        self.assertIn(os.path.dirname(sub), self.watcher._watcher.directories())
+        shutil.rmtree(os.path.dirname(sub))
+        self.refresh(os.path.dirname(sub))
+        self.assertEqual(self.events[3], ('removed', [sub]))
+        self.assertNotIn(os.path.dirname(sub), self.watcher._watcher.directories())
+
+    def test_listing_runs_off_the_calling_thread(self):
+        threads = []
+        listing = self.watcher._list
+        self.watcher._list = lambda dir_path: threads.append(threading.current_thread()) or listing(dir_path)
+        self.touch('a.jpg')
+        self.refresh(self.tmp)
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(len(threads), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import QEvent, QPointF, Qt
+from PyQt5.QtGui import QColor, QImage, QMouseEvent
+from PyQt5.QtWidgets import QLabel, QWidget
+
+from libs.canvas import Canvas
+from libs.shape import Shape
+
+from helpers import QtTestCase, make_shape
+
+
+class TestShapeGeometryCache(QtTestCase):
+
+    def test_geometry_is_built_once(self):
+        shape = make_shape([(0, 0), (10, 0), (10, 10), (0, 10)], 'rectangle')
+        for _ in range(3):
+            shape.contains_point(QPointF(5, 5))
+            shape.bounding_rect()
+            shape.nearestEdge(QPointF(5, 0), 1)
+        self.assertEqual(shape.path_builds, 1)
+        shape.bounding_rect().moveTo(50, 50)
+        self.assertEqual(shape.bounding_rect().x(), 0)
+
+    def test_point_changes_invalidate(self):
+        shape = make_shape([(0, 0), (10, 0), (10, 10)])
+        changes = [lambda: shape.move_by(QPointF(5, 0), 100, 100),
+                   lambda: shape.move_vertex_by(0, QPointF(-5, 0)),
+                   lambda: shape.insertPoint(1, QPointF(20, 0)),
+                   lambda: shape.removePoint(1),
+                   lambda: shape.addPoint(QPointF(0, 20)),
+                   lambda: shape.pop_point(),
+                   lambda: shape.__setitem__(0, QPointF(-10, -10))]
+        for builds, change in enumerate(changes, 2):
+            before = shape.bounding_rect()
+            change()
+            self.assertNotEqual(shape.bounding_rect(), before)
+            self.assertEqual(shape.path_builds, builds)
+        shape.points = [QPointF(0, 0), QPointF(1, 0), QPointF(1, 1)]
+        self.assertEqual(shape.bounding_rect().width(), 1)
+        self.assertEqual(len(shape.edges()), 3)
+
+    def test_hover_does_not_rebuild_untouched_shapes(self):
+        window = QWidget()
+        window.file_path = None
+        window.label_coordinates = QLabel()
+        canvas = Canvas(parent=window)
+        canvas.load_image(QImage(400, 400, QImage.Format_RGB32))
+        shapes = [make_shape([(x, 10), (x + 30, 10), (x + 30, 40), (x, 40)], 'rectangle') for x in range(0, 400, 40)]
+        canvas.load_shapes(shapes)
+        builds = [shape.path_builds for shape in shapes]
+        for x in range(0, 400, 7):
+            canvas.mouseMoveEvent(QMouseEvent(QEvent.MouseMove, QPointF(x, 25), Qt.NoButton, Qt.NoButton, Qt.NoModifier))
+        self.assertIsNotNone(canvas.h_shape)
+        self.assertEqual([shape.path_builds for shape in shapes], builds)
+        window.deleteLater()
+        self.app.processEvents()
+
+
+class TestShapeStorage(unittest.TestCase):
+
+    def test_points_behave_like_a_list(self):
+        shape = make_shape([(0, 0), (10, 0), (10, 10)])
+        points = shape.points
+        self.assertEqual(len(points), 3)
+        self.assertEqual(points[-1], QPointF(10, 10))
+        self.assertEqual(points[1:], [QPointF(10, 0), QPointF(10, 10)])
+        self.assertEqual(list(points), [QPointF(0, 0), QPointF(10, 0), QPointF(10, 10)])
+        points[0] = QPointF(-1, -1)
+        points.append(QPointF(0, 10))
+        self.assertEqual(shape[0], QPointF(-1, -1))
+        self.assertEqual(shape.pop_point(), QPointF(0, 10))
+        shape.insertPoint(-1, QPointF(5, 5))
+        self.assertEqual(shape.points, [QPointF(-1, -1), QPointF(10, 0), QPointF(5, 5), QPointF(10, 10)])
+        self.assertEqual(shape.point_labels, [1, 1, 1, 1])
+        # Reads are copies, the shape only changes through assignment.
+        point = shape[0]
+        point += QPointF(100, 100)
+        self.assertEqual(shape[0], QPointF(-1, -1))
+
+    def test_points_are_copied(self):
+        line = make_shape([(0, 0), (10, 10)], 'line')
+        shape = Shape(shape_type='line')
+        shape.points = line.points
+        line[1] = QPointF(20, 20)
+        self.assertEqual(shape[1], QPointF(10, 10))
+        copied = shape.copy()
+        copied.move_by(QPointF(1, 2), 100, 100)
+        self.assertEqual(copied[0], QPointF(1, 2))
+        self.assertEqual(shape[0], QPointF(0, 0))
+
+    def test_point_labels(self):
+        shape = Shape(shape_type='points')
+        shape.addPoint(QPointF(1, 1))
+        shape.addPoint(QPointF(2, 2), label=0)
+        shape.addPoint(QPointF(3, 3))
+        del shape.points[0]
+        self.assertEqual(shape.point_labels, [0, 1])
+        self.assertEqual(shape.copy().point_labels, [0, 1])
+        shape.points = [QPointF(0, 0)]
+        self.assertEqual(shape.point_labels, [1])
+
+    def test_translate_and_inside(self):
+        shape = make_shape([(0, 0), (10, 0), (10, 10), (0, 10)], 'rectangle')
+        before = shape.bounding_rect()
+        shape.translate(5, 5)
+        self.assertEqual(shape.bounding_rect(), before.translated(5, 5))
+        self.assertTrue(shape.inside(15, 15))
+        self.assertFalse(shape.inside(15, 15, 1, 0))
+        self.assertTrue(shape.inside(15, 15, -5, -5))
+
+    def test_colors(self):
+        default = Shape.line_color
+        shape = Shape()
+        self.assertIs(shape.line_color, default)
+        try:
+            Shape.line_color = QColor(1, 2, 3)
+            self.assertEqual(shape.line_color, QColor(1, 2, 3))
+            shape.line_color = QColor(4, 5, 6)
+            self.assertEqual(Shape.line_color, QColor(1, 2, 3))
+            self.assertEqual(shape.copy().line_color, QColor(4, 5, 6))
+        finally:
+            Shape.line_color = default
+        self.assertFalse(hasattr(shape, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtGui import QColor, QImage, QPainter
+
+from libs.levelOfDetail import LevelOfDetail
+from libs.shape import Shape
+from libs.shapeRenderer import ShapeRenderer
+
+from helpers import QtTestCase, make_box, make_shape
+
+
+class TestShapeRenderer(QtTestCase):
+
+    def render(self, renderer, shapes):
+        image = QImage(200, 200, QImage.Format_ARGB32_Premultiplied)
+        image.fill(QColor(255, 255, 255))
+        painter = QPainter(image)
+        renderer.paint_shapes(painter, shapes, 1.0, 8, LevelOfDetail())
+        painter.end()
+        return image
+
+    def test_paints_outlines_and_vertices(self):
+        red = make_box(20, 40, 80, 100, line_color=QColor(255, 0, 0), paint_label=True)
+        blue = make_box(120, 40, 180, 100, line_color=QColor(0, 0, 255), paint_label=True)
+        image = self.render(ShapeRenderer(), [red, blue])
+        self.assertEqual(QColor(image.pixel(50, 40)).red(), 255)
+        self.assertEqual(QColor(image.pixel(150, 100)).blue(), 255)
+        # Vertex handle filled with the vertex color.
+        self.assertEqual(image.pixel(20, 100), Shape.vertex_fill_color.rgba())
+        self.assertEqual(image.pixel(100, 150), QColor(255, 255, 255).rgba())
+
+    def test_caches_are_reused(self):
+        renderer = ShapeRenderer()
+        shapes = [make_box(10 + 20 * i, 40, 25 + 20 * i, 60, line_color=QColor(0, 128, 0), paint_label=True)
+                  for i in range(5)]
+        self.render(renderer, shapes)
+        pen = renderer.pen(QColor(0, 128, 0), 2)
+        label = renderer.static_text('box')
+        self.render(renderer, shapes)
+        self.assertIs(renderer.pen(QColor(0, 128, 0), 2), pen)
+        self.assertIs(renderer.static_text('box'), label)
+        self.assertEqual(len(renderer._sprites), 1)
+        self.assertIs(shapes[0].outline_path(), shapes[0].outline_path())
+
+    def test_points_shapes_have_no_outline(self):
+        points = make_shape([(20, 20), (180, 20), (180, 180)], 'points', line_color=QColor(255, 0, 0))
+        points.point_labels = [1, 0, 1]
+        image = self.render(ShapeRenderer(), [points])
+        self.assertEqual(image.pixel(20, 20), Shape.vertex_fill_color.rgba())
+        self.assertEqual(image.pixel(180, 180), Shape.vertex_fill_color.rgba())
+        # Neither the negative point nor a line between the points is drawn.
+        self.assertEqual(image.pixel(180, 20), QColor(255, 255, 255).rgba())
+        self.assertEqual(image.pixel(100, 20), QColor(255, 255, 255).rgba())
+        self.assertEqual(image.pixel(100, 100), QColor(255, 255, 255).rgba())
+
+    def test_label_rect_uses_the_text_advance(self):
+        renderer = ShapeRenderer()
+        box = make_box(10, 40, 50, 60, label='a label')
+        left, top, right, bottom = renderer.label_rect(box, 8)
+        self.assertAlmostEqual(right - left, renderer.font_metrics(8).horizontalAdvance('a label'))
+
+
+if __name__ == '__main__':
+    unittest.main()
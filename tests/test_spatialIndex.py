@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import QPointF
+
+from libs.spatialIndex import ShapeIndex
+
+from helpers import make_box
+
+
+def brute_force(shapes, point):
+    """The hit-test order the canvas used before the index."""
+    return sorted([s for s in shapes if s.contains_point(point)],
+                  key=lambda s: (s.bounding_rect().x(), s.bounding_rect().y()), reverse=True)
+
+
+class TestShapeIndex(unittest.TestCase):
+
+    def test_candidates_in_hit_test_order(self):
+        outer = make_box(0, 0, 500, 500)
+        inner = make_box(100, 100, 200, 200)
+        twin = make_box(100, 100, 150, 150)
+        index = ShapeIndex(cell_size=32)
+        index.rebuild([outer, inner, twin])
+        self.assertEqual(index.candidates(QPointF(120, 120)), [inner, twin, outer])
+        self.assertEqual(index.candidates(QPointF(300, 300)), [outer])
+        self.assertEqual(index.candidates(QPointF(600, 600)), [])
+        self.assertEqual(index.candidates(QPointF(205, 150), margin=10), [inner, outer])
+
+    def test_incremental_updates(self):
+        box = make_box(0, 0, 10, 10)
+        index = ShapeIndex(cell_size=16)
+        index.insert(box)
+        box.move_by(QPointF(100, 100), 1000, 1000)
+        index.update(box)
+        self.assertEqual(index.candidates(QPointF(5, 5)), [])
+        self.assertEqual(index.candidates(QPointF(105, 105)), [box])
+        index.remove(box)
+        self.assertNotIn(box, index)
+        self.assertEqual(index.candidates(QPointF(105, 105)), [])
+        self.assertEqual(index._cells, {})
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        shapes = []
+        for _ in range(300):
+            x, y = rng.uniform(0, 900), rng.uniform(0, 900)
+            shapes.append(make_box(x, y, x + rng.uniform(5, 400), y + rng.uniform(5, 400)))
+        index = ShapeIndex(cell_size=20)
+        index.rebuild(shapes)
+        self.assertTrue(index._large)
+        for _ in range(200):
+            point = QPointF(rng.uniform(0, 1000), rng.uniform(0, 1000))
+            hits = [s for s in index.candidates(point) if s.contains_point(point)]
+            self.assertEqual(hits, brute_force(shapes, point))
+
+
+if __name__ == '__main__':
+    unittest.main()
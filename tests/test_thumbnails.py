@@ -0,0 +1,81 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtGui import QImage
+
+from libs.thumbnails import ThumbnailCache, ThumbnailLoader
+
+
+class TestThumbnailCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, 'thumbs.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_stamp_must_match(self):
+        cache = ThumbnailCache(self.db)
+        cache.put('/a.jpg', (1, 10), b'abc')
+        self.assertEqual(cache.get('/a.jpg', (1, 10)), b'abc')
+        self.assertIsNone(cache.get('/a.jpg', (2, 10)))
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_persistent_and_bounded(self):
+        cache = ThumbnailCache(self.db, max_bytes=1000)
+        for i in range(20):
+            cache.put('/%d.jpg' % i, (i, i), b'x' * 100)
+        self.assertLessEqual(cache.total_bytes(), 1000)
+        cache.close()
+        cache = ThumbnailCache(self.db, max_bytes=1000)
+        self.assertLessEqual(cache.total_bytes(), 1000)
+        self.assertEqual(cache.get('/19.jpg', (19, 19)), b'x' * 100)
+        self.assertIsNone(cache.get('/0.jpg', (0, 0)))
+        cache.close()
+
+    def test_hits_leave_database_unlocked(self):
+        cache = ThumbnailCache(self.db)
+        cache.put('/a.jpg', (1, 10), b'abc')
+        cache.get('/a.jpg', (1, 10))
+        cache.get('/b.jpg', (1, 10))
+        # Another instance can write while this one is idle
+        other = sqlite3.connect(self.db, timeout=0)
+        other.execute('UPDATE thumbnails SET used = 0')
+        other.commit()
+        other.close()
+        for i in range(ThumbnailCache.USED_BATCH):
+            cache.put('/%d.jpg' % i, (1, 10), b'abc')
+        cache.get('/a.jpg', (1, 10))
+        for i in range(ThumbnailCache.USED_BATCH - 1):
+            cache.get('/%d.jpg' % i, (1, 10))
+        # The use times are written once a batch is full
+        used = sqlite3.connect(self.db).execute("SELECT used FROM thumbnails WHERE path = '/a.jpg'").fetchone()[0]
+        self.assertGreater(used, 0)
+        cache.close()
+
+    def test_loader_fills_cache(self):
+        path = os.path.join(self.tmp, 'img.png')
+        image = QImage(400, 200, QImage.Format_RGB32)
+        image.fill(0)
+        image.save(path)
+        loader = ThumbnailLoader(ThumbnailCache(self.db), size=64)
+        self.assertIsNone(loader.thumbnail(path))
+        for future in list(loader._pending.values()):
+            future.result()
+        self.assertEqual(loader.thumbnail(path).size().width(), 64)
+        self.assertEqual(loader.thumbnail(path).size().height(), 32)
+        self.assertEqual(len(loader.cache), 1)
+        loader.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
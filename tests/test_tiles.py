@@ -0,0 +1,133 @@
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPainter
+
+from libs.tiles import PLACEHOLDER_COLOR, TiledImageSource, should_tile
+
+
+class TestTiledImageSource(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'big.jpg')
+        image = QImage(3000, 2000, QImage.Format_RGB32)
+        image.fill(QColor(10, 200, 30))
+        image.save(self.path)
+        self.source = TiledImageSource(self.path, tile_size=256, budget_bytes=4 * 256 * 256 * 4)
+
+    def tearDown(self):
+        self.source.close()
+        shutil.rmtree(self.tmp)
+
+    def test_geometry(self):
+        self.assertTrue(should_tile(self.path, min_pixels=1000))
+        self.assertFalse(should_tile(self.path))
+        self.assertEqual((self.source.width(), self.source.height()), (3000, 2000))
+        self.assertEqual(self.source.max_level, 4)
+        self.assertEqual(self.source.level_for_scale(2.0), 0)
+        self.assertEqual(self.source.level_for_scale(0.3), 1)
+        self.assertEqual(self.source.tiles_in(QRectF(0, 0, 300, 100), 0), [(0, 0, 0), (0, 1, 0)])
+        self.assertEqual(self.source.tile_rect(0, 11, 7).width(), 3000 - 11 * 256)
+
+    def test_tiles_are_decoded_at_level_resolution_within_budget(self):
+        keys = self.source.tiles_in(QRectF(0, 0, 3000, 2000), 1)
+        for key in keys:
+            self.source._load(key)
+        # The oldest tiles were evicted to stay within the budget
+        self.assertIsNone(self.source.cached_tile(keys[0]))
+        tile = self.source.cached_tile(keys[-1])
+        self.assertGreater(tile.pixelColor(0, 0).green(), 150)
+        self.assertLessEqual(self.source.cached_bytes(), self.source.budget_bytes)
+        rect = self.source.tile_rect(*keys[-1])
+        self.assertEqual(tile.width(), rect.width() >> 1)
+
+    def test_overview_is_decoded_off_the_constructor(self):
+        target = QImage(300, 200, QImage.Format_RGB32)
+        target.fill(QColor(0, 0, 0))
+        self.source._overview_future.result()
+        self.assertEqual(self.source.overview.width(), 2048)
+        self.source.overview = None
+        p = QPainter(target)
+        p.scale(0.1, 0.1)
+        self.source.paint(p, QRectF(0, 0, 3000, 2000), 0.1)
+        p.end()
+        # A placeholder until the overview is there
+        self.assertEqual(target.pixelColor(150, 100), PLACEHOLDER_COLOR)
+        self.source._load_overview()
+        p = QPainter(target)
+        p.scale(0.1, 0.1)
+        self.source.paint(p, QRectF(0, 0, 3000, 2000), 0.1)
+        p.end()
+        self.assertGreater(target.pixelColor(150, 100).green(), 150)
+
+
+def add_exif_orientation(path, orientation):
+    """Insert an APP1 segment with only the EXIF orientation tag after the JPEG SOI marker."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    tiff = (b'MM\x00*' + struct.pack('>IH', 8, 1) +
+            struct.pack('>HHIHH', 0x0112, 3, 1, orientation, 0) + struct.pack('>I', 0))
+    payload = b'Exif\x00\x00' + tiff
+    with open(path, 'wb') as f:
+        f.write(data[:2] + b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload + data[2:])
+
+
+class TestRotatedTiledImageSource(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'rotated.jpg')
+        image = QImage(3000, 2000, QImage.Format_RGB32)
+        image.fill(QColor(10, 200, 30))
+        # Stored top left corner, shown top right once turned clockwise
+        p = QPainter(image)
+        p.fillRect(0, 0, 600, 600, QColor(220, 20, 20))
+        p.end()
+        image.save(self.path)
+        add_exif_orientation(self.path, 6)
+        self.source = TiledImageSource(self.path, tile_size=256)
+
+    def tearDown(self):
+        self.source.close()
+        shutil.rmtree(self.tmp)
+
+    def test_geometry_is_turned(self):
+        self.assertTrue(should_tile(self.path, min_pixels=1000))
+        self.assertEqual((self.source.width(), self.source.height()), (2000, 3000))
+
+    def test_tiles_match_the_auto_transformed_image(self):
+        reader = QImageReader(self.path)
+        reader.setAutoTransform(True)
+        full = reader.read()
+        self.assertEqual((full.width(), full.height()), (2000, 3000))
+        for key in [(0, 7, 0), (0, 0, 0), (1, 3, 1)]:
+            level = key[0]
+            self.source._load(key)
+            tile = self.source.cached_tile(key)
+            rect = self.source.tile_rect(*key)
+            self.assertEqual((tile.width(), tile.height()), (rect.width() >> level, rect.height() >> level))
+            for x, y in [(2, 2), (tile.width() - 3, tile.height() - 3)]:
+                expected = full.pixelColor(rect.left() + (x << level), rect.top() + (y << level))
+                self.assertLess(abs(tile.pixelColor(x, y).red() - expected.red()), 40, (key, x, y))
+        # The red corner is shown top right
+        self.assertGreater(self.source.cached_tile((0, 7, 0)).pixelColor(200, 20).red(), 150)
+        self.assertLess(self.source.cached_tile((0, 0, 0)).pixelColor(20, 20).red(), 100)
+
+    def test_overview_is_turned(self):
+        self.source._overview_future.result()
+        overview = self.source.overview
+        self.assertEqual((overview.width(), overview.height()), (1365, 2048))
+        self.assertGreater(overview.pixelColor(overview.width() - 10, 10).red(), 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of editing many shapes of an image at once in the main window.
+
+Loads the shapes, then times deleting all of them and, where the main
+window has them, relabelling, recoloring and moving half of them in one
+edit. Every time includes the repaint which follows.
+
+    python tools/bench_batch_edit.py --shapes 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PyQt5.QtCore import QPointF
+from PyQt5.QtGui import QColor, QImage
+
+from bench_load_labels import make_shapes
+
+
+def timed(app, function):
+    started = time.perf_counter()
+    function()
+    app.processEvents()
+    return (time.perf_counter() - started) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--shapes', type=int, nargs='+', default=[1000, 10000],
+                        help='numbers of shapes on the image')
+    args = parser.parse_args()
+
+    from labelImg import get_main_app
+    app, win = get_main_app([sys.argv[0]])
+    image = QImage(4000, 3000, QImage.Format_RGB32)
+    batched = hasattr(win, 'edit_shapes')
+    print('  shapes  relabel ms  recolor ms    move ms  delete all ms')
+    for count in args.shapes:
+        win.reset_state()
+        win.canvas.load_image(image)
+        win.load_labels(make_shapes(count, 20))
+        app.processEvents()
+        half = win.canvas.shapes[::2]
+        times = ['%10s' % '-'] * 3
+        if batched:
+            times = ['%10.1f' % timed(app, edit) for edit in (
+                lambda: win.edit_shapes(half, label='renamed'),
+                lambda: win.edit_shapes(half, line_color=QColor(255, 0, 0)),
+                lambda: win.edit_shapes(half, offset=QPointF(5, 5)))]
+        delete = timed(app, win.delete_all_shape)
+        print('%8d  %s  %s %s %14.1f' % (count, times[0], times[1], times[2], delete))
+    win.set_clean()
+    win.reset_state()
+
+
+if __name__ == '__main__':
+    main()
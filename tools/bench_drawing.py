@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the preview painted while a polygon is being drawn.
+
+A polygon is clicked vertex by vertex and after every click the cursor moves
+a few times; every move paints the preview. The preview the canvas used to
+paint, which copied the polygon and painted it from scratch, is compared
+with Canvas.paint_drawing_preview. Reported at growing numbers of vertices:
+the time per paint and the peak Python memory held while painting.
+
+    python tools/bench_drawing.py --vertices 1000
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PyQt5.QtCore import QPointF
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QApplication
+
+from libs.canvas import Canvas
+from libs.shape import Shape
+
+
+def old_preview(p, canvas):
+    """The polygon preview as paintEvent used to draw it."""
+    canvas.current.paint(p)
+    canvas.line.paint(p)
+    drawing_shape = canvas.current.copy()
+    drawing_shape.addPoint(canvas.line[1])
+    drawing_shape.fill = True
+    drawing_shape.paint(p)
+
+
+def new_preview(p, canvas):
+    canvas.paint_drawing_preview(p)
+
+
+def run(preview, vertices, moves, checkpoints):
+    canvas = Canvas()
+    canvas.scale = 1.0
+    Shape.scale = canvas.scale
+    canvas.current = Shape(shape_type='polygon')
+    image = QImage(1200, 1200, QImage.Format_ARGB32_Premultiplied)
+    results = {}
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        point = QPointF(600 + 500 * math.cos(angle), 600 + 500 * math.sin(angle))
+        canvas.current.addPoint(point)
+        if i + 1 not in checkpoints:
+            # Keep the preview up to date between checkpoints, as the canvas does.
+            canvas.set_line(point, point + QPointF(5, 5))
+            p = QPainter(image)
+            preview(p, canvas)
+            p.end()
+            continue
+        p = QPainter(image)
+        tracemalloc.start()
+        started = time.perf_counter()
+        for step in range(moves):
+            canvas.set_line(point, point + QPointF(step % 7, step % 5))
+            preview(p, canvas)
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        p.end()
+        results[i + 1] = (seconds / moves * 1000.0, peak)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--vertices', type=int, default=1000, help='vertices of the drawn polygon')
+    parser.add_argument('--moves', type=int, default=50, help='cursor moves painted at each checkpoint')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    checkpoints = sorted(set(n for n in (10, 30, 100, 300, 1000, 3000) if n <= args.vertices) | {args.vertices})
+    old = run(old_preview, args.vertices, args.moves, checkpoints)
+    new = run(new_preview, args.vertices, args.moves, checkpoints)
+    print('vertices     old ms  old peak B     new ms  new peak B')
+    for n in checkpoints:
+        print('%8d %10.3f %11.0f %10.3f %11.0f' % (n, old[n][0], old[n][1], new[n][0], new[n][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the canvas hit-testing kernels.
+
+Compares the per-edge NumPy distance and the QPainterPath built for every
+containment test, which the canvas used to call, with the closed-form and
+batched functions of libs/geometry.py and the cached shape geometry, and
+times a whole hover (candidate lookup plus vertex, edge and containment
+tests) over a crowded image.
+
+    python tools/bench_geometry.py --shapes 5000 --vertices 500
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from PyQt5.QtCore import QPointF
+
+from libs import geometry
+from libs.shape import Shape
+from libs.spatialIndex import ShapeIndex
+
+
+def numpy_distance_to_line(point, line):
+    """The per-edge implementation used before libs/geometry.py."""
+    p1, p2 = line
+    p1 = np.array([p1.x(), p1.y()])
+    p2 = np.array([p2.x(), p2.y()])
+    p3 = np.array([point.x(), point.y()])
+    if np.dot((p3 - p1), (p2 - p1)) < 0:
+        return np.linalg.norm(p3 - p1)
+    if np.dot((p3 - p2), (p1 - p2)) < 0:
+        return np.linalg.norm(p3 - p2)
+    if np.linalg.norm(p2 - p1) == 0:
+        return np.linalg.norm(p3 - p1)
+    return abs(np.cross(np.append(p2 - p1, 0), np.append(p1 - p3, 0))[2]) / np.linalg.norm(p2 - p1)
+
+
+def make_shape(shape_type, points):
+    shape = Shape(label='obj', shape_type=shape_type)
+    for x, y in points:
+        shape.addPoint(QPointF(x, y))
+    shape.close()
+    return shape
+
+
+def per_call(statement, number):
+    return min(timeit.repeat(statement, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--shapes', type=int, default=5000, help='boxes on the image')
+    parser.add_argument('--vertices', type=int, default=500, help='vertices of the large polygon')
+    parser.add_argument('--hovers', type=int, default=2000, help='hover events to time')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    width, height = 6000.0, 4000.0
+    boxes = []
+    for _ in range(args.shapes):
+        x, y = rng.uniform(0, width - 60), rng.uniform(0, height - 60)
+        w, h = rng.uniform(10, 60), rng.uniform(10, 60)
+        boxes.append(make_shape('rectangle', [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]))
+    polygon = make_shape('polygon', [(3000 + 500 * np.cos(a), 2000 + 500 * np.sin(a))
+                                     for a in np.linspace(0, 2 * np.pi, args.vertices, endpoint=False)])
+    point = QPointF(3100, 2050)
+    box = boxes[0]
+    inside = box.bounding_rect().center()
+
+    print('kernel                                   us/call')
+    old = per_call(lambda: [numpy_distance_to_line(inside, (box[i - 1], box[i])) for i in range(4)], 2000)
+    new = per_call(lambda: box.nearestEdge(inside, 5), 2000)
+    print('box edges, numpy per edge               %8.2f' % old)
+    print('box edges, closed form                  %8.2f' % new)
+    old = per_call(lambda: box._build_path().contains(inside), 2000)
+    new = per_call(lambda: box.contains_point(inside), 2000)
+    print('box contains, new QPainterPath          %8.2f' % old)
+    print('box contains, closed form               %8.2f' % new)
+    edges = polygon.edges()
+    old = per_call(lambda: [geometry.point_segment_distance(point.x(), point.y(), *edge) for edge in edges], 50)
+    new = per_call(lambda: polygon.nearestEdge(point, 5), 50)
+    print('%d-gon edges, closed form loop         %8.2f' % (args.vertices, old))
+    print('%d-gon edges, batched                  %8.2f' % (args.vertices, new))
+    old = per_call(lambda: polygon._build_path().contains(point), 200)
+    new = per_call(lambda: polygon.contains_point(point), 200)
+    print('%d-gon contains, new QPainterPath      %8.2f' % (args.vertices, old))
+    print('%d-gon contains, cached path           %8.2f' % (args.vertices, new))
+
+    index = ShapeIndex()
+    index.rebuild(boxes + [polygon])
+    hovers = [QPointF(rng.uniform(0, width), rng.uniform(0, height)) for _ in range(args.hovers)]
+
+    def hover():
+        for pos in hovers:
+            for shape in index.candidates(pos, 11.0):
+                if (shape.nearest_vertex(pos, 11.0) is not None or shape.nearestEdge(pos, 11.0) is not None
+                        or shape.contains_point(pos)):
+                    break
+
+    cost = min(timeit.repeat(hover, number=1, repeat=3)) / len(hovers) * 1e6
+    print('hover over %d shapes                   %8.2f' % (len(boxes) + 1, cost))
+
+
+if __name__ == '__main__':
+    main()
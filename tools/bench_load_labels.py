@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of loading the shapes of an annotation file into the main window.
+
+Times MainWindow.load_labels, which builds the shapes, the label list and the
+label filter, for growing numbers of shapes. The time per shape stays flat
+when loading scales linearly.
+
+    python tools/bench_load_labels.py --shapes 1000 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PyQt5.QtGui import QImage
+
+
+def make_shapes(count, labels):
+    shapes = []
+    for i in range(count):
+        x, y = (i % 100) * 40.0, (i // 100) * 30.0 % 3000
+        points = [(x, y), (x + 30, y), (x + 30, y + 20), (x, y + 20)]
+        shapes.append(('class%d' % (i % labels), None, 'rectangle', points, None, None, False))
+    return shapes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--shapes', type=int, nargs='+', default=[1000, 2000, 5000, 10000],
+                        help='numbers of shapes to load')
+    parser.add_argument('--labels', type=int, default=20, help='distinct label names')
+    args = parser.parse_args()
+
+    from labelImg import get_main_app
+    app, win = get_main_app([sys.argv[0]])
+    image = QImage(4000, 3000, QImage.Format_RGB32)
+    print('  shapes   load ms   us/shape')
+    for count in args.shapes:
+        win.reset_state()
+        win.canvas.load_image(image)
+        shapes = make_shapes(count, args.labels)
+        started = time.perf_counter()
+        win.load_labels(shapes)
+        app.processEvents()
+        seconds = time.perf_counter() - started
+        print('%8d %9.1f %10.1f' % (count, seconds * 1000.0, seconds / count * 1e6))
+    win.set_clean()
+    win.reset_state()
+
+
+if __name__ == '__main__':
+    main()
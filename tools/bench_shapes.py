@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the memory and the basic operations of Shape.
+
+Builds boxes and polygons as a label file load does, then reports the
+Python memory they hold and the time of the operations done on them while
+editing: a drag step (move_by), a copy and reading the points.
+
+    python tools/bench_shapes.py --shapes 50000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from PyQt5.QtCore import QPointF
+
+from libs.shape import Shape
+
+
+def make_shapes(count, vertices):
+    shapes = []
+    for i in range(count):
+        x, y = (i % 200) * 10.0, (i // 200) * 10.0
+        if vertices == 4:
+            shape = Shape(label='box', shape_type='rectangle')
+            corners = ((x, y), (x + 8, y), (x + 8, y + 8), (x, y + 8))
+        else:
+            shape = Shape(label='polygon', shape_type='polygon')
+            corners = [(x + j % 8, y + j // 8) for j in range(vertices)]
+        for cx, cy in corners:
+            shape.addPoint(QPointF(cx, cy))
+        shape.close()
+        shapes.append(shape)
+    return shapes
+
+
+def timed(function, shapes, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for shape in shapes:
+            function(shape)
+    return (time.perf_counter() - started) / (repeat * len(shapes)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--shapes', type=int, default=50000, help='number of shapes of each kind')
+    parser.add_argument('--vertices', type=int, default=32, help='vertices of the polygons')
+    args = parser.parse_args()
+
+    offset = QPointF(1.0, 1.0)
+    print('kind        build us  KB/shape  move_by us  copy us  points us')
+    for kind, vertices in (('boxes', 4), ('polygons', args.vertices)):
+        started = time.perf_counter()
+        shapes = make_shapes(args.shapes, vertices)
+        build = (time.perf_counter() - started) / args.shapes * 1e6
+        del shapes
+        # Measured on a second build, tracing slows the build down.
+        tracemalloc.start()
+        shapes = make_shapes(args.shapes, vertices)
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        move = timed(lambda shape: shape.move_by(offset, 1e9, 1e9), shapes)
+        copy = timed(lambda shape: shape.copy(), shapes)
+        points = timed(lambda shape: [(p.x(), p.y()) for p in shape.points], shapes)
+        print('%-10s %9.2f %9.2f %11.2f %8.2f %10.2f'
+              % (kind, build, held / 1024.0 / args.shapes, move, copy, points))
+        del shapes
+
+
+if __name__ == '__main__':
+    main()